@@ -0,0 +1,101 @@
+"""LRU+TTL caches for decoded access tokens and user lookups.
+
+``get_current_user`` hits these before decoding the JWT and before asking
+Mongo for the user, so polling endpoints such as ``/auth/me`` and ``/history``
+cost no database round trip while the entry is fresh.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class TTLCache:
+    """Bounded LRU map whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data: "OrderedDict[Any, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        item = self.data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        value, expires_at = item
+        if expires_at <= time.monotonic():
+            del self.data[key]
+            self.misses += 1
+            return None
+        self.data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self.data[key] = (value, time.monotonic() + ttl)
+        self.data.move_to_end(key)
+        if len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def pop(self, key):
+        self.data.pop(key, None)
+
+    def clear(self):
+        self.data.clear()
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self.data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class AuthCache:
+    """Token -> username and username -> slim user document caches."""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60, enabled: bool = True):
+        self.enabled = enabled
+        self.tokens = TTLCache(maxsize, ttl)
+        self.users = TTLCache(maxsize, ttl)
+
+    def get_token(self, token: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        return self.tokens.get(token)
+
+    def put_token(self, token: str, username: str, exp: Optional[float] = None):
+        if not self.enabled:
+            return
+        ttl = None
+        if exp is not None:
+            # Never serve a token past its own expiry
+            ttl = exp - time.time()
+            if ttl <= 0:
+                return
+        self.tokens.put(token, username, ttl)
+
+    def get_user(self, username: str) -> Optional[Dict]:
+        if not self.enabled:
+            return None
+        return self.users.get(username)
+
+    def put_user(self, username: str, user: Dict):
+        if self.enabled:
+            self.users.put(username, user)
+
+    def invalidate_user(self, username: str):
+        self.users.pop(username)
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "tokens": self.tokens.stats(),
+            "users": self.users.stats(),
+        }
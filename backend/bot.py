@@ -0,0 +1,106 @@
+"""Server-side bot opponent.
+
+The bot hunts with probability density: every cell is scored by how many
+legal placements of the ships still afloat would cover it, and the bot fires
+at the best-scoring open cell. Placements that run through unresolved hits
+are weighted heavily, which turns the same count into target mode after a
+hit.
+
+All placements of each ship length are precomputed once as a 0/1 matrix
+(placements x cells), so a move is a few small matrix-vector products:
+one to drop placements that touch a miss or a sunk ship, one to find the
+placements through current hits, and one to sum the survivors per cell.
+The matrices are float32 so the products go through BLAS; every value is a
+small integer and stays exact.
+"""
+import random
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from game_engine import CELL_COUNT, FLEET, FLEET_LENGTHS, PLACEMENT_MASKS, Board, mask_cells
+
+BOT_USERNAME = "BattleBot"
+
+# Extra weight per unresolved hit a placement passes through
+TARGET_WEIGHT = 64
+
+
+def _matrix(masks: List[int]) -> np.ndarray:
+    matrix = np.zeros((len(masks), CELL_COUNT), dtype=np.float32)
+    for row, mask in enumerate(masks):
+        matrix[row, mask_cells(mask)] = 1
+    return matrix
+
+
+PLACEMENTS: Dict[int, np.ndarray] = {length: _matrix(masks) for length, masks in PLACEMENT_MASKS.items()}
+
+
+def random_board(rng: random.Random, fleet=FLEET) -> Board:
+    """Lay out ``fleet`` at random, without overlaps."""
+    occupied = 0
+    names, masks = [], []
+    for name, length in fleet:
+        mask = rng.choice([m for m in PLACEMENT_MASKS[length] if not m & occupied])
+        occupied |= mask
+        names.append(name)
+        masks.append(mask)
+    return Board(names, masks)
+
+
+class BotPlayer:
+    """Targeting state for one bot seat; everything it knows comes from its own shots."""
+
+    __slots__ = ("rng", "shots", "hits", "sunk", "afloat")
+
+    def __init__(self, seed: Optional[int] = None, fleet=FLEET):
+        self.rng = random.Random(seed)
+        self.shots = np.zeros(CELL_COUNT, dtype=bool)
+        self.hits = np.zeros(CELL_COUNT, dtype=np.float32)
+        self.sunk = np.zeros(CELL_COUNT, dtype=np.float32)
+        # length -> number of opposing ships of that length still afloat
+        self.afloat: Dict[int, int] = {}
+        for _, length in fleet:
+            self.afloat[length] = self.afloat.get(length, 0) + 1
+
+    def place_fleet(self) -> Board:
+        return random_board(self.rng)
+
+    def density(self) -> np.ndarray:
+        blocked = (self.shots & (self.hits == 0)) + self.sunk
+        unresolved = self.hits - self.sunk
+        scores = np.zeros(CELL_COUNT, dtype=np.float32)
+        for length, count in self.afloat.items():
+            if not count:
+                continue
+            matrix = PLACEMENTS[length]
+            weights = (matrix @ blocked == 0) * (1 + TARGET_WEIGHT * (matrix @ unresolved))
+            scores += count * (weights @ matrix)
+        scores[self.shots] = -1
+        return scores
+
+    def choose(self) -> int:
+        """Return the bit index of the next cell to fire at."""
+        scores = self.density()
+        return self.rng.choice(np.flatnonzero(scores == scores.max()).tolist())
+
+    def record(self, index: int, hit: bool, sunk_ship: Optional[str] = None):
+        self.shots[index] = True
+        if hit:
+            self.hits[index] = 1
+        if sunk_ship:
+            self._mark_sunk(index, FLEET_LENGTHS.get(sunk_ship))
+
+    def _mark_sunk(self, index: int, length: Optional[int]):
+        # The sunk ship lies on unresolved hits through ``index``; prefer the
+        # named length and fall back to any length still afloat.
+        unresolved = self.hits - self.sunk
+        lengths = [length] if self.afloat.get(length) else []
+        lengths += sorted((size for size, count in self.afloat.items() if count and size != length), reverse=True)
+        for candidate in lengths:
+            matrix = PLACEMENTS[candidate]
+            fits = np.flatnonzero((matrix[:, index] == 1) & (matrix @ unresolved == candidate))
+            if fits.size:
+                self.sunk += matrix[fits[0]]
+                self.afloat[candidate] -= 1
+                return
@@ -0,0 +1,724 @@
+"""WebSocket connections and room fan-out.
+
+Every connection owns a bounded outbound queue drained by its own writer
+task, so a broadcast only serializes the message once per negotiated codec
+and enqueues the same frame for each recipient. A stalled client fills its
+own queue and never delays anyone else. When a queue overflows, chat frames
+drop the oldest queued chat message while game events disconnect the slow
+consumer, since a client that missed a game event can no longer follow the
+game.
+
+Liveness is tracked on a :class:`TimingWheel`. Every connection has one
+timer: when it fires the server sends a ``ping``, or reaps the socket if
+nothing (``pong`` included) has arrived for ``heartbeat_timeout`` seconds.
+Every owned room has an idle deadline that is pushed back by each message
+handled for it. Activity only stamps the wheel's current tick onto the
+connection or room; the timer itself is looked at when it fires.
+
+Room broadcasts carry a per-room ``seq`` and the most recent ones are kept
+in a ring buffer. A player whose socket drops keeps their seat for
+``seat_grace`` seconds, and a client that comes back with its last seen
+``seq`` can be sent just the events it missed (see :meth:`events_since`).
+
+Spectators are fed by a :class:`SpectatorHub` on the worker they are
+connected to. The owner passes each room event to every watching worker
+once, after the players' frames are queued.
+
+Incoming frames are rate limited per connection on the worker that
+received them, and per room on the owner (see :mod:`rate_limit`). A
+throttled frame is dropped with an ``error`` frame, and a connection
+that keeps hitting its limit runs out of strikes and is disconnected.
+
+Each owned room has a :class:`RoomActor`. Frames for the room, bot moves,
+timers and departures all run as jobs on it, one at a time, so no two
+changes to a room interleave. Before a restart the manager drains: it
+takes no new rooms and lets every actor finish its queue, so the rooms
+can be written out (see :mod:`room_snapshot`) and restored by the next
+process with every seat held. With a :class:`HashRing` (see :mod:`shards`)
+the owner of a room code is computed instead of looked up in the store.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import deque
+from itertools import islice
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+from fastapi import WebSocket
+
+from metrics import BROADCAST_SECONDS
+from protocol import JSON_CODEC, ProtocolError, json_dumps, json_loads
+from rate_limit import RateLimits, TokenBucket
+from room_actor import RoomActor
+from room_store import InMemoryRoomStore, RoomStore, worker_channel
+from shards import HashRing
+from spectators import SpectatorHub
+from timing_wheel import TimingWheel
+
+logger = logging.getLogger(__name__)
+
+# Message types that may be dropped under back-pressure
+DROPPABLE_TYPES = frozenset({"chat", "chat_batch"})
+# Frames that name the room they act on, rather than acting on the sender's room
+ROOM_TARGETED_TYPES = frozenset({"join_room", "resume", "spectate"})
+SEND_QUEUE_SIZE = 64
+CLOSE_TIMEOUT = 1.0
+PING_INTERVAL = 20.0
+HEARTBEAT_TIMEOUT = 60.0
+ROOM_IDLE_TIMEOUT = 600.0
+SEAT_GRACE = 30.0
+EVENT_BUFFER = 256
+# Throttled frames a connection may send (refilling at one per second) before it is dropped
+THROTTLE_STRIKES = 20
+
+
+class Connection:
+    def __init__(
+        self, websocket: WebSocket, username: str, manager: "ConnectionManager", max_queue: int, codec=JSON_CODEC
+    ):
+        self.websocket = websocket
+        self.username = username
+        self.codec = codec
+        self.manager = manager
+        self.max_queue = max_queue
+        self.queue = deque()
+        self.wakeup = asyncio.Event()
+        self.closed = False
+        # Room this socket plays in and the worker that owns it
+        self.room_code: Optional[str] = None
+        self.room_owner: Optional[str] = None
+        # Wheel tick of the last frame received
+        self.last_seen = manager.wheel.current
+        # Room this socket spectates, on this worker's SpectatorHub
+        self.watching: Optional[str] = None
+        # Message type -> TokenBucket, see ConnectionManager.rate_limits
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.strikes = TokenBucket(1, manager.throttle_strikes)
+        self.throttled = False
+        self.writer = asyncio.create_task(self._write_loop())
+
+    def send(self, payload, droppable: bool = False) -> bool:
+        """Queue a pre-encoded frame; never blocks. Returns False if it was not queued."""
+        if self.closed:
+            return False
+        if len(self.queue) >= self.max_queue:
+            self.manager.slow_consumer_events += 1
+            # Make room by dropping the oldest frame the client can do without
+            for i, (_, queued_droppable) in enumerate(self.queue):
+                if queued_droppable:
+                    del self.queue[i]
+                    break
+            else:
+                if not droppable:
+                    logger.warning(f"Disconnecting slow consumer {self.username}")
+                    self.abort()
+                    return False
+                self.manager.dropped_messages += 1
+                return False
+            self.manager.dropped_messages += 1
+        self.queue.append((payload, droppable))
+        self.wakeup.set()
+        return True
+
+    def offer(self, payload) -> bool:
+        """Queue a frame if there is room, with no back-pressure handling."""
+        if self.closed or len(self.queue) >= self.max_queue:
+            return False
+        self.queue.append((payload, True))
+        self.wakeup.set()
+        return True
+
+    async def _write_loop(self):
+        try:
+            while True:
+                while not self.queue:
+                    self.wakeup.clear()
+                    await self.wakeup.wait()
+                payload, _ = self.queue.popleft()
+                if type(payload) is str:
+                    await self.websocket.send_text(payload)
+                else:
+                    await self.websocket.send_bytes(payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info(f"Send to {self.username} failed: {e}")
+            self.abort()
+
+    def abort(self, code: int = 1008):
+        """Stop writing and close the socket without waiting on the client."""
+        if self.closed:
+            return
+        self.close()
+        asyncio.create_task(self._close_socket(code))
+
+    async def _close_socket(self, code: int):
+        try:
+            await asyncio.wait_for(self.websocket.close(code=code), CLOSE_TIMEOUT)
+        except Exception:
+            pass
+
+    def close(self):
+        self.closed = True
+        self.queue.clear()
+        if self.writer is not asyncio.current_task():
+            self.writer.cancel()
+
+
+class ConnectionManager:
+    """Local sockets plus the rooms this worker owns.
+
+    Game state for a room lives only on its owner. Frames from players
+    connected to other workers are forwarded to the owner over the room
+    store's pub/sub, and the owner's replies travel back the same way.
+    ``user_to_room`` and ``user_workers`` cover players of owned rooms;
+    ``Connection.room_owner`` tells the ingress worker where to route.
+    """
+
+    def __init__(
+        self,
+        store: Optional[RoomStore] = None,
+        send_queue_size: int = SEND_QUEUE_SIZE,
+        worker_id: Optional[str] = None,
+        ping_interval: float = PING_INTERVAL,
+        heartbeat_timeout: float = HEARTBEAT_TIMEOUT,
+        room_idle_timeout: float = ROOM_IDLE_TIMEOUT,
+        seat_grace: float = SEAT_GRACE,
+        event_buffer: int = EVENT_BUFFER,
+        rate_limits: Optional[RateLimits] = None,
+        room_rate_limits: Optional[RateLimits] = None,
+        throttle_strikes: int = THROTTLE_STRIKES,
+        wheel: Optional[TimingWheel] = None,
+        ring: Optional[HashRing] = None,
+    ):
+        self.store = store or InMemoryRoomStore()
+        self.worker_id = worker_id or uuid.uuid4().hex[:12]
+        self.send_queue_size = send_queue_size
+        self.active_connections: Dict[str, Connection] = {}
+        self.user_to_room: Dict[str, str] = {}
+        self.user_workers: Dict[str, str] = {}
+        self.rooms: Dict[str, Dict] = {}
+        self.actors: Dict[str, RoomActor] = {}
+        self.ring = ring
+        # Set while shutting down; no new rooms are created
+        self.draining = False
+        self.dispatch: Optional[Callable[[str, Dict], Awaitable]] = None
+        # Asked for a room code this worker claimed but does not hold yet,
+        # such as one still in a snapshot; returns the room after restore_room
+        self.load_room: Optional[Callable[[str], Awaitable[Optional[Dict]]]] = None
+        # Called as on_forfeit(room_code, room, username) when a player of a
+        # game in progress gives up their seat, with both still seated, to
+        # end the game; the room is closed after it returns
+        self.on_forfeit: Optional[Callable[[str, Dict, str], Awaitable]] = None
+        self.inbox: Optional[asyncio.Queue] = None
+        self.inbox_task: Optional[asyncio.Task] = None
+        self.wheel = wheel if wheel is not None else TimingWheel()
+        self.timer_task: Optional[asyncio.Task] = None
+        self.spectators = SpectatorHub()
+        self.ping_interval = ping_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.room_idle_timeout = room_idle_timeout
+        self.seat_grace = seat_grace
+        self.event_buffer = event_buffer
+        self.rate_limits = rate_limits or RateLimits({})
+        self.room_rate_limits = room_rate_limits or RateLimits({})
+        self.throttle_strikes = throttle_strikes
+        # Message type -> frames dropped by a rate limit
+        self.throttled_messages: Dict[str, int] = {}
+        self.throttle_disconnects = 0
+        self.slow_consumer_events = 0
+        self.dropped_messages = 0
+        self.forwarded_frames = 0
+        self.reaped_connections = 0
+        self.reaped_rooms = 0
+
+    async def start(self, dispatch: Callable[[str, Dict], Awaitable]):
+        """Start handling envelopes other workers publish to this one."""
+        self.dispatch = dispatch
+        self.inbox = asyncio.Queue()
+        await self.store.subscribe(worker_channel(self.worker_id), self.inbox.put_nowait)
+        self.inbox_task = asyncio.create_task(self._process_inbox())
+        self.timer_task = asyncio.create_task(self._run_timers())
+        self.spectators.start()
+
+    async def stop(self):
+        for task in (self.inbox_task, self.timer_task):
+            if task:
+                task.cancel()
+        for actor in self.actors.values():
+            actor.cancel()
+        await self.spectators.stop()
+        await self.store.close()
+
+    async def connect(self, websocket: WebSocket, username: str, codec=JSON_CODEC) -> Connection:
+        await websocket.accept()
+        previous = self.active_connections.get(username)
+        if previous:
+            previous.close()
+        connection = Connection(websocket, username, self, self.send_queue_size, codec)
+        self.active_connections[username] = connection
+        self.wheel.schedule(("conn", username), self.ping_interval)
+        return connection
+
+    async def disconnect(self, username: str, connection: Optional[Connection] = None):
+        if connection is not None:
+            connection.close()
+            # A newer socket for the same user has taken over; leave its state alone
+            if self.active_connections.get(username) is not connection:
+                return
+        connection = self.active_connections.pop(username, None)
+        if connection is None:
+            return
+        self.wheel.cancel(("conn", username))
+        connection.close()
+        if connection.watching is not None:
+            await self.unwatch(connection)
+        if connection.room_owner == self.worker_id:
+            await self.run_in_room(self.user_to_room.get(username), self.leave, username)
+        elif connection.room_owner is not None:
+            await self._publish(connection.room_owner, {"kind": "leave", "from": username})
+
+    # Rooms owned by this worker
+
+    def owns(self, room_code: str) -> bool:
+        """Whether ``room_code`` would be owned here; always True without a ring."""
+        return self.ring is None or self.ring.owner(room_code) == self.worker_id
+
+    async def create_room(self, room_code: str, room: Dict) -> bool:
+        if self.draining or not await self.store.claim_room(room_code, self.worker_id):
+            return False
+        room["seq"] = 0
+        self._own(room_code, room)
+        return True
+
+    async def claim_rooms(self, room_codes: List[str]) -> List[str]:
+        """Claim codes in bulk ahead of :meth:`restore_room`; returns the ones now ours."""
+        return await self.store.claim_rooms(room_codes, self.worker_id)
+
+    def restore_room(self, room: Dict, away: Iterable[str], seat_grace: float):
+        """Own a room read back from a snapshot, holding the seats of ``away`` until they resume.
+
+        The code must already be claimed, see :meth:`claim_rooms`.
+        """
+        room_code = room["code"]
+        self._own(room_code, room)
+        for username in away:
+            self.user_to_room[username] = room_code
+            room["away"].add(username)
+            self.wheel.schedule(("seat", (room_code, username)), seat_grace)
+
+    def _own(self, room_code: str, room: Dict):
+        room["last_active"] = self.wheel.current
+        room["events"] = deque(maxlen=self.event_buffer)
+        # Players whose socket dropped and whose seat is being held
+        room["away"] = set()
+        # Workers with spectators of this room
+        room["watchers"] = set()
+        room["buckets"] = {}
+        self.rooms[room_code] = room
+        self.actors[room_code] = RoomActor(room_code)
+        self.wheel.schedule(("room", room_code), self.room_idle_timeout)
+
+    async def close_room(self, room_code: str):
+        room = self.rooms.pop(room_code, None)
+        if room is None:
+            return
+        # Jobs already queued still run, and find the room gone
+        self.actors.pop(room_code).stop()
+        self.wheel.cancel(("room", room_code))
+        for worker in room["watchers"]:
+            if worker == self.worker_id:
+                self.spectators.end(room_code)
+            else:
+                await self._publish(worker, {"kind": "spectate_end", "room": room_code})
+        for player in room.get('players', []):
+            await self.unbind(player, room_code)
+        await self.store.release_room(room_code)
+
+    async def drain(self, timeout: float):
+        """Stop creating rooms and wait up to ``timeout`` for the jobs rooms have queued.
+
+        From here on, new jobs for rooms are dropped, so the rooms hold
+        exactly what their players were last sent until they are written out.
+        """
+        self.draining = True
+        pending = [actor.submit(asyncio.sleep, 0) for actor in self.actors.values() if actor.task is not None]
+        if pending:
+            await asyncio.wait(pending, timeout=timeout)
+
+    async def release_rooms(self, room_codes: Optional[List[str]] = None):
+        """Give up the store claims of ``room_codes``, by default every owned room, once handed off."""
+        await self.store.release_rooms(list(self.rooms) if room_codes is None else room_codes)
+
+    async def bind(self, username: str, room_code: str):
+        """Record that ``username`` plays in the owned room ``room_code``."""
+        self.user_to_room[username] = room_code
+        room = self.rooms.get(room_code)
+        if room is not None and username in room["away"]:
+            room["away"].discard(username)
+            self.wheel.cancel(("seat", (room_code, username)))
+            await self.broadcast_to_room({"type": "player_returned", "player": username}, room_code)
+        connection = self.active_connections.get(username)
+        if connection:
+            connection.room_code = room_code
+            connection.room_owner = self.worker_id
+        elif username in self.user_workers:
+            await self._publish(self.user_workers[username], {
+                "kind": "bind", "user": username, "room": room_code, "owner": self.worker_id
+            })
+
+    async def unbind(self, username: str, room_code: str):
+        if self.user_to_room.get(username) == room_code:
+            del self.user_to_room[username]
+        connection = self.active_connections.get(username)
+        if connection and connection.room_code == room_code:
+            connection.room_code = connection.room_owner = None
+        worker = self.user_workers.pop(username, None)
+        if worker and worker != self.worker_id:
+            await self._publish(worker, {"kind": "unbind", "user": username, "room": room_code})
+
+    async def leave(self, username: str):
+        """Hold ``username``'s seat for ``seat_grace`` seconds, then give it up."""
+        room_code = self.user_to_room.get(username)
+        self.user_workers.pop(username, None)
+        room = self.rooms.get(room_code)
+        if room is None or self.seat_grace <= 0:
+            await self.vacate(username)
+            return
+        room["away"].add(username)
+        self.wheel.schedule(("seat", (room_code, username)), self.seat_grace)
+        await self.broadcast_to_room({"type": "player_away", "player": username}, room_code)
+
+    async def vacate(self, username: str):
+        """Remove ``username`` from their room now."""
+        room_code = self.user_to_room.pop(username, None)
+        self.user_workers.pop(username, None)
+        room = self.rooms.get(room_code)
+        if room is None:
+            return
+        room["away"].discard(username)
+        self.wheel.cancel(("seat", (room_code, username)))
+        if room.get("status") == "playing" and "bot" not in room and username in room["players"]:
+            # The game can not go on with one player
+            if self.on_forfeit is not None:
+                await self.on_forfeit(room_code, room, username)
+            else:
+                await self.broadcast_to_room({"type": "room_closed", "reason": "forfeit"}, room_code)
+            await self.close_room(room_code)
+            return
+        if username in room.get('players', []):
+            room['players'].remove(username)
+        # A bot never leaves on its own, so its room closes with the last human
+        if len(room['players']) == 0 or 'bot' in room:
+            await self.close_room(room_code)
+
+    async def watch(self, username: str, room_code: str, view: Dict):
+        """Make ``username`` a spectator of the owned room ``room_code``, starting from ``view``."""
+        room = self.rooms[room_code]
+        connection = self.active_connections.get(username)
+        if connection is not None:
+            worker = self.worker_id
+            if connection.watching is not None and connection.watching != room_code:
+                await self.unwatch(connection)
+            self.spectators.watch(room_code, connection, view, self.worker_id)
+        else:
+            worker = self.user_workers.get(username)
+            if worker is None:
+                return
+            if username not in self.user_to_room:
+                del self.user_workers[username]
+            await self._publish(worker, {
+                "kind": "watch", "user": username, "room": room_code, "view": view, "owner": self.worker_id
+            })
+        room["watchers"].add(worker)
+
+    async def unwatch(self, connection: Connection):
+        feed = self.spectators.unwatch(connection)
+        if feed is None:
+            return
+        # Nobody here watches that room any more
+        if feed.owner == self.worker_id:
+            room = self.rooms.get(feed.room_code)
+            if room is not None:
+                room["watchers"].discard(self.worker_id)
+        else:
+            await self._publish(feed.owner, {"kind": "unwatch", "room": feed.room_code, "worker": self.worker_id})
+
+    async def run_in_room(self, room_code: Optional[str], fn: Callable[..., Awaitable], *args):
+        """Await ``fn(*args)`` as a job on the room's actor, or directly if it has none."""
+        actor = self.actors.get(room_code)
+        if actor is None or actor.is_current():
+            return await fn(*args)
+        if self.draining:
+            return None
+        return await actor.submit(fn, *args)
+
+    def post_to_room(self, room_code: str, fn: Callable[..., Awaitable], *args):
+        """Queue ``fn(*args)`` on the room's actor without waiting; dropped if the room is gone."""
+        actor = self.actors.get(room_code)
+        if actor is not None and not self.draining:
+            actor.post(fn, *args)
+
+    # Routing
+
+    async def route(self, connection: Connection, message: Dict):
+        """Run ``message`` on the worker that owns the room it targets."""
+        if connection.closed:
+            # Frames still buffered after the socket was dropped
+            return
+        connection.last_seen = self.wheel.current
+        msg_type = message.get("type")
+        if not self.rate_limits.allow(connection.buckets, msg_type):
+            await self._throttle(connection, msg_type)
+            return
+        connection.throttled = False
+        if msg_type == "pong":
+            return
+        if msg_type in ROOM_TARGETED_TYPES and type(message.get("room_code")) is str:
+            if self.ring is not None:
+                owner = self.ring.owner(message["room_code"])
+            else:
+                owner = await self.store.room_owner(message["room_code"])
+        else:
+            owner = connection.room_owner
+        if owner is None or owner == self.worker_id:
+            await self._dispatch_local(connection.username, message)
+        else:
+            self.forwarded_frames += 1
+            await self._publish(owner, {
+                "kind": "frame", "from": connection.username, "worker": self.worker_id, "message": message
+            })
+
+    async def _dispatch_local(self, username: str, message: Dict, wait: bool = True):
+        """Run ``message`` on the actor of the room it acts on, or right here if none.
+
+        With ``wait`` False the frame is only queued, and protocol errors
+        are reported to ``username`` instead of raised.
+        """
+        room_code = message.get("room_code") if message.get("type") in ROOM_TARGETED_TYPES else None
+        if type(room_code) is not str:
+            room_code = self.user_to_room.get(username)
+        room = self.rooms.get(room_code)
+        if room is None and room_code is not None and self.load_room is not None:
+            room = await self.load_room(room_code)
+        if room is not None:
+            room["last_active"] = self.wheel.current
+            if not self.room_rate_limits.allow(room["buckets"], message.get("type")):
+                self._count_throttled(message.get("type"))
+                await self.send_personal_message({"type": "error", "message": "Room rate limit exceeded"}, username)
+                return
+        handler = self.dispatch if wait else self._dispatch_reporting_errors
+        actor = self.actors.get(room_code)
+        if actor is None or actor.is_current():
+            await handler(username, message)
+        elif self.draining:
+            # The player resumes into the restored room after the restart
+            return
+        elif wait:
+            await actor.submit(handler, username, message)
+        else:
+            actor.post(handler, username, message)
+
+    async def _dispatch_reporting_errors(self, username: str, message: Dict):
+        try:
+            await self.dispatch(username, message)
+        except ProtocolError as e:
+            await self.send_personal_message({"type": "error", "message": str(e)}, username)
+
+    async def _throttle(self, connection: Connection, msg_type):
+        self._count_throttled(msg_type)
+        if not connection.strikes.take():
+            logger.warning(f"Disconnecting {connection.username} for exceeding rate limits")
+            self.throttle_disconnects += 1
+            connection.abort(code=1008)
+            await self.disconnect(connection.username, connection)
+            return
+        # One error per run of throttled frames, so the reply is not a flood too
+        if not connection.throttled:
+            connection.throttled = True
+            error = connection.codec.encode({"type": "error", "message": "Rate limit exceeded"})
+            connection.send(error, droppable=True)
+
+    def _count_throttled(self, msg_type):
+        key = self.rate_limits.key(msg_type) or self.room_rate_limits.key(msg_type) or "*"
+        self.throttled_messages[key] = self.throttled_messages.get(key, 0) + 1
+
+    async def _publish(self, worker_id: str, envelope: Dict):
+        await self.store.publish(worker_channel(worker_id), json_dumps(envelope).encode())
+
+    async def _process_inbox(self):
+        while True:
+            data = await self.inbox.get()
+            try:
+                await self._handle_envelope(json_loads(data))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to handle forwarded envelope: {e}")
+
+    async def _handle_envelope(self, envelope: Dict):
+        kind = envelope["kind"]
+        if kind == "frame":
+            username = envelope["from"]
+            self.user_workers[username] = envelope["worker"]
+            # Queued, so a busy room does not hold up envelopes for the others
+            await self._dispatch_local(username, envelope["message"], wait=False)
+        elif kind == "leave":
+            username = envelope["from"]
+            await self.run_in_room(self.user_to_room.get(username), self.leave, username)
+        elif kind == "deliver":
+            self._deliver(envelope["message"], envelope["to"])
+        elif kind == "bind":
+            connection = self.active_connections.get(envelope["user"])
+            if connection:
+                connection.room_code = envelope["room"]
+                connection.room_owner = envelope["owner"]
+        elif kind == "unbind":
+            connection = self.active_connections.get(envelope["user"])
+            if connection and connection.room_code == envelope["room"]:
+                connection.room_code = connection.room_owner = None
+        elif kind == "spectate":
+            self.spectators.publish(envelope["room"], envelope["message"])
+        elif kind == "watch":
+            connection = self.active_connections.get(envelope["user"])
+            if connection:
+                if connection.watching is not None and connection.watching != envelope["room"]:
+                    await self.unwatch(connection)
+                self.spectators.watch(envelope["room"], connection, envelope["view"], envelope["owner"])
+        elif kind == "unwatch":
+            room = self.rooms.get(envelope["room"])
+            if room is not None:
+                room["watchers"].discard(envelope["worker"])
+        elif kind == "spectate_end":
+            self.spectators.end(envelope["room"])
+
+    # Timers
+
+    async def _run_timers(self):
+        while True:
+            await asyncio.sleep(self.wheel.tick)
+            await self.expire_timers()
+
+    async def expire_timers(self):
+        for kind, key in self.wheel.advance():
+            try:
+                if kind == "conn":
+                    await self._check_connection(key)
+                elif kind == "seat":
+                    self.post_to_room(key[0], self._check_seat, *key)
+                else:
+                    self.post_to_room(key, self._check_room, key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Timer for {kind} {key} failed: {e}")
+
+    async def _check_connection(self, username: str):
+        connection = self.active_connections.get(username)
+        if connection is None:
+            return
+        silent = (self.wheel.current - connection.last_seen) * self.wheel.tick
+        if silent >= self.heartbeat_timeout:
+            logger.info(f"Reaping unresponsive connection {username}")
+            self.reaped_connections += 1
+            connection.abort(code=1001)
+            await self.disconnect(username)
+            return
+        connection.send(connection.codec.encode({"type": "ping"}), droppable=True)
+        self.wheel.schedule(("conn", username), self.ping_interval)
+
+    async def _check_room(self, room_code: str):
+        room = self.rooms.get(room_code)
+        if room is None:
+            return
+        idle = (self.wheel.current - room["last_active"]) * self.wheel.tick
+        if idle < self.room_idle_timeout:
+            self.wheel.schedule(("room", room_code), self.room_idle_timeout - idle)
+            return
+        logger.info(f"Reaping idle room {room_code}")
+        self.reaped_rooms += 1
+        await self.broadcast_to_room({"type": "room_closed", "reason": "idle"}, room_code)
+        await self.close_room(room_code)
+
+    async def _check_seat(self, room_code: str, username: str):
+        room = self.rooms.get(room_code)
+        if room is not None and username in room["away"] and self.user_to_room.get(username) == room_code:
+            await self.vacate(username)
+
+    def events_since(self, room_code: str, last_seq: int) -> Optional[List[Dict]]:
+        """Room events after ``last_seq``, or None if the ring buffer no longer has them all."""
+        room = self.rooms[room_code]
+        if last_seq >= room["seq"]:
+            return []
+        events = room["events"]
+        if not events or events[0]["seq"] > last_seq + 1:
+            return None
+        return list(islice(events, last_seq + 1 - events[0]["seq"], None))
+
+    # Outbound
+
+    def _deliver(self, message: Dict, usernames) -> List[str]:
+        """Send to the local sockets among ``usernames``; return the rest."""
+        droppable = message.get("type") in DROPPABLE_TYPES
+        payloads = {}
+        remote = []
+        for username in usernames:
+            connection = self.active_connections.get(username)
+            if connection is None:
+                remote.append(username)
+                continue
+            codec = connection.codec
+            payload = payloads.get(codec)
+            if payload is None:
+                payload = payloads[codec] = codec.encode(message)
+            connection.send(payload, droppable)
+        return remote
+
+    async def send_personal_message(self, message: dict, username: str):
+        await self.send_to_users(message, (username,))
+
+    async def send_to_users(self, message: dict, usernames):
+        remote = self._deliver(message, usernames)
+        if not remote:
+            return
+        by_worker: Dict[str, List[str]] = {}
+        for username in remote:
+            worker = self.user_workers.get(username)
+            if worker and worker != self.worker_id:
+                by_worker.setdefault(worker, []).append(username)
+        for worker, users in by_worker.items():
+            await self._publish(worker, {"kind": "deliver", "to": users, "message": message})
+
+    async def broadcast_to_room(self, message: dict, room_code: str):
+        room = self.rooms.get(room_code)
+        if room:
+            room["seq"] += 1
+            message["seq"] = room["seq"]
+            room["events"].append(message)
+            start = time.perf_counter()
+            await self.send_to_users(message, room.get('players', []))
+            BROADCAST_SECONDS.observe(time.perf_counter() - start)
+            for worker in room["watchers"]:
+                if worker == self.worker_id:
+                    self.spectators.publish(room_code, message)
+                else:
+                    await self._publish(worker, {"kind": "spectate", "room": room_code, "message": message})
+
+    def stats(self) -> Dict:
+        return {
+            "worker_id": self.worker_id,
+            "active_connections": len(self.active_connections),
+            "rooms": len(self.rooms),
+            "room_actor_backlog": sum(actor.backlog() for actor in self.actors.values()),
+            "queued_frames": sum(len(c.queue) for c in self.active_connections.values()),
+            "slow_consumer_events": self.slow_consumer_events,
+            "dropped_messages": self.dropped_messages,
+            "forwarded_frames": self.forwarded_frames,
+            "reaped_connections": self.reaped_connections,
+            "reaped_rooms": self.reaped_rooms,
+            "timers": len(self.wheel),
+            "throttled_messages": sum(self.throttled_messages.values()),
+            "throttle_disconnects": self.throttle_disconnects,
+            "spectators": self.spectators.stats(),
+        }
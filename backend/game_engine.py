@@ -0,0 +1,149 @@
+"""Bitboard game engine for 10x10 Battleship boards.
+
+A board is a handful of Python ints: one 100-bit mask per ship, a combined
+occupancy mask and a shots mask. Cell (x, y) maps to bit ``y * BOARD_SIZE + x``.
+Hit, sunk and win are resolved with bit operations and per-ship remaining-cell
+counters, so a shot costs O(1) regardless of how the fleet is laid out.
+
+Every legal placement of every ship length is precomputed as a mask, so
+checking that a client's ship is straight, contiguous and on the board is a
+single set lookup, and overlap is one AND against the ships placed so far.
+"""
+from typing import Dict, FrozenSet, List, NamedTuple, Optional
+
+BOARD_SIZE = 10
+CELL_COUNT = BOARD_SIZE * BOARD_SIZE
+
+# Standard fleet, in the order the frontend places it
+FLEET = (
+    ("Carrier", 5),
+    ("Battleship", 4),
+    ("Cruiser", 3),
+    ("Submarine", 3),
+    ("Destroyer", 2),
+)
+
+
+FLEET_LENGTHS = dict(FLEET)
+
+
+class PlacementError(ValueError):
+    """A ``place_ships`` payload is not a legal layout of the standard fleet."""
+
+
+def cell_index(x, y) -> int:
+    """Return the bit index for (x, y), or -1 when the cell is off the board."""
+    if type(x) is not int or type(y) is not int:
+        return -1
+    if not (0 <= x < BOARD_SIZE and 0 <= y < BOARD_SIZE):
+        return -1
+    return y * BOARD_SIZE + x
+
+
+def mask_cells(mask: int) -> List[int]:
+    """Return the bit indexes set in ``mask``, lowest first."""
+    cells = []
+    while mask:
+        low = mask & -mask
+        cells.append(low.bit_length() - 1)
+        mask ^= low
+    return cells
+
+
+def placement_masks(length: int) -> List[int]:
+    """Every straight, in-bounds placement of a ship of ``length``, horizontal ones first."""
+    masks = []
+    for y in range(BOARD_SIZE):
+        for x in range(BOARD_SIZE - length + 1):
+            masks.append(sum(1 << (y * BOARD_SIZE + x + i) for i in range(length)))
+    if length > 1:
+        for y in range(BOARD_SIZE - length + 1):
+            for x in range(BOARD_SIZE):
+                masks.append(sum(1 << ((y + i) * BOARD_SIZE + x) for i in range(length)))
+    return masks
+
+
+PLACEMENT_MASKS: Dict[int, List[int]] = {length: placement_masks(length) for length in set(FLEET_LENGTHS.values())}
+LEGAL_PLACEMENTS: Dict[int, FrozenSet[int]] = {length: frozenset(masks) for length, masks in PLACEMENT_MASKS.items()}
+
+
+class ShotResult(NamedTuple):
+    hit: bool
+    sunk_ship: Optional[str]
+    won: bool
+    repeat: bool
+
+
+class Board:
+    """Ship layout and shot state for one player's board."""
+
+    __slots__ = ("names", "ship_masks", "remaining", "occupancy", "shots", "ships_left")
+
+    def __init__(self, names: List[str], ship_masks: List[int], shots: int = 0):
+        """``shots`` marks cells already fired at, for a game restored in progress."""
+        self.names = names
+        self.ship_masks = ship_masks
+        self.remaining = [bin(m & ~shots).count("1") for m in ship_masks]
+        self.occupancy = 0
+        for m in ship_masks:
+            self.occupancy |= m
+        self.shots = shots
+        self.ships_left = sum(1 for r in self.remaining if r)
+
+    @classmethod
+    def from_placement(cls, ships) -> "Board":
+        """Build a board from a ``place_ships`` payload after checking it is a legal standard fleet.
+
+        The payload must name each ship of :data:`FLEET` once, each with
+        exactly its length in coordinates, forming a straight unbroken line
+        on the board that does not overlap another ship. Sizes are checked
+        before anything inside is read, so an oversized payload costs
+        nothing. Raises :class:`PlacementError`.
+        """
+        if type(ships) is not dict or len(ships) != len(FLEET):
+            raise PlacementError("Place exactly one of each ship")
+        names = []
+        masks = []
+        occupied = 0
+        for name, length in FLEET:
+            ship_data = ships.get(name)
+            coords = ship_data.get("coords") if type(ship_data) is dict else None
+            if type(coords) is not list or len(coords) != length:
+                raise PlacementError(f"{name} must have {length} cells")
+            mask = 0
+            for coord in coords:
+                index = cell_index(coord.get("x"), coord.get("y")) if type(coord) is dict else -1
+                if index < 0:
+                    raise PlacementError(f"{name} is off the board")
+                mask |= 1 << index
+            if mask not in LEGAL_PLACEMENTS[length]:
+                raise PlacementError(f"{name} must be a straight line of {length} cells")
+            if mask & occupied:
+                raise PlacementError(f"{name} overlaps another ship")
+            occupied |= mask
+            names.append(name)
+            masks.append(mask)
+        return cls(names, masks)
+
+    @property
+    def hits(self) -> int:
+        return self.shots & self.occupancy
+
+    def fire(self, index: int) -> ShotResult:
+        """Resolve a shot at bit ``index`` (see :func:`cell_index`)."""
+        bit = 1 << index
+        if self.shots & bit:
+            return ShotResult(bool(self.occupancy & bit), None, self.ships_left == 0, True)
+        self.shots |= bit
+        if not self.occupancy & bit:
+            return ShotResult(False, None, self.ships_left == 0, False)
+
+        sunk_ship = None
+        for i, mask in enumerate(self.ship_masks):
+            if mask & bit:
+                self.remaining[i] -= 1
+                if self.remaining[i] == 0:
+                    sunk_ship = self.names[i]
+                    self.ships_left -= 1
+                break
+        return ShotResult(True, sunk_ship, self.ships_left == 0, False)
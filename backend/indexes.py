@@ -0,0 +1,57 @@
+"""Indexes behind every query on a hot path, created at startup.
+
+Each collection's indexes are declared here once: the startup hook creates
+them (``create_indexes`` is a no-op for ones that already exist) and
+``tests/test_query_plans.py`` builds the same set in a real MongoDB to
+check that the hot queries are planned as index scans.
+
+* ``users.username`` is unique: every login, registration and token
+  lookup is a point query on it, and it backs the duplicate check on
+  registration.
+* ``games.id`` is unique: the write-behind queue upserts games by id, so
+  a batch written twice can not store a game twice. A database created
+  before this has a non-unique ``id_1`` that has to be dropped by hand;
+  until then creating the games indexes fails and is logged.
+* Game history is ``player1 = u OR player2 = u`` newest first; one index
+  per seat in page order lets the server merge two index scans instead of
+  scanning and sorting the collection (see :mod:`history`).
+"""
+import logging
+from typing import Dict, List
+
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+
+from leaderboard import LEADERBOARD_INDEX
+
+logger = logging.getLogger(__name__)
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel("username", unique=True),
+        IndexModel(LEADERBOARD_INDEX),
+    ],
+    "games": [
+        IndexModel("id", unique=True),
+        IndexModel([("player1", 1), ("finished_at", -1), ("id", -1)]),
+        IndexModel([("player2", 1), ("finished_at", -1), ("id", -1)]),
+        # The export pages through every game by finish time
+        IndexModel([("finished_at", 1), ("id", 1)]),
+    ],
+    "player_stats": [IndexModel("username", unique=True)],
+    "head_to_head": [
+        IndexModel("pair", unique=True),
+        IndexModel([("players", 1), ("games", -1)]),
+    ],
+}
+
+
+async def ensure_indexes(db):
+    """Create every index in :data:`INDEXES`; a collection that fails is logged, not fatal."""
+    for name, indexes in INDEXES.items():
+        try:
+            await db[name].create_indexes(indexes)
+        except OperationFailure as e:
+            # e.g. duplicate usernames from before the unique index; the
+            # server still runs, with that collection's queries unindexed
+            logger.error(f"Could not create indexes on {name}: {e}")
@@ -0,0 +1,122 @@
+"""Leaderboard ranking and the in-process top-N cache.
+
+Players are ranked by wins, then win rate. For equal wins a higher win rate
+means fewer games played, so the ranking is the plain sort
+``(wins desc, games_played asc, username asc)``, which the index in
+``LEADERBOARD_INDEX`` serves directly.
+"""
+import bisect
+import time
+from typing import Callable, Dict, List, Tuple
+
+LEADERBOARD_INDEX = [("wins", -1), ("games_played", 1), ("username", 1)]
+STATS_PROJECTION = {"_id": 0, "username": 1, "wins": 1, "losses": 1, "games_played": 1}
+
+
+def leaderboard_pipeline(offset: int, limit: int) -> List[Dict]:
+    return [
+        {"$sort": {"wins": -1, "games_played": 1, "username": 1}},
+        {"$skip": offset},
+        {"$limit": limit},
+        {"$project": STATS_PROJECTION},
+    ]
+
+
+def make_entry(user: Dict) -> Dict:
+    games_played = user.get("games_played", 0)
+    wins = user.get("wins", 0)
+    win_rate = wins / games_played * 100 if games_played > 0 else 0
+    return {
+        "username": user["username"],
+        "wins": wins,
+        "losses": user.get("losses", 0),
+        "games_played": games_played,
+        "win_rate": round(win_rate, 2),
+    }
+
+
+def rank_key(entry: Dict) -> Tuple:
+    return (-entry["wins"], entry["games_played"], entry["username"])
+
+
+class LeaderboardCache:
+    """Holds exactly the top ``len(entries)`` players, at most ``capacity``.
+
+    Game-over stat changes are applied in place with :meth:`apply`. A player
+    who drops below the cached tail is evicted, which only shrinks the cached
+    prefix; reads that reach past it fall through to Mongo and reload.
+
+    Changes made by other workers only arrive if they are announced, so
+    a cache older than ``max_age`` seconds is reloaded on the next read
+    in case an announcement was lost. ``max_age`` 0 keeps it forever.
+    """
+
+    def __init__(self, capacity: int = 100, max_age: float = 0, clock: Callable[[], float] = time.monotonic):
+        self.capacity = capacity
+        self.max_age = max_age
+        self.clock = clock
+        self.entries: List[Dict] = []
+        self.keys: List[Tuple] = []
+        self.loaded = False
+        self.loaded_at = 0.0
+        # True when the cache holds every user, so any change can be inserted
+        self.exhaustive = False
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, users, offset: int, limit: int) -> List[Dict]:
+        end = offset + limit
+        if self.loaded and self.max_age and self.clock() - self.loaded_at > self.max_age:
+            self.loaded = False
+        if self.loaded and (end <= len(self.entries) or self.exhaustive):
+            self.hits += 1
+            return self.entries[offset:end]
+
+        self.misses += 1
+        if end > self.capacity:
+            docs = await users.aggregate(leaderboard_pipeline(offset, limit)).to_list(limit)
+            return [make_entry(doc) for doc in docs]
+        await self.load(users)
+        return self.entries[offset:end]
+
+    async def load(self, users):
+        docs = await users.aggregate(leaderboard_pipeline(0, self.capacity)).to_list(self.capacity)
+        self.entries = [make_entry(doc) for doc in docs]
+        self.keys = [rank_key(entry) for entry in self.entries]
+        self.exhaustive = len(self.entries) < self.capacity
+        self.loaded = True
+        self.loaded_at = self.clock()
+
+    def apply(self, user: Dict):
+        """Fold a user's updated stats into the cached ranking."""
+        if not self.loaded:
+            return
+        username = user["username"]
+        for i, entry in enumerate(self.entries):
+            if entry["username"] == username:
+                del self.entries[i]
+                del self.keys[i]
+                break
+
+        entry = make_entry(user)
+        key = rank_key(entry)
+        # Everyone outside a non-exhaustive cache ranks below the tail
+        if not self.exhaustive and (not self.keys or key > self.keys[-1]):
+            return
+        i = bisect.bisect_left(self.keys, key)
+        self.keys.insert(i, key)
+        self.entries.insert(i, entry)
+        if len(self.entries) > self.capacity:
+            self.entries.pop()
+            self.keys.pop()
+            self.exhaustive = False
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,138 @@
+"""Rating-based matchmaking queue and Elo updates.
+
+Waiting players sit in buckets of ``bucket_width`` rating points. The indexes
+of non-empty buckets are kept in a sorted list, so the buckets inside a
+search window are found with two bisects and only those buckets are looked
+at. A player's window starts at ``initial_window``. It widens by
+``widen_step`` every ``widen_interval`` seconds, up to ``max_window``, and a
+periodic :meth:`MatchQueue.sweep` retries everyone whose window has grown.
+
+Two players in the same bucket are always within ``initial_window`` of each
+other when ``bucket_width <= initial_window``, so they pair on arrival and
+buckets stay short no matter how many players are queued.
+"""
+import bisect
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+DEFAULT_RATING = 1200
+ELO_K = 32
+
+
+def elo_delta(winner_rating: float, loser_rating: float, k: int = ELO_K) -> int:
+    """Points the winner gains and the loser gives up."""
+    expected = 1 / (1 + 10 ** ((loser_rating - winner_rating) / 400))
+    return max(1, round(k * (1 - expected)))
+
+
+class MatchQueue:
+    def __init__(
+        self,
+        bucket_width: int = 50,
+        initial_window: int = 50,
+        widen_step: int = 50,
+        widen_interval: float = 5.0,
+        max_window: int = 1000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.bucket_width = bucket_width
+        self.initial_window = initial_window
+        self.widen_step = widen_step
+        self.widen_interval = widen_interval
+        self.max_window = max_window
+        self.clock = clock
+        # bucket index -> username -> rating, oldest first
+        self.buckets: Dict[int, "OrderedDict[str, int]"] = {}
+        self.bucket_keys: List[int] = []
+        # username -> (rating, joined_at), in join order
+        self.waiting: Dict[str, Tuple[int, float]] = {}
+        self.matched = 0
+        self.wait_total = 0.0
+
+    def __len__(self) -> int:
+        return len(self.waiting)
+
+    def __contains__(self, username: str) -> bool:
+        return username in self.waiting
+
+    def window(self, joined: float, now: float) -> int:
+        steps = int((now - joined) / self.widen_interval)
+        return min(self.max_window, self.initial_window + steps * self.widen_step)
+
+    def add(self, username: str, rating: int) -> Optional[Tuple[str, str]]:
+        """Queue ``username``, or return ``(opponent, username)`` if someone fits now."""
+        self.remove(username)
+        now = self.clock()
+        opponent = self._find(username, rating, self.initial_window)
+        if opponent is not None:
+            self._pop(opponent, now)
+            self.matched += 1
+            return opponent, username
+        bucket = rating // self.bucket_width
+        entries = self.buckets.get(bucket)
+        if entries is None:
+            entries = self.buckets[bucket] = OrderedDict()
+            bisect.insort(self.bucket_keys, bucket)
+        entries[username] = rating
+        self.waiting[username] = (rating, now)
+        return None
+
+    def remove(self, username: str) -> bool:
+        entry = self.waiting.pop(username, None)
+        if entry is None:
+            return False
+        bucket = entry[0] // self.bucket_width
+        entries = self.buckets[bucket]
+        del entries[username]
+        if not entries:
+            del self.buckets[bucket]
+            del self.bucket_keys[bisect.bisect_left(self.bucket_keys, bucket)]
+        return True
+
+    def sweep(self) -> List[Tuple[str, str]]:
+        """Retry players whose window has widened; return the new pairs, longest waiting first."""
+        now = self.clock()
+        due = []
+        for username, (rating, joined) in self.waiting.items():
+            window = self.window(joined, now)
+            if window <= self.initial_window:
+                # Join order means everyone after this has waited less
+                break
+            due.append((username, rating, window))
+        pairs = []
+        for username, rating, window in due:
+            if username not in self.waiting:
+                continue
+            opponent = self._find(username, rating, window)
+            if opponent is not None:
+                self._pop(username, now)
+                self._pop(opponent, now)
+                pairs.append((username, opponent))
+        return pairs
+
+    def _find(self, username: str, rating: int, window: int) -> Optional[str]:
+        keys = self.bucket_keys
+        lo = bisect.bisect_left(keys, (rating - window) // self.bucket_width)
+        hi = bisect.bisect_right(keys, (rating + window) // self.bucket_width)
+        best, best_diff = None, window + 1
+        for bucket in keys[lo:hi]:
+            for candidate, candidate_rating in self.buckets[bucket].items():
+                diff = abs(candidate_rating - rating)
+                if candidate != username and diff < best_diff:
+                    best, best_diff = candidate, diff
+                    break
+        return best
+
+    def _pop(self, username: str, now: float):
+        self.wait_total += now - self.waiting[username][1]
+        self.matched += 1
+        self.remove(username)
+
+    def stats(self) -> Dict:
+        return {
+            "waiting": len(self.waiting),
+            "buckets": len(self.bucket_keys),
+            "matched": self.matched,
+            "mean_wait_seconds": round(self.wait_total / self.matched, 3) if self.matched else 0.0,
+        }
@@ -0,0 +1,213 @@
+"""Prometheus metrics with no allocation on the hot path.
+
+Metrics are module-level objects in ``REGISTRY``. Histograms keep a fixed
+tuple of bucket bounds and a preallocated list of counts, so ``observe`` is a
+bisect plus two additions. Labelled families hand out children once (at
+registration time for known label values) and callers keep the child.
+Gauges whose value already lives elsewhere take a callback that is only
+evaluated at scrape time.
+"""
+import asyncio
+import bisect
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SLOW_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+    def samples(self, name, labels):
+        yield name + labels, self.value
+
+
+class Gauge:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value: float):
+        self.value = value
+
+    def samples(self, name, labels):
+        yield name + labels, self.value
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, label_names, label_values):
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            yield name + "_bucket" + _format_labels(label_names, label_values, f'le="{bound}"'), cumulative
+        yield name + "_bucket" + _format_labels(label_names, label_values, 'le="+Inf"'), self.count
+        labels = _format_labels(label_names, label_values)
+        yield name + "_sum" + labels, self.sum
+        yield name + "_count" + labels, self.count
+
+
+class Family:
+    """A named metric, optionally split by labels."""
+
+    def __init__(self, kind: str, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS, callback: Optional[Callable] = None):
+        self.kind = kind
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.buckets = buckets
+        # callback() returns a number, or {label values tuple: number} for labelled families
+        self.callback = callback
+        self.children: Dict[Tuple[str, ...], object] = {}
+        if not self.label_names and callback is None:
+            self.children[()] = self._new_child()
+
+    def _new_child(self):
+        if self.kind == "histogram":
+            return Histogram(self.buckets)
+        if self.kind == "counter":
+            return Counter()
+        return Gauge()
+
+    def labels(self, *values: str):
+        """Return the child for ``values``; look it up once and keep it."""
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = self._new_child()
+        return child
+
+    # Unlabelled shortcuts
+    def inc(self, amount: int = 1):
+        self.children[()].inc(amount)
+
+    def set(self, value: float):
+        self.children[()].set(value)
+
+    def observe(self, value: float):
+        self.children[()].observe(value)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        if self.callback is not None:
+            value = self.callback()
+            if isinstance(value, dict):
+                for label_values, v in value.items():
+                    yield f"{self.name}{_format_labels(self.label_names, label_values)} {_format_value(v)}"
+            else:
+                yield f"{self.name} {_format_value(value)}"
+            return
+        for label_values, child in list(self.children.items()):
+            if self.kind == "histogram":
+                samples = child.samples(self.name, self.label_names, label_values)
+            else:
+                samples = child.samples(self.name, _format_labels(self.label_names, label_values))
+            for sample_name, value in samples:
+                yield f"{sample_name} {_format_value(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self.families: List[Family] = []
+
+    def _add(self, family: Family) -> Family:
+        self.families.append(family)
+        return family
+
+    def counter(self, name, help_text, labels=(), callback=None) -> Family:
+        return self._add(Family("counter", name, help_text, labels, callback=callback))
+
+    def gauge(self, name, help_text, labels=(), callback=None) -> Family:
+        return self._add(Family("gauge", name, help_text, labels, callback=callback))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS) -> Family:
+        return self._add(Family("histogram", name, help_text, labels, buckets=buckets))
+
+    def render(self) -> str:
+        lines = []
+        for family in self.families:
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+WS_HANDLER_SECONDS = REGISTRY.histogram(
+    "battleship_ws_handler_seconds", "WebSocket message handler latency by message type", ["msg_type"])
+BROADCAST_SECONDS = REGISTRY.histogram(
+    "battleship_broadcast_seconds", "Time to fan a message out to its recipients")
+MONGO_SECONDS = REGISTRY.histogram(
+    "battleship_mongo_seconds", "Mongo command latency by collection and operation", ["collection", "op"])
+MONGO_ERRORS = REGISTRY.counter(
+    "battleship_mongo_errors_total", "Failed Mongo commands by collection and operation", ["collection", "op"])
+BCRYPT_SECONDS = REGISTRY.histogram(
+    "battleship_bcrypt_seconds", "Time spent hashing or verifying a password", buckets=SLOW_BUCKETS)
+EVENT_LOOP_LAG_SECONDS = REGISTRY.histogram(
+    "battleship_event_loop_lag_seconds", "Sampled delay between a timer's due time and when it ran")
+EVENT_LOOP_STALL_SECONDS = REGISTRY.histogram(
+    "battleship_event_loop_stall_seconds", "Length of each stretch the event loop was blocked past the stall threshold",
+    buckets=SLOW_BUCKETS)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Feeds MONGO_SECONDS from pymongo's command monitoring events."""
+
+    def __init__(self):
+        # request_id -> collection, for commands in flight
+        self.in_flight: Dict[int, str] = {}
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        self.in_flight[event.request_id] = target if isinstance(target, str) else ""
+
+    def succeeded(self, event):
+        collection = self.in_flight.pop(event.request_id, "")
+        MONGO_SECONDS.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self.in_flight.pop(event.request_id, "")
+        MONGO_ERRORS.labels(collection, event.command_name).inc()
+
+
+async def sample_event_loop_lag(interval: float = 0.5):
+    """Record how late a periodic timer fires; run as a background task."""
+    loop = asyncio.get_running_loop()
+    while True:
+        due = loop.time() + interval
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - due))
@@ -0,0 +1,147 @@
+"""Compact binary encoding of a finished game's placements and shots.
+
+Shots take one byte each, in the order they were fired: the low seven bits
+are the cell index (see :func:`game_engine.cell_index`) and the high bit is
+set for a hit. Turns alternate after every shot, so the shooter is implied
+by who fired first.
+
+A fleet is packed as a kind byte followed by the ships in fleet order:
+
+* ``FLEET_STANDARD``: the standard :data:`game_engine.FLEET` laid out as
+  straight lines, one byte per ship holding ``start_cell << 1 | vertical``.
+* ``FLEET_MASKS``: anything else, as a ship count and then per ship a
+  length-prefixed UTF-8 name and its 13-byte cell mask.
+
+A standard game therefore stores 5 bytes per fleet plus one byte per shot.
+"""
+import base64
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from game_engine import BOARD_SIZE, CELL_COUNT, FLEET, LEGAL_PLACEMENTS, PLACEMENT_MASKS, Board, mask_cells
+
+HIT_BIT = 0x80
+FLEET_STANDARD = 0
+FLEET_MASKS = 1
+MASK_BYTES = (CELL_COUNT + 7) // 8
+
+
+def pack_shot(index: int, hit: bool) -> int:
+    return index | HIT_BIT if hit else index
+
+
+def _line(mask: int, length: int) -> Optional[int]:
+    """Return ``start << 1 | vertical`` if ``mask`` is a straight ship of ``length``."""
+    if mask not in LEGAL_PLACEMENTS.get(length, ()):
+        return None
+    start = (mask & -mask).bit_length() - 1
+    return start << 1 | (mask >> (start + BOARD_SIZE)) & 1
+
+
+# length -> packed line byte -> ship mask and back, so a standard fleet packs
+# and unpacks with five dict lookups
+LINE_MASKS: Dict[int, Dict[int, int]] = {
+    length: {_line(mask, length): mask for mask in masks} for length, masks in PLACEMENT_MASKS.items()
+}
+MASK_LINES: Dict[int, Dict[int, int]] = {
+    length: {mask: line for line, mask in lines.items()} for length, lines in LINE_MASKS.items()
+}
+# The same tables for each ship of the standard fleet in order
+_FLEET_NAMES = [name for name, _ in FLEET]
+_FLEET_LINE_MASKS = [LINE_MASKS[length] for _, length in FLEET]
+_FLEET_MASK_LINES = [MASK_LINES[length] for _, length in FLEET]
+
+
+def pack_fleet(board: Board) -> bytes:
+    if board.names == _FLEET_NAMES:
+        lines = list(map(dict.get, _FLEET_MASK_LINES, board.ship_masks))
+        if None not in lines:
+            return bytes([FLEET_STANDARD, *lines])
+    packed = bytearray([FLEET_MASKS, len(board.names)])
+    for name, mask in zip(board.names, board.ship_masks):
+        encoded = name.encode()
+        packed.append(len(encoded))
+        packed += encoded
+        packed += mask.to_bytes(MASK_BYTES, "little")
+    return bytes(packed)
+
+
+def unpack_fleet(data: bytes, shots: int = 0) -> Board:
+    if data[0] == FLEET_STANDARD:
+        return Board(_FLEET_NAMES.copy(), list(map(dict.__getitem__, _FLEET_LINE_MASKS, data[1:])), shots)
+    names, masks = [], []
+    offset = 2
+    for _ in range(data[1]):
+        size = data[offset]
+        names.append(data[offset + 1:offset + 1 + size].decode())
+        offset += 1 + size
+        masks.append(int.from_bytes(data[offset:offset + MASK_BYTES], "little"))
+        offset += MASK_BYTES
+    return Board(names, masks, shots)
+
+
+def shots_by_player(first_turn: str, second: str, moves: bytes) -> Dict[str, List[Tuple[int, int, bool]]]:
+    """Player -> ``(x, y, hit)`` for each of their shots, from a game's packed moves."""
+    shots = {first_turn: [], second: []}
+    shooter, other = first_turn, second
+    for byte in moves:
+        index = byte & ~HIT_BIT
+        shots[shooter].append((index % BOARD_SIZE, index // BOARD_SIZE, bool(byte & HIT_BIT)))
+        shooter, other = other, shooter
+    return shots
+
+
+def fleet_cells(board: Board) -> Dict[str, List[List[int]]]:
+    """Ship name -> ``[x, y]`` cells, for replay output."""
+    return {
+        name: [[i % BOARD_SIZE, i // BOARD_SIZE] for i in mask_cells(mask)]
+        for name, mask in zip(board.names, board.ship_masks)
+    }
+
+
+def replay_events(game: Dict) -> Iterator[Dict]:
+    """Yield a stored game as events: ``game``, one ``placement`` per player, then each ``shot``.
+
+    Sunk ships are worked out again by firing the shots at the unpacked
+    boards, so they are not stored.
+    """
+    players = [game["player1"], game["player2"]]
+    yield {
+        "type": "game",
+        "id": game["id"],
+        "players": players,
+        "winner": game["winner"],
+        "duration_seconds": game["duration_seconds"],
+        "finished_at": game["finished_at"],
+    }
+    boards = {}
+    for player, packed in zip(players, game["fleets"]):
+        boards[player] = unpack_fleet(packed)
+        yield {"type": "placement", "player": player, "ships": fleet_cells(boards[player])}
+    shooter = game["first_turn"]
+    for n, byte in enumerate(game["moves"]):
+        index = byte & ~HIT_BIT
+        target = players[1] if shooter == players[0] else players[0]
+        shot = boards[target].fire(index)
+        yield {
+            "type": "shot",
+            "n": n,
+            "player": shooter,
+            "x": index % BOARD_SIZE,
+            "y": index // BOARD_SIZE,
+            "hit": bool(byte & HIT_BIT),
+            "sunk_ship": shot.sunk_ship,
+        }
+        shooter = target
+
+
+def export_record(game: Dict) -> Dict:
+    """One training record per game, with the packed fields base64 encoded."""
+    return {
+        "id": game["id"],
+        "players": [game["player1"], game["player2"]],
+        "winner": game["winner"],
+        "first_turn": game["first_turn"],
+        "fleets": [base64.b64encode(packed).decode() for packed in game["fleets"]],
+        "moves": base64.b64encode(game["moves"]).decode(),
+        "finished_at": game["finished_at"],
+    }
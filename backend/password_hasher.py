@@ -0,0 +1,66 @@
+"""Password hashing off the event loop.
+
+bcrypt takes tens to hundreds of milliseconds per call and releases the GIL
+while it works, so a small thread pool keeps it from stalling WebSocket games.
+Admission is bounded: once ``workers + queue_size`` calls are in flight, new
+calls fail fast with :class:`HasherBusy` instead of piling up.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+from metrics import BCRYPT_SECONDS
+
+
+def _timed(fn, args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing pool and its admission queue are full."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("password hasher is saturated")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    def __init__(self, context: CryptContext, workers: int = 4, queue_size: int = 64, retry_after: int = 1):
+        self.context = context
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.retry_after = retry_after
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.in_flight = 0
+        self.rejected = 0
+        self.rehashed = 0
+
+    async def _run(self, fn, *args):
+        if self.in_flight >= self.capacity:
+            self.rejected += 1
+            raise HasherBusy(self.retry_after)
+        self.in_flight += 1
+        try:
+            result, elapsed = await asyncio.get_running_loop().run_in_executor(self.executor, _timed, fn, args)
+        finally:
+            self.in_flight -= 1
+        BCRYPT_SECONDS.observe(elapsed)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """Verify ``password``; also return a new hash if ``hashed`` uses outdated settings."""
+        valid, new_hash = await self._run(self.context.verify_and_update, password, hashed)
+        if new_hash is not None:
+            self.rehashed += 1
+        return valid, new_hash
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,169 @@
+"""Write-behind persistence for finished games and player stats.
+
+Game over no longer waits on Mongo: the handler queues the game document and
+its ``$inc`` stat updates and broadcasts ``game_over`` straight away. A
+background task groups queued games into ``bulk_write`` batches, flushed when
+``batch_size`` games are waiting or every ``flush_interval`` seconds.
+
+Every write is idempotent per game id, so a batch can be retried as a whole
+after a partial failure: games are upserted with ``$setOnInsert`` on ``id``,
+and a stat update only applies to a user whose ``applied_games`` does not
+already contain the game id. Games that carry stat updates also update the
+per-player aggregates in :mod:`player_stats`, guarded the same way.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from player_stats import stats_ops
+
+logger = logging.getLogger(__name__)
+
+# Recent game ids remembered per user to make stat updates idempotent
+APPLIED_GAMES_KEPT = 50
+
+StatUpdate = Tuple[str, Dict[str, int]]
+
+
+class WriteBehindQueue:
+    def __init__(
+        self,
+        db,
+        batch_size: int = 500,
+        flush_interval: float = 0.05,
+        max_retries: int = 5,
+        retry_delay: float = 0.1,
+        on_flushed: Optional[Callable[[Set[str]], Awaitable]] = None,
+    ):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.on_flushed = on_flushed
+        self.pending: List[Tuple[Dict, List[StatUpdate]]] = []
+        self.batch_ready = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.stopping = False
+        self.flush_lock = asyncio.Lock()
+        self.games_written = 0
+        self.batches_written = 0
+        self.failed_batches = 0
+
+    def record_game(self, game_doc: Dict, stat_updates: List[StatUpdate]):
+        """Queue a finished game and its per-player ``$inc`` updates."""
+        self.pending.append((game_doc, stat_updates))
+        if len(self.pending) >= self.batch_size:
+            self.batch_ready.set()
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task and flush whatever is still queued.
+
+        The task is not cancelled: a batch it is writing, or waiting to
+        retry, finishes first.
+        """
+        if self.task:
+            self.stopping = True
+            self.batch_ready.set()
+            await self.task
+            self.task = None
+        while self.pending:
+            await self.flush()
+
+    async def _run(self):
+        while not self.stopping:
+            try:
+                await asyncio.wait_for(self.batch_ready.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.batch_ready.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Write-behind flush failed: {e}")
+            if len(self.pending) >= self.batch_size:
+                self.batch_ready.set()
+
+    async def flush(self):
+        async with self.flush_lock:
+            if not self.pending:
+                return
+            # Left queued until written, so a flush cancelled mid-write loses
+            # nothing; record_game only appends, so the batch stays in front
+            batch = self.pending[:self.batch_size]
+            usernames = set()
+            try:
+                written = await self._write(*self._batch_ops(batch, usernames))
+            except Exception as e:
+                # Not a database failure: the same batch would fail again and
+                # hold up every game queued behind it
+                logger.exception(f"Could not write a write-behind batch: {e}")
+                written = False
+            del self.pending[:len(batch)]
+            if not written:
+                self.failed_batches += 1
+                logger.error(f"Dropping {len(batch)} finished games that could not be written")
+                return
+            self.games_written += len(batch)
+            self.batches_written += 1
+        if self.on_flushed:
+            await self.on_flushed(usernames)
+
+    def _batch_ops(self, batch, usernames: Set[str]):
+        game_ops = []
+        user_ops = []
+        player_ops = []
+        pair_ops = []
+        for game_doc, stat_updates in batch:
+            game_id = game_doc["id"]
+            game_ops.append(UpdateOne({"id": game_id}, {"$setOnInsert": game_doc}, upsert=True))
+            for username, inc in stat_updates:
+                usernames.add(username)
+                user_ops.append(UpdateOne(
+                    {"username": username, "applied_games": {"$ne": game_id}},
+                    {
+                        "$inc": inc,
+                        "$push": {"applied_games": {"$each": [game_id], "$slice": -APPLIED_GAMES_KEPT}},
+                    },
+                ))
+            if stat_updates:
+                players, pairs = stats_ops(game_doc, APPLIED_GAMES_KEPT)
+                player_ops += players
+                pair_ops += pairs
+        return game_ops, user_ops, player_ops, pair_ops
+
+    async def _write(self, game_ops, user_ops, player_ops=(), pair_ops=()) -> bool:
+        delay = self.retry_delay
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                await self.db.games.bulk_write(game_ops, ordered=False)
+                if user_ops:
+                    await self.db.users.bulk_write(user_ops, ordered=False)
+                # Ordered, so each document exists before its guarded update runs
+                if player_ops:
+                    await self.db.player_stats.bulk_write(player_ops, ordered=True)
+                if pair_ops:
+                    await self.db.head_to_head.bulk_write(pair_ops, ordered=True)
+                return True
+            except PyMongoError as e:
+                logger.warning(f"Write-behind batch failed (attempt {attempt}): {e}")
+                if attempt < self.max_retries:
+                    await asyncio.sleep(delay)
+                    delay *= 2
+        return False
+
+    def stats(self) -> Dict:
+        return {
+            "pending_games": len(self.pending),
+            "games_written": self.games_written,
+            "batches_written": self.batches_written,
+            "failed_batches": self.failed_batches,
+        }
@@ -0,0 +1,141 @@
+"""Per-player aggregates and head-to-head records, kept up to date per game.
+
+``db.player_stats`` holds one document per player with running totals:
+games, wins, losses, total and best (shortest winning) duration, shots,
+hits, the current streak (positive for wins, negative for losses) and the
+longest winning streak. ``db.head_to_head`` holds one document per pair of
+players, with the usernames sorted and a win count for each.
+
+Every finished game becomes a few update-pipeline operations that the
+write-behind queue sends with its batch, so reading a player's stats is a
+single document lookup however many games they have played. Like the user
+stat updates, each operation only applies to documents whose
+``applied_games`` does not already hold the game id, so a retried batch
+does not count a game twice.
+"""
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from move_log import HIT_BIT
+
+PLAYER_STATS_PROJECTION = {"_id": 0, "applied_games": 0}
+HEAD_TO_HEAD_LIMIT = 10
+
+
+def pair_key(a: str, b: str) -> str:
+    return "\n".join(sorted((a, b)))
+
+
+def shot_counts(game_doc: Dict) -> Dict[str, List[int]]:
+    """Player -> ``[shots, hits]`` from the packed move log."""
+    shooter = game_doc["first_turn"]
+    other = game_doc["loser"] if shooter == game_doc["winner"] else game_doc["winner"]
+    counts = {shooter: [0, 0], other: [0, 0]}
+    for byte in game_doc.get("moves", b""):
+        counts[shooter][0] += 1
+        counts[shooter][1] += bool(byte & HIT_BIT)
+        shooter, other = other, shooter
+    return counts
+
+
+def _plus(field: str, amount) -> Dict:
+    return {"$add": [{"$ifNull": ["$" + field, 0]}, amount]}
+
+
+def _applied(game_id: str, kept: int) -> Dict:
+    return {"$slice": [{"$concatArrays": [{"$ifNull": ["$applied_games", []]}, [game_id]]}, -kept]}
+
+
+def _player_pipeline(game_id: str, won: bool, duration: int, shots: int, hits: int, kept: int) -> List[Dict]:
+    if won:
+        streak = {"$add": [{"$max": [{"$ifNull": ["$streak", 0]}, 0]}, 1]}
+    else:
+        streak = {"$subtract": [{"$min": [{"$ifNull": ["$streak", 0]}, 0]}, 1]}
+    totals = {
+        "games": _plus("games", 1),
+        "wins": _plus("wins", int(won)),
+        "losses": _plus("losses", int(not won)),
+        "total_duration": _plus("total_duration", duration),
+        "shots": _plus("shots", shots),
+        "hits": _plus("hits", hits),
+        "streak": streak,
+        "applied_games": _applied(game_id, kept),
+    }
+    if won:
+        totals["best_duration"] = {"$min": [{"$ifNull": ["$best_duration", duration]}, duration]}
+    return [
+        {"$set": totals},
+        {"$set": {"longest_streak": {"$max": [{"$ifNull": ["$longest_streak", 0]}, "$streak"]}}},
+    ]
+
+
+def stats_ops(game_doc: Dict, kept: int) -> Tuple[List[UpdateOne], List[UpdateOne]]:
+    """Operations for ``db.player_stats`` and for ``db.head_to_head``, each in the order they must run."""
+    game_id = game_doc["id"]
+    winner, loser = game_doc["winner"], game_doc["loser"]
+    duration = game_doc.get("duration_seconds", 0)
+    counts = shot_counts(game_doc) if "first_turn" in game_doc else {}
+    players = sorted((winner, loser))
+    # Create missing documents first; the guarded updates never upsert,
+    # so an already applied game can not insert a duplicate
+    player_ops = [
+        UpdateOne({"username": winner}, {"$setOnInsert": {"username": winner}}, upsert=True),
+        UpdateOne({"username": loser}, {"$setOnInsert": {"username": loser}}, upsert=True),
+        UpdateOne(
+            {"username": winner, "applied_games": {"$ne": game_id}},
+            _player_pipeline(game_id, True, duration, *counts.get(winner, (0, 0)), kept),
+        ),
+        UpdateOne(
+            {"username": loser, "applied_games": {"$ne": game_id}},
+            _player_pipeline(game_id, False, duration, *counts.get(loser, (0, 0)), kept),
+        ),
+    ]
+    pair_ops = [
+        UpdateOne(
+            {"pair": pair_key(winner, loser)},
+            {"$setOnInsert": {"pair": pair_key(winner, loser), "players": players, "wins": [0, 0], "games": 0}},
+            upsert=True,
+        ),
+        UpdateOne(
+            {"pair": pair_key(winner, loser), "applied_games": {"$ne": game_id}},
+            {
+                "$inc": {"games": 1, f"wins.{players.index(winner)}": 1},
+                "$push": {"applied_games": {"$each": [game_id], "$slice": -kept}},
+            },
+        ),
+    ]
+    return player_ops, pair_ops
+
+
+def summarize(username: str, doc: Optional[Dict], head_to_head: List[Dict]) -> Dict:
+    """The ``/api/stats`` response from a stats document and the player's head-to-head documents."""
+    doc = doc or {}
+    games = doc.get("games", 0)
+    wins = doc.get("wins", 0)
+    shots = doc.get("shots", 0)
+    records = []
+    for pair in head_to_head:
+        me = pair["players"].index(username)
+        records.append({
+            "opponent": pair["players"][1 - me],
+            "games": pair["games"],
+            "wins": pair["wins"][me],
+            "losses": pair["wins"][1 - me],
+        })
+    return {
+        "username": username,
+        "games_played": games,
+        "wins": wins,
+        "losses": doc.get("losses", 0),
+        # Percentages, like the leaderboard's win_rate
+        "win_rate": round(wins / games * 100, 2) if games else 0.0,
+        "avg_duration_seconds": round(doc.get("total_duration", 0) / games, 1) if games else 0.0,
+        "best_duration_seconds": doc.get("best_duration"),
+        "current_streak": doc.get("streak", 0),
+        "longest_win_streak": doc.get("longest_streak", 0),
+        "shots": shots,
+        "hits": doc.get("hits", 0),
+        "accuracy": round(doc.get("hits", 0) / shots * 100, 2) if shots else 0.0,
+        "head_to_head": records,
+    }
@@ -0,0 +1,155 @@
+"""Find what blocks the event loop, cheaply enough to leave on in production.
+
+Both tools read other threads' stacks with ``sys._current_frames()`` from a
+thread of their own. Nothing is installed on the loop's thread apart from
+one heartbeat timer, so code that is not stalling pays nothing.
+
+* :class:`StallWatchdog` has the loop stamp a heartbeat every ``interval``.
+  When a heartbeat is overdue by more than ``threshold``, whatever the
+  loop is running has blocked it that long. The watchdog samples the
+  loop thread's stack until the next heartbeat, then logs the stall with
+  its most frequent stacks and counts it in the metrics.
+* :func:`sample_stacks` samples every thread at a fixed rate for a while
+  and returns the samples in collapsed-stack form: one
+  ``frame;frame;frame count`` line per distinct stack, root first, as
+  read by ``flamegraph.pl``, speedscope and similar tools.
+
+A sample costs a walk of each thread's frames (tens of microseconds), so
+sampling at 100 Hz keeps the overhead under one percent.
+"""
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Deque, Dict, List, Optional
+
+from metrics import EVENT_LOOP_STALL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Deeper frames than this are cut from the root side
+MAX_STACK_DEPTH = 64
+# Stacks shown for each stall in the log
+LOGGED_STACKS = 3
+
+
+def frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame, root: Optional[str] = None) -> str:
+    """``frame`` and its callers as one collapsed-stack line, outermost first."""
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(frame_label(frame.f_code))
+        frame = frame.f_back
+    if root is not None:
+        labels.append(root)
+    return ";".join(reversed(labels))
+
+
+def format_collapsed(stacks: Dict[str, int]) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items(), key=lambda s: -s[1]))
+
+
+def sample_stacks(seconds: float, interval: float = 0.01, stop: Optional[threading.Event] = None) -> Dict[str, int]:
+    """Sample every other thread's stack each ``interval`` for ``seconds``; blocks the caller.
+
+    Each stack is rooted at its thread's name so the threads stay apart
+    in a flame graph.
+    """
+    me = threading.get_ident()
+    stop = stop or threading.Event()
+    stacks: Dict[str, int] = collections.Counter()
+    end = time.monotonic() + seconds
+    while not stop.is_set() and time.monotonic() < end:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident != me:
+                stacks[collapse_stack(frame, names.get(ident, str(ident)))] += 1
+        stop.wait(interval)
+    return stacks
+
+
+class StallReport:
+    __slots__ = ("started", "seconds", "stacks")
+
+    def __init__(self, started: float, seconds: float, stacks: Dict[str, int]):
+        # Wall-clock time the loop stopped answering
+        self.started = started
+        self.seconds = seconds
+        self.stacks = stacks
+
+    def as_dict(self) -> Dict:
+        return {"started": self.started, "seconds": round(self.seconds, 4), "stacks": format_collapsed(self.stacks)}
+
+
+class StallWatchdog:
+    """Log every stretch where the event loop does not run for ``threshold`` seconds."""
+
+    def __init__(self, threshold: float = 0.1, sample_interval: float = 0.005, interval: Optional[float] = None,
+                 history: int = 20):
+        self.threshold = threshold
+        self.sample_interval = sample_interval
+        self.interval = interval if interval is not None else threshold / 2
+        # The latest stalls, newest last, for the admin endpoint
+        self.recent: Deque[StallReport] = collections.deque(maxlen=history)
+        self.stalls = 0
+        self.last_beat = 0.0
+        self.loop = None
+        self.loop_thread: Optional[int] = None
+        self.timer = None
+        self.thread: Optional[threading.Thread] = None
+        self.stopped = threading.Event()
+
+    def start(self, loop):
+        """Watch ``loop``; call from the loop's own thread."""
+        self.loop = loop
+        self.loop_thread = threading.get_ident()
+        self.stopped.clear()
+        self._beat()
+        self.thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.timer is not None:
+            self.timer.cancel()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def _beat(self):
+        self.last_beat = time.monotonic()
+        self.timer = self.loop.call_later(self.interval, self._beat)
+
+    def _watch(self):
+        while not self.stopped.is_set():
+            beat = self.last_beat
+            # When the next beat is due, plus the slack we allow it
+            late = beat + self.interval + self.threshold - time.monotonic()
+            if late > 0:
+                self.stopped.wait(late)
+                continue
+            if self.last_beat != beat:
+                continue
+            stalled_at = time.time() - (time.monotonic() - beat - self.interval)
+            stacks: Dict[str, int] = collections.Counter()
+            while self.last_beat == beat and not self.stopped.is_set():
+                frame = sys._current_frames().get(self.loop_thread)
+                if frame is not None:
+                    stacks[collapse_stack(frame)] += 1
+                del frame
+                self.stopped.wait(self.sample_interval)
+            seconds = (self.last_beat if self.last_beat != beat else time.monotonic()) - beat - self.interval
+            self._report(StallReport(stalled_at, seconds, stacks))
+
+    def _report(self, report: StallReport):
+        self.stalls += 1
+        self.recent.append(report)
+        EVENT_LOOP_STALL_SECONDS.observe(report.seconds)
+        ranked = sorted(report.stacks.items(), key=lambda s: -s[1])
+        top: List[str] = [f"  {count} x {stack}" for stack, count in ranked[:LOGGED_STACKS]]
+        logger.warning(f"Event loop blocked for {report.seconds * 1e3:.0f} ms\n" + "\n".join(top))
@@ -0,0 +1,269 @@
+"""WebSocket wire codecs and the table-driven message dispatcher.
+
+Clients pick an encoding with the ``encoding`` query parameter when they
+connect:
+
+* ``json`` (default): text frames, encoded with orjson when it is installed.
+* ``msgpack``: binary MessagePack frames, when ``msgpack`` is installed.
+* ``binary``: a fixed layout for the hot ``attack``/``attack_result`` pair,
+  and ``OP_JSON`` followed by UTF-8 JSON for every other message.
+
+Handlers register per message type together with a schema that is compiled
+once into a flat tuple of ``(field, allowed types)`` checks.
+"""
+import json
+import struct
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional codec
+    msgpack = None
+
+
+class ProtocolError(Exception):
+    """A frame could not be decoded or failed validation."""
+
+
+if orjson is not None:
+    def json_dumps(message: Dict) -> str:
+        return orjson.dumps(message).decode()
+
+    json_loads = orjson.loads
+else:
+    def json_dumps(message: Dict) -> str:
+        return json.dumps(message)
+
+    json_loads = json.loads
+
+
+class JsonCodec:
+    name = "json"
+    binary = False
+
+    def encode(self, message: Dict) -> str:
+        return json_dumps(message)
+
+    def decode(self, data) -> Dict:
+        try:
+            message = json_loads(data)
+        except ValueError as e:
+            raise ProtocolError(f"Malformed JSON: {e}")
+        if not isinstance(message, dict):
+            raise ProtocolError("Message must be an object")
+        return message
+
+
+class MsgpackCodec:
+    name = "msgpack"
+    binary = True
+
+    def encode(self, message: Dict) -> bytes:
+        return msgpack.packb(message)
+
+    def decode(self, data) -> Dict:
+        if isinstance(data, str):
+            return JSON_CODEC.decode(data)
+        try:
+            message = msgpack.unpackb(data)
+        except Exception as e:
+            raise ProtocolError(f"Malformed MessagePack: {e}")
+        if not isinstance(message, dict):
+            raise ProtocolError("Message must be a map")
+        return message
+
+
+OP_JSON = 0
+OP_ATTACK = 1
+OP_ATTACK_RESULT = 2
+
+ATTACK = struct.Struct("<BBB")
+ATTACK_RESULT = struct.Struct("<BBBB")
+SEQ = struct.Struct("<I")
+FLAG_HIT = 1
+FLAG_SUNK = 2
+FLAG_SEQ = 4
+ATTACK_RESULT_FIELDS = frozenset({"type", "attacker", "x", "y", "hit", "sunk_ship", "current_turn", "seq"})
+
+
+def _pack_str(value: str) -> Optional[bytes]:
+    """``value`` with its u8 length prefix, or None if it is too long for one."""
+    raw = value.encode()
+    if len(raw) > 255:
+        return None
+    return bytes((len(raw),)) + raw
+
+
+def _unpack_str(data: bytes, offset: int) -> Tuple[str, int]:
+    if offset >= len(data):
+        raise ProtocolError("Truncated string")
+    end = offset + 1 + data[offset]
+    if end > len(data):
+        raise ProtocolError("Truncated string")
+    try:
+        return data[offset + 1:end].decode(), end
+    except UnicodeDecodeError:
+        raise ProtocolError("Malformed string")
+
+
+class BinaryCodec:
+    """Fixed layouts for attack traffic, JSON for everything else.
+
+    ``attack``:        op u8, x u8, y u8
+    ``attack_result``: op u8, x u8, y u8, flags u8, seq u32 (if FLAG_SEQ),
+                       then u8-length-prefixed attacker, current_turn and
+                       (if FLAG_SUNK) sunk_ship
+
+    An ``attack_result`` naming a player too long for a u8 prefix goes
+    out as JSON instead.
+    """
+
+    name = "binary"
+    binary = True
+
+    def encode(self, message: Dict) -> bytes:
+        msg_type = message.get("type")
+        if msg_type == "attack":
+            return ATTACK.pack(OP_ATTACK, message["x"], message["y"])
+        if msg_type == "attack_result" and message.keys() <= ATTACK_RESULT_FIELDS:
+            sunk_ship = message.get("sunk_ship")
+            seq = message.get("seq")
+            flags = (
+                (FLAG_HIT if message["hit"] else 0)
+                | (FLAG_SUNK if sunk_ship else 0)
+                | (FLAG_SEQ if seq is not None else 0)
+            )
+            names = [_pack_str(message["attacker"]), _pack_str(message["current_turn"])]
+            if sunk_ship:
+                names.append(_pack_str(sunk_ship))
+            if None not in names:
+                head = ATTACK_RESULT.pack(OP_ATTACK_RESULT, message["x"], message["y"], flags)
+                if seq is not None:
+                    head += SEQ.pack(seq)
+                return head + b"".join(names)
+        return bytes((OP_JSON,)) + json_dumps(message).encode()
+
+    def decode(self, data) -> Dict:
+        try:
+            return self._decode(data)
+        except (IndexError, struct.error, UnicodeDecodeError) as e:
+            # Whatever a frame gets past the length checks is still the client's fault
+            raise ProtocolError(f"Malformed frame: {e}")
+
+    def _decode(self, data) -> Dict:
+        if isinstance(data, str):
+            return JSON_CODEC.decode(data)
+        if not data:
+            raise ProtocolError("Empty frame")
+        op = data[0]
+        if op == OP_JSON:
+            return JSON_CODEC.decode(data[1:])
+        if op == OP_ATTACK:
+            if len(data) != ATTACK.size:
+                raise ProtocolError("Bad attack frame")
+            _, x, y = ATTACK.unpack(data)
+            return {"type": "attack", "x": x, "y": y}
+        if op == OP_ATTACK_RESULT:
+            if len(data) < ATTACK_RESULT.size:
+                raise ProtocolError("Bad attack_result frame")
+            _, x, y, flags = ATTACK_RESULT.unpack_from(data)
+            offset = ATTACK_RESULT.size
+            seq = None
+            if flags & FLAG_SEQ:
+                if len(data) < offset + SEQ.size:
+                    raise ProtocolError("Bad attack_result frame")
+                seq = SEQ.unpack_from(data, offset)[0]
+                offset += SEQ.size
+            attacker, offset = _unpack_str(data, offset)
+            current_turn, offset = _unpack_str(data, offset)
+            sunk_ship = _unpack_str(data, offset)[0] if flags & FLAG_SUNK else None
+            message = {
+                "type": "attack_result",
+                "attacker": attacker,
+                "x": x,
+                "y": y,
+                "hit": bool(flags & FLAG_HIT),
+                "sunk_ship": sunk_ship,
+                "current_turn": current_turn,
+            }
+            if seq is not None:
+                message["seq"] = seq
+            return message
+        raise ProtocolError(f"Unknown opcode {op}")
+
+
+JSON_CODEC = JsonCodec()
+BINARY_CODEC = BinaryCodec()
+CODECS = {"json": JSON_CODEC, "binary": BINARY_CODEC}
+if msgpack is not None:
+    CODECS["msgpack"] = MsgpackCodec()
+
+
+def get_codec(name: Optional[str]):
+    """Return the codec negotiated at connect time, or None if unsupported."""
+    return CODECS.get(name or "json")
+
+
+def compile_schema(schema: Dict[str, Any]) -> Callable[[Dict], Optional[str]]:
+    """Compile ``{field: type or tuple of types}`` into a validator.
+
+    Types are matched exactly (``bool`` is not accepted for ``int``). The
+    validator returns the first offending field name, or None.
+    """
+    checks = tuple(
+        (field, types if isinstance(types, tuple) else (types,))
+        for field, types in schema.items()
+    )
+
+    def validate(message: Dict) -> Optional[str]:
+        for field, types in checks:
+            if type(message.get(field)) not in types:
+                return field
+        return None
+
+    return validate
+
+
+class MessageRouter:
+    """Maps message types to ``async handler(ctx, message)`` callables.
+
+    If ``latency`` (a histogram family labelled by message type) is given,
+    each route gets its child at registration and every dispatch is timed.
+    """
+
+    def __init__(self, latency=None):
+        self.latency = latency
+        self.routes: Dict[str, Tuple[Callable, Callable, Any]] = {}
+
+    def handler(self, msg_type: str, schema: Optional[Dict[str, Any]] = None):
+        validate = compile_schema(schema or {})
+        histogram = self.latency.labels(msg_type) if self.latency is not None else None
+
+        def register(fn):
+            self.routes[msg_type] = (fn, validate, histogram)
+            return fn
+
+        return register
+
+    async def dispatch(self, ctx, message: Dict):
+        route = self.routes.get(message.get("type"))
+        if route is None:
+            raise ProtocolError("Unknown message type")
+        fn, validate, histogram = route
+        bad_field = validate(message)
+        if bad_field is not None:
+            raise ProtocolError(f"Invalid field: {bad_field}")
+        if histogram is None:
+            await fn(ctx, message)
+            return
+        start = time.perf_counter()
+        try:
+            await fn(ctx, message)
+        finally:
+            histogram.observe(time.perf_counter() - start)
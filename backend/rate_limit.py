@@ -0,0 +1,67 @@
+"""Token buckets for per-connection and per-room message rate limits.
+
+Limits are written ``type=rate/burst`` and comma separated, for example
+``chat=3/10,attack=10/20,*=20/40``: ``rate`` tokens per second refill a
+bucket of at most ``burst`` tokens, and every message takes one. ``*`` is
+the limit shared by all message types that are not listed, so clients can
+not create buckets by inventing types. A type with no entry and no ``*``
+is not limited.
+
+Buckets refill lazily when a token is taken, so idle buckets cost nothing.
+"""
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+OTHER = "*"
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated", "clock")
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.clock = clock
+        self.updated = clock()
+
+    def take(self, n: float = 1) -> bool:
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < n:
+            return False
+        self.tokens -= n
+        return True
+
+
+class RateLimits:
+    def __init__(self, limits: Dict[str, Tuple[float, float]], clock: Callable[[], float] = time.monotonic):
+        self.limits = limits
+        self.clock = clock
+
+    @classmethod
+    def parse(cls, spec: str, clock: Callable[[], float] = time.monotonic) -> "RateLimits":
+        limits = {}
+        for item in filter(None, (part.strip() for part in spec.split(","))):
+            msg_type, _, value = item.partition("=")
+            rate, _, burst = value.partition("/")
+            limits[msg_type.strip()] = (float(rate), float(burst or rate))
+        return cls(limits, clock)
+
+    def key(self, msg_type) -> Optional[str]:
+        """The bucket ``msg_type`` draws from, or None if it is not limited."""
+        if type(msg_type) is str and msg_type in self.limits:
+            return msg_type
+        return OTHER if OTHER in self.limits else None
+
+    def allow(self, buckets: Dict[str, TokenBucket], msg_type) -> bool:
+        """Take a token for ``msg_type`` from ``buckets``, creating the bucket on first use."""
+        key = self.key(msg_type)
+        if key is None:
+            return True
+        bucket = buckets.get(key)
+        if bucket is None:
+            rate, burst = self.limits[key]
+            bucket = buckets[key] = TokenBucket(rate, burst, self.clock)
+        return bucket.take()
@@ -0,0 +1,89 @@
+"""One task per room that runs every change to that room's state in turn.
+
+Handlers await the database, the room store and each other, so two frames
+handled concurrently for the same room could interleave between a check
+(``current_turn``, ``ready``, seats) and the update it guards. A
+:class:`RoomActor` owns an inbox of jobs for its room and runs them one at
+a time, so each job sees the room exactly as the previous one left it.
+
+Jobs are coroutine functions. :meth:`RoomActor.submit` queues one and
+returns a future for its result. A job that submits to its own actor
+would wait on itself, so callers that may already be on the actor check
+:meth:`RoomActor.is_current` and run the coroutine directly instead.
+
+The inbox and task are created with the first job, so rooms nobody has
+touched yet, such as ones just restored from a snapshot, cost neither.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+_STOP = None
+
+
+class RoomActor:
+    __slots__ = ("room_code", "inbox", "task", "jobs_run")
+
+    def __init__(self, room_code: str):
+        self.room_code = room_code
+        # Unbounded: what clients can queue here is bounded by the rate limits
+        self.inbox: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        self.jobs_run = 0
+
+    def start(self):
+        self.inbox = asyncio.Queue()
+        self.task = asyncio.create_task(self._run(), name=f"room-{self.room_code}")
+
+    def is_current(self) -> bool:
+        return self.task is not None and asyncio.current_task() is self.task
+
+    def submit(self, fn: Callable[..., Awaitable], *args) -> asyncio.Future:
+        if self.task is None:
+            self.start()
+        future = asyncio.get_running_loop().create_future()
+        self.inbox.put_nowait((fn, args, future))
+        return future
+
+    def post(self, fn: Callable[..., Awaitable], *args):
+        """Queue a job nobody waits for; its failure is logged."""
+        self.submit(fn, *args).add_done_callback(self._log_failure)
+
+    def stop(self):
+        """End the task once the jobs already queued have run."""
+        if self.task is not None:
+            self.inbox.put_nowait(_STOP)
+
+    def cancel(self):
+        if self.task is not None:
+            self.task.cancel()
+
+    def backlog(self) -> int:
+        return 0 if self.inbox is None else self.inbox.qsize()
+
+    async def _run(self):
+        while True:
+            job = await self.inbox.get()
+            if job is _STOP:
+                return
+            fn, args, future = job
+            if future.cancelled():
+                continue
+            try:
+                result = await fn(*args)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            self.jobs_run += 1
+
+    def _log_failure(self, future: asyncio.Future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"Job for room {self.room_code} failed: {future.exception()}")
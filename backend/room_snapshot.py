@@ -0,0 +1,278 @@
+"""Binary snapshot of live rooms, so games survive a restart.
+
+On shutdown the server writes every room it owns to one memory-mapped
+file. On startup it maps the file, claims every room code in it and holds
+the players' seats; a room is decoded when its first frame arrives (see
+:class:`RoomSnapshot`). The file is laid out as:
+
+* a header: magic, version, room count and the offsets of the sections;
+* one fixed-size record per room (:data:`RECORD`), starting with its code
+  so the codes are indexed in a single ``iter_unpack`` pass;
+* the usernames as a JSON list, referenced from records by index;
+* a pool of variable-length bytes: each room's packed fleets and moves
+  (see :mod:`move_log`), referenced from its record by offset.
+
+A room's two seats are its game's players: the first to shoot, then the
+other. Board state is each fleet plus the mask of cells fired at it, and
+every player's shot list is read back from the moves, so a game in
+progress costs one record plus about 12 bytes and one byte per shot.
+Chat not yet flushed and the event ring buffer are not kept; players
+that resume get a full snapshot of their game.
+"""
+import logging
+import mmap
+import os
+import struct
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from bot import BotPlayer
+from game_engine import CELL_COUNT
+from move_log import HIT_BIT, pack_fleet, unpack_fleet
+from protocol import json_dumps, json_loads
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"BSRM"
+VERSION = 1
+# magic, version, room count, names offset, pool offset
+HEADER = struct.Struct("<4sHxxIQQ")
+# code, status, flags, seq, host, seat 0, seat 1, ratings, started_at,
+# pool offset, fleet lengths, moves length, shots mask at each seat's board
+RECORD = struct.Struct("<8sBBIIIIiidQBBI13s13s")
+# Just the code of a record, for indexing a snapshot without decoding it
+CODE = struct.Struct(f"<8s{RECORD.size - 8}x")
+NO_NAME = 0xFFFFFFFF
+MASK_BYTES = (CELL_COUNT + 7) // 8
+STATUSES = ("waiting", "placement", "playing")
+STATUS_CODES = {status: i for i, status in enumerate(STATUSES)}
+
+HAS_GAME = 0x01
+HAS_BOT = 0x02
+READY_0 = 0x04
+READY_1 = 0x08
+TURN_1 = 0x10
+RATED = 0x20
+SEATED_0 = 0x40
+SEATED_1 = 0x80
+
+
+class SnapshotError(ValueError):
+    """The file is not a room snapshot this version can read."""
+
+
+def _seats(room: Dict) -> List[str]:
+    state = room["game_state"]
+    if state is None:
+        return room["players"][:2]
+    first = state["first_turn"]
+    for player in state["boards"]:
+        if player != first:
+            return [first, player]
+    return [first]
+
+
+def write_snapshot(path: str, rooms: Iterable[Dict]) -> int:
+    """Write ``rooms`` to ``path`` and return how many were written."""
+    names: Dict[str, int] = {}
+    pool = bytearray()
+    fields = []
+    append = fields.append
+    for room in rooms:
+        seats = _seats(room)
+        players = room["players"]
+        state = room["game_state"]
+        ratings = room.get("ratings")
+        flags = HAS_BOT if "bot" in room else 0
+        seat_ids = [NO_NAME, NO_NAME]
+        rating = [0, 0]
+        fleet_sizes = [0, 0]
+        shots = [b"", b""]
+        for i, player in enumerate(seats):
+            seat_ids[i] = names.setdefault(player, len(names))
+            if player in players:
+                flags |= SEATED_0 << i
+            if ratings:
+                flags |= RATED
+                rating[i] = ratings.get(player, 0)
+        offset = len(pool)
+        moves_len = 0
+        started = 0.0
+        if state is not None:
+            flags |= HAS_GAME
+            boards, ready = state["boards"], state["ready"]
+            for i, player in enumerate(seats):
+                board = boards.get(player)
+                if board is not None:
+                    packed = pack_fleet(board)
+                    pool += packed
+                    fleet_sizes[i] = len(packed)
+                    shots[i] = board.shots.to_bytes(MASK_BYTES, "little")
+                if ready.get(player):
+                    flags |= READY_0 << i
+            if state["current_turn"] == seats[1]:
+                flags |= TURN_1
+            moves_len = len(state["moves"])
+            pool += state["moves"]
+            started = datetime.fromisoformat(state["started_at"]).timestamp()
+        code = room["code"].encode()
+        if len(code) > 8:
+            raise SnapshotError(f"Room code {room['code']} is too long to snapshot")
+        append((
+            code, STATUS_CODES[room["status"]], flags, room["seq"],
+            names.setdefault(room["host"], len(names)), seat_ids[0], seat_ids[1], rating[0], rating[1],
+            started, offset, fleet_sizes[0], fleet_sizes[1], moves_len, shots[0], shots[1],
+        ))
+
+    name_table = json_dumps(list(names)).encode()
+    names_at = HEADER.size + RECORD.size * len(fields)
+    pool_at = names_at + len(name_table)
+    size = pool_at + len(pool)
+    temp = f"{path}.tmp"
+    with open(temp, "wb+") as f:
+        f.truncate(size)
+        with mmap.mmap(f.fileno(), size) as view:
+            HEADER.pack_into(view, 0, MAGIC, VERSION, len(fields), names_at, pool_at)
+            pack_into, offset = RECORD.pack_into, HEADER.size
+            for record in fields:
+                pack_into(view, offset, *record)
+                offset += RECORD.size
+            view[names_at:pool_at] = name_table
+            view[pool_at:size] = pool
+            view.flush()
+    # Readers never see a half-written snapshot
+    os.replace(temp, path)
+    return len(fields)
+
+
+def _restore_bot(opponent_fleet: bytes, moves: bytes) -> BotPlayer:
+    """A bot that knows the results of its own shots; the bot always shoots second."""
+    bot = BotPlayer()
+    if not opponent_fleet:
+        # Still placing ships: nothing has been fired yet
+        return bot
+    board = unpack_fleet(opponent_fleet)
+    for byte in moves[1::2]:
+        index = byte & ~HIT_BIT
+        bot.record(index, bool(byte & HIT_BIT), board.fire(index).sunk_ship)
+    return bot
+
+
+def _room(fields, names: List[str], view: mmap.mmap, pool_at: int) -> Dict:
+    (code, status, flags, seq, host, seat0, seat1, rating0, rating1, started,
+     offset, fleet0, fleet1, moves_len, shots0, shots1) = fields
+    offset += pool_at
+    seats = [names[seat0]] if seat1 == NO_NAME else [names[seat0], names[seat1]]
+    room = {
+        "code": code.rstrip(b"\0").decode(),
+        "players": [p for i, p in enumerate(seats) if flags & (SEATED_0 << i)],
+        "host": names[host],
+        "game_state": None,
+        "status": STATUSES[status],
+        "seq": seq,
+    }
+    if flags & RATED:
+        room["ratings"] = dict(zip(seats, (rating0, rating1)))
+    if flags & HAS_GAME:
+        boards = [None, None]
+        for i, (start, size, shots) in enumerate(((offset, fleet0, shots0), (offset + fleet0, fleet1, shots1))):
+            if size:
+                boards[i] = unpack_fleet(view[start:start + size], int.from_bytes(shots, "little"))
+        moves = bytearray(view[offset + fleet0 + fleet1:offset + fleet0 + fleet1 + moves_len])
+        room["game_state"] = {
+            "boards": {seats[1]: boards[1], seats[0]: boards[0]},
+            "ready": {seats[1]: bool(flags & READY_1), seats[0]: bool(flags & READY_0)},
+            "current_turn": seats[1] if flags & TURN_1 else seats[0],
+            "first_turn": seats[0],
+            "moves": moves,
+            "started_at": datetime.fromtimestamp(started, timezone.utc).isoformat(),
+        }
+        if flags & HAS_BOT:
+            room["bot"] = _restore_bot(view[offset:offset + fleet0], moves)
+    return room
+
+
+class RoomSnapshot:
+    """A snapshot file mapped into memory, decoding each room only when it is taken.
+
+    Opening one reads the header and indexes the room codes, nothing else,
+    so a restarted server can own every room at once and pay for decoding
+    a room when its first frame arrives. The file may be removed while it
+    is open; the mapping keeps its contents until :meth:`close`.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.index = self._read_index()
+        except SnapshotError:
+            self.view.close()
+            raise
+        self._names: Optional[List[str]] = None
+
+    def _read_index(self) -> Dict[str, int]:
+        view = self.view
+        if len(view) < HEADER.size:
+            raise SnapshotError("Truncated room snapshot")
+        magic, version, count, self.names_at, self.pool_at = HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION:
+            raise SnapshotError(f"Not a version {VERSION} room snapshot")
+        if self.names_at != HEADER.size + RECORD.size * count or self.pool_at > len(view):
+            raise SnapshotError("Truncated room snapshot")
+        with memoryview(view) as records:
+            codes = CODE.iter_unpack(records[HEADER.size:self.names_at])
+            return {code.rstrip(b"\0").decode(): i for i, (code,) in enumerate(codes)}
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, room_code: str) -> bool:
+        return room_code in self.index
+
+    def codes(self) -> List[str]:
+        return list(self.index)
+
+    def discard(self, room_code: str):
+        self.index.pop(room_code, None)
+
+    def take(self, room_code: str) -> Optional[Dict]:
+        """Decode and remove one room; None if the snapshot does not hold it.
+
+        A room that fails to decode stays in the snapshot.
+        """
+        i = self.index.get(room_code)
+        if i is None:
+            return None
+        if self._names is None:
+            self._names = json_loads(self.view[self.names_at:self.pool_at])
+        fields = RECORD.unpack_from(self.view, HEADER.size + RECORD.size * i)
+        room = _room(fields, self._names, self.view, self.pool_at)
+        del self.index[room_code]
+        return room
+
+    def take_all(self) -> List[Dict]:
+        """Every room left; one that fails to decode is logged and skipped."""
+        rooms = []
+        for room_code in list(self.index):
+            try:
+                rooms.append(self.take(room_code))
+            except Exception as e:
+                logger.error(f"Could not decode room {room_code} from the snapshot: {e}")
+        return rooms
+
+    def close(self):
+        self.index.clear()
+        self.view.close()
+
+    def __enter__(self) -> "RoomSnapshot":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_snapshot(path: str) -> List[Dict]:
+    """Every room written by :func:`write_snapshot`, without the owner's runtime fields."""
+    with RoomSnapshot(path) as snapshot:
+        return snapshot.take_all()
@@ -0,0 +1,191 @@
+"""Shared room directory and pub/sub between server workers.
+
+Each room is owned by the worker that created it; the owner keeps the game
+state in memory and runs every handler for that room. The store only holds
+what other workers need to find it: ``room code -> owner worker id``, plus a
+pub/sub channel per worker used to forward frames to the owner and to
+deliver outbound messages to players connected elsewhere. Every worker also
+listens on ``STATS_CHANNEL`` for players whose stats another worker changed.
+
+``InMemoryRoomStore`` serves a single process. Several of them can share one
+``MemoryBroker`` to stand in for Redis when testing multi-worker setups.
+``RedisRoomStore`` speaks the Redis protocol through ``redis.asyncio``.
+"""
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover - optional dependency
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "battleship:"
+# Safety net so rooms of a crashed worker do not keep their codes forever
+ROOM_KEY_TTL = 24 * 60 * 60
+STATS_CHANNEL = f"{KEY_PREFIX}stats"
+
+Subscriber = Callable[[bytes], None]
+
+
+def worker_channel(worker_id: str) -> str:
+    return f"{KEY_PREFIX}worker:{worker_id}"
+
+
+class RoomStore:
+    """Interface shared by the room store backends."""
+
+    async def claim_room(self, room_code: str, worker_id: str) -> bool:
+        """Register ``worker_id`` as owner; False if the code is taken."""
+        raise NotImplementedError
+
+    async def room_owner(self, room_code: str) -> Optional[str]:
+        raise NotImplementedError
+
+    async def release_room(self, room_code: str):
+        raise NotImplementedError
+
+    async def claim_rooms(self, room_codes: List[str], worker_id: str) -> List[str]:
+        """Claim many codes at once; returns the ones ``worker_id`` now owns."""
+        return [code for code in room_codes if await self.claim_room(code, worker_id)]
+
+    async def release_rooms(self, room_codes: List[str]):
+        for room_code in room_codes:
+            await self.release_room(room_code)
+
+    async def publish(self, channel: str, data: bytes):
+        raise NotImplementedError
+
+    async def subscribe(self, channel: str, callback: Subscriber):
+        """Call ``callback(data)`` for every message published on ``channel``."""
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class MemoryBroker:
+    """Process-local state shared by every InMemoryRoomStore attached to it."""
+
+    def __init__(self):
+        self.owners: Dict[str, str] = {}
+        self.subscribers: Dict[str, List[Subscriber]] = {}
+
+
+class InMemoryRoomStore(RoomStore):
+    def __init__(self, broker: Optional[MemoryBroker] = None):
+        self.broker = broker or MemoryBroker()
+
+    async def claim_room(self, room_code: str, worker_id: str) -> bool:
+        if room_code in self.broker.owners:
+            return False
+        self.broker.owners[room_code] = worker_id
+        return True
+
+    async def room_owner(self, room_code: str) -> Optional[str]:
+        return self.broker.owners.get(room_code)
+
+    async def release_room(self, room_code: str):
+        self.broker.owners.pop(room_code, None)
+
+    async def claim_rooms(self, room_codes: List[str], worker_id: str) -> List[str]:
+        owners = self.broker.owners
+        claimed = [code for code in room_codes if code not in owners]
+        owners.update(dict.fromkeys(claimed, worker_id))
+        return claimed
+
+    async def release_rooms(self, room_codes: List[str]):
+        for room_code in room_codes:
+            self.broker.owners.pop(room_code, None)
+
+    async def publish(self, channel: str, data: bytes):
+        for callback in self.broker.subscribers.get(channel, ()):
+            callback(data)
+
+    async def subscribe(self, channel: str, callback: Subscriber):
+        self.broker.subscribers.setdefault(channel, []).append(callback)
+
+
+class RedisRoomStore(RoomStore):
+    """Room store backed by any client speaking the ``redis.asyncio`` API."""
+
+    def __init__(self, client):
+        self.client = client
+        self.pubsub = None
+        self.callbacks: Dict[str, Subscriber] = {}
+        self.listener: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisRoomStore":
+        if aioredis is None:
+            raise RuntimeError("ROOM_STORE=redis requires the 'redis' package")
+        return cls(aioredis.from_url(url))
+
+    async def claim_room(self, room_code: str, worker_id: str) -> bool:
+        return bool(await self.client.set(f"{KEY_PREFIX}room:{room_code}", worker_id, nx=True, ex=ROOM_KEY_TTL))
+
+    async def room_owner(self, room_code: str) -> Optional[str]:
+        owner = await self.client.get(f"{KEY_PREFIX}room:{room_code}")
+        if isinstance(owner, bytes):
+            owner = owner.decode()
+        return owner
+
+    async def release_room(self, room_code: str):
+        await self.client.delete(f"{KEY_PREFIX}room:{room_code}")
+
+    async def claim_rooms(self, room_codes: List[str], worker_id: str) -> List[str]:
+        # One round trip for the lot instead of one per room
+        async with self.client.pipeline(transaction=False) as pipe:
+            for room_code in room_codes:
+                pipe.set(f"{KEY_PREFIX}room:{room_code}", worker_id, nx=True, ex=ROOM_KEY_TTL)
+            results = await pipe.execute()
+        return [code for code, ok in zip(room_codes, results) if ok]
+
+    async def release_rooms(self, room_codes: List[str]):
+        if room_codes:
+            await self.client.delete(*(f"{KEY_PREFIX}room:{code}" for code in room_codes))
+
+    async def publish(self, channel: str, data: bytes):
+        await self.client.publish(channel, data)
+
+    async def subscribe(self, channel: str, callback: Subscriber):
+        if self.pubsub is None:
+            self.pubsub = self.client.pubsub()
+        await self.pubsub.subscribe(channel)
+        self.callbacks[channel] = callback
+        if self.listener is None:
+            self.listener = asyncio.create_task(self._listen())
+
+    async def _listen(self):
+        while True:
+            try:
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Room store subscription failed: {e}")
+                await asyncio.sleep(1.0)
+                continue
+            if message is None:
+                continue
+            channel = message["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            callback = self.callbacks.get(channel)
+            if callback:
+                callback(message["data"])
+
+    async def close(self):
+        if self.listener:
+            self.listener.cancel()
+        if self.pubsub is not None:
+            await self.pubsub.aclose()
+        await self.client.aclose()
+
+
+def create_room_store(kind: str, url: Optional[str] = None) -> RoomStore:
+    if kind == "redis":
+        return RedisRoomStore.from_url(url or "redis://localhost:6379/0")
+    return InMemoryRoomStore()
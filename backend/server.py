@@ -1,26 +1,51 @@
-from fastapi import FastAPI, APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, status
+from fastapi import FastAPI, APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, Query, Response, status
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import DuplicateKeyError
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Optional, Dict, Set
+import time
 import uuid
 from datetime import datetime, timezone, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-import json
 import asyncio
 
+from auth_cache import AuthCache
+from bot import BOT_USERNAME, BotPlayer
+from connections import ConnectionManager
+from game_engine import BOARD_SIZE, Board, PlacementError, cell_index, mask_cells
+from history import (
+    EXPORT_SORT, HISTORY_PROJECTION, HISTORY_SORT, CursorError, decode_cursor, encode_cursor, export_filter,
+    history_filter,
+)
+from indexes import ensure_indexes
+from leaderboard import STATS_PROJECTION, LeaderboardCache
+from matchmaking import DEFAULT_RATING, MatchQueue, elo_delta
+from move_log import export_record, fleet_cells, pack_fleet, pack_shot, replay_events, shots_by_player
+from metrics import REGISTRY, WS_HANDLER_SECONDS, MongoCommandListener, sample_event_loop_lag
+from password_hasher import HasherBusy, PasswordHasher
+from persistence import WriteBehindQueue
+from player_stats import HEAD_TO_HEAD_LIMIT, PLAYER_STATS_PROJECTION, summarize
+from profiling import StallWatchdog, format_collapsed, sample_stacks
+from protocol import MessageRouter, ProtocolError, get_codec, json_dumps, json_loads
+from rate_limit import RateLimits
+from room_snapshot import RoomSnapshot, SnapshotError, write_snapshot
+from room_store import STATS_CHANNEL, create_room_store
+from shards import HashRing, shard_from_env, shard_id
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[MongoCommandListener()])
 db = client[os.environ['DB_NAME']]
 
 # Security
@@ -28,9 +53,46 @@ SECRET_KEY = os.environ.get('SECRET_KEY', 'battleship-secret-key-change-in-produ
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 1 week
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+BCRYPT_WORKERS = int(os.environ.get('BCRYPT_WORKERS', '4'))
+BCRYPT_QUEUE_SIZE = int(os.environ.get('BCRYPT_QUEUE_SIZE', '64'))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+password_hasher = PasswordHasher(pwd_context, workers=BCRYPT_WORKERS, queue_size=BCRYPT_QUEUE_SIZE)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+auth_cache = AuthCache(
+    maxsize=int(os.environ.get('AUTH_CACHE_SIZE', '10000')),
+    ttl=float(os.environ.get('AUTH_CACHE_TTL', '60')),
+    enabled=os.environ.get('AUTH_CACHE_ENABLED', '1') == '1',
+)
+# Pause before the bot fires, so its moves read as turns in the UI
+BOT_MOVE_DELAY = float(os.environ.get('BOT_MOVE_DELAY', '0.6'))
+# Largest client frame decoded; a full fleet placement is well under 2 KB
+MAX_FRAME_BYTES = int(os.environ.get('WS_MAX_FRAME_BYTES', '16384'))
+# Chat sent within this window of the last chat frame is delivered together as one chat_batch
+CHAT_BATCH_INTERVAL = float(os.environ.get('CHAT_BATCH_MS', '100')) / 1000
+# Live rooms are written here on shutdown and restored on startup; unset disables it.
+# "{worker}" is replaced by the worker id, so each shard keeps its own file
+ROOM_SNAPSHOT_PATH = os.environ.get('ROOM_SNAPSHOT_PATH')
+# Seats in restored rooms are held this long for players to reconnect
+RESTORE_SEAT_GRACE = float(os.environ.get('RESTORE_SEAT_GRACE', '120'))
+# Longest wait on shutdown for rooms to finish the frames they have queued
+DRAIN_TIMEOUT = float(os.environ.get('DRAIN_TIMEOUT', '5'))
+RESTARTING_MESSAGE = "Server is restarting, please try again shortly"
+# Response header carrying the cursor of the next history page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# Users allowed on /api/admin routes, comma separated
+ADMIN_USERNAMES = frozenset(u for u in os.environ.get('ADMIN_USERNAMES', '').split(',') if u)
+# The event loop not running for this long is logged as a stall with stack samples; 0 disables the watchdog
+LOOP_STALL_THRESHOLD = float(os.environ.get('LOOP_STALL_THRESHOLD_MS', '100')) / 1000
+PROFILE_MAX_SECONDS = 60
+# Fields authenticated routes read from the current user
+USER_PROJECTION = {"_id": 0, "username": 1, "wins": 1, "losses": 1, "games_played": 1, "rating": 1, "created_at": 1}
+
+match_queue = MatchQueue(widen_interval=float(os.environ.get('MATCH_WIDEN_INTERVAL', '5')))
+MATCH_SWEEP_INTERVAL = float(os.environ.get('MATCH_SWEEP_INTERVAL', '1'))
+
 app = FastAPI()
 api_router = APIRouter(prefix="/api")
 
@@ -52,6 +114,7 @@ class UserProfile(BaseModel):
     wins: int = 0
     losses: int = 0
     games_played: int = 0
+    rating: int = DEFAULT_RATING
     created_at: str
 
 class LeaderboardEntry(BaseModel):
@@ -69,6 +132,7 @@ class GameHistory(BaseModel):
     loser: str
     duration_seconds: int
     finished_at: str
+    forfeit: bool = False
 
 class RoomCreate(BaseModel):
     room_code: Optional[str] = None
@@ -76,48 +140,126 @@ class RoomCreate(BaseModel):
 class RoomJoin(BaseModel):
     room_code: str
 
-# WebSocket Connection Manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
-        self.user_to_room: Dict[str, str] = {}
-        self.rooms: Dict[str, Dict] = {}
-
-    async def connect(self, websocket: WebSocket, username: str):
-        await websocket.accept()
-        self.active_connections[username] = websocket
-
-    def disconnect(self, username: str):
-        if username in self.active_connections:
-            del self.active_connections[username]
-        if username in self.user_to_room:
-            room_code = self.user_to_room[username]
-            if room_code in self.rooms:
-                room = self.rooms[room_code]
-                if username in room.get('players', []):
-                    room['players'].remove(username)
-                if len(room['players']) == 0:
-                    del self.rooms[room_code]
-            del self.user_to_room[username]
-
-    async def send_personal_message(self, message: dict, username: str):
-        if username in self.active_connections:
-            await self.active_connections[username].send_text(json.dumps(message))
-
-    async def broadcast_to_room(self, message: dict, room_code: str):
-        if room_code in self.rooms:
-            for player in self.rooms[room_code].get('players', []):
-                if player in self.active_connections:
-                    await self.active_connections[player].send_text(json.dumps(message))
-
-manager = ConnectionManager()
+# Set by shards.py when this process is one of several shards on the host
+SHARD_INDEX = shard_from_env()
+SHARD_COUNT = int(os.environ.get('SHARD_COUNT', '1'))
+
+manager = ConnectionManager(
+    create_room_store(os.environ.get('ROOM_STORE', 'memory'), os.environ.get('REDIS_URL')),
+    worker_id=None if SHARD_INDEX is None else shard_id(SHARD_INDEX),
+    ring=None if SHARD_INDEX is None else HashRing.for_shards(SHARD_COUNT),
+    ping_interval=float(os.environ.get('WS_PING_INTERVAL', '20')),
+    heartbeat_timeout=float(os.environ.get('WS_HEARTBEAT_TIMEOUT', '60')),
+    room_idle_timeout=float(os.environ.get('ROOM_IDLE_TIMEOUT', '600')),
+    seat_grace=float(os.environ.get('SEAT_GRACE_PERIOD', '30')),
+    event_buffer=int(os.environ.get('ROOM_EVENT_BUFFER', '256')),
+    # type=rate/burst per second; "*" covers every other message type
+    rate_limits=RateLimits.parse(os.environ.get('WS_RATE_LIMITS', 'chat=2/10,attack=5/10,*=20/40')),
+    room_rate_limits=RateLimits.parse(os.environ.get('ROOM_RATE_LIMITS', 'chat=5/20,*=50/100')),
+    throttle_strikes=int(os.environ.get('WS_THROTTLE_STRIKES', '20')),
+)
+stall_watchdog = StallWatchdog(threshold=LOOP_STALL_THRESHOLD) if LOOP_STALL_THRESHOLD > 0 else None
+# Held while a profile runs; one at a time keeps the overhead bounded
+profile_lock = asyncio.Lock()
+leaderboard_cache = LeaderboardCache(
+    int(os.environ.get('LEADERBOARD_CACHE_SIZE', '100')),
+    # Reload at least this often in case a stats notice from another worker was lost
+    max_age=float(os.environ.get('LEADERBOARD_CACHE_TTL', '30')),
+)
+stats_refresh_tasks: Set[asyncio.Task] = set()
+
+async def refresh_stats_caches(usernames):
+    for username in usernames:
+        auth_cache.invalidate_user(username)
+    if leaderboard_cache.loaded:
+        docs = await db.users.find({"username": {"$in": list(usernames)}}, STATS_PROJECTION).to_list(None)
+        for doc in docs:
+            leaderboard_cache.apply(doc)
+
+async def announce_stats_change(usernames):
+    """Have every other worker refresh its caches for ``usernames`` too."""
+    notice = {"worker": manager.worker_id, "users": sorted(usernames)}
+    try:
+        await manager.store.publish(STATS_CHANNEL, json_dumps(notice).encode())
+    except Exception as e:
+        logger.error(f"Could not announce stats change: {e}")
+
+def on_stats_notice(data: bytes):
+    notice = json_loads(data)
+    if notice["worker"] == manager.worker_id:
+        return
+    task = asyncio.create_task(refresh_stats_caches(notice["users"]))
+    stats_refresh_tasks.add(task)
+    task.add_done_callback(stats_refresh_tasks.discard)
+
+async def on_stats_flushed(usernames):
+    """Refresh caches here and on other workers once queued stat updates have reached Mongo."""
+    await refresh_stats_caches(usernames)
+    await announce_stats_change(usernames)
+
+persistence = WriteBehindQueue(
+    db,
+    batch_size=int(os.environ.get('WRITE_BATCH_SIZE', '500')),
+    flush_interval=float(os.environ.get('WRITE_FLUSH_INTERVAL', '0.05')),
+    on_flushed=on_stats_flushed,
+)
+
+ROOM_STATUSES = ("waiting", "placement", "playing")
+
+def rooms_by_status():
+    counts = {(s,): 0 for s in ROOM_STATUSES}
+    for room in manager.rooms.values():
+        key = (room.get("status"),)
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+# Gauges read at scrape time from state the server already keeps
+REGISTRY.gauge("battleship_active_connections", "Open WebSocket connections on this worker",
+               callback=lambda: len(manager.active_connections))
+REGISTRY.gauge("battleship_rooms", "Rooms owned by this worker by status", ["status"], callback=rooms_by_status)
+REGISTRY.counter("battleship_slow_consumer_events_total", "Connections closed for overflowing their send queue",
+                 callback=lambda: manager.slow_consumer_events)
+REGISTRY.counter("battleship_dropped_messages_total", "Chat frames dropped from full send queues",
+                 callback=lambda: manager.dropped_messages)
+REGISTRY.counter("battleship_throttled_messages_total", "Client frames dropped by a rate limit", ["msg_type"],
+                 callback=lambda: {(k,): v for k, v in manager.throttled_messages.items()})
+REGISTRY.counter("battleship_throttle_disconnects_total", "Connections closed for exceeding rate limits",
+                 callback=lambda: manager.throttle_disconnects)
+REGISTRY.counter("battleship_reaped_rooms_total", "Rooms closed after going idle",
+                 callback=lambda: manager.reaped_rooms)
+REGISTRY.counter("battleship_reaped_connections_total", "Connections closed after missing heartbeats",
+                 callback=lambda: manager.reaped_connections)
+REGISTRY.counter("battleship_hasher_rejected_total", "Password hashing calls rejected as busy",
+                 callback=lambda: password_hasher.rejected)
+REGISTRY.gauge("battleship_match_queue_waiting", "Players waiting in this worker's matchmaking queue",
+               callback=lambda: len(match_queue))
+REGISTRY.gauge("battleship_room_actor_backlog", "Jobs queued on this worker's room actors",
+               callback=lambda: sum(actor.backlog() for actor in manager.actors.values()))
+REGISTRY.gauge("battleship_spectators", "Spectators connected to this worker",
+               callback=lambda: len(manager.spectators))
+REGISTRY.gauge("battleship_pending_games", "Finished games waiting to be written",
+               callback=lambda: len(persistence.pending))
 
 # Helper functions
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+def hasher_busy_exception(exc: HasherBusy):
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is busy, please retry",
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def verify_password(plain_password, hashed_password):
+    """Return (valid, new_hash); new_hash is set when the stored hash is outdated."""
+    try:
+        return await password_hasher.verify_and_update(plain_password, hashed_password)
+    except HasherBusy as e:
+        raise hasher_busy_exception(e)
+
+async def get_password_hash(password):
+    try:
+        return await password_hasher.hash(password)
+    except HasherBusy as e:
+        raise hasher_busy_exception(e)
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -132,19 +274,30 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+    username = auth_cache.get_token(token)
+    if username is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            username: str = payload.get("sub")
+            if username is None:
+                raise credentials_exception
+        except JWTError:
             raise credentials_exception
-    except JWTError:
-        raise credentials_exception
+        auth_cache.put_token(token, username, payload.get("exp"))
     
-    user = await db.users.find_one({"username": username})
+    user = auth_cache.get_user(username)
     if user is None:
-        raise credentials_exception
+        user = await db.users.find_one({"username": username}, USER_PROJECTION)
+        if user is None:
+            raise credentials_exception
+        auth_cache.put_user(username, user)
     return user
 
+async def get_admin_user(current_user: dict = Depends(get_current_user)):
+    if current_user["username"] not in ADMIN_USERNAMES:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admins only")
+    return current_user
+
 # Auth Routes
 @api_router.get("/")
 async def root():
@@ -152,20 +305,30 @@ async def root():
 
 @api_router.post("/auth/register", response_model=Token)
 async def register(user: UserRegister):
+    if user.username == BOT_USERNAME:
+        raise HTTPException(status_code=400, detail="Username already exists")
     existing_user = await db.users.find_one({"username": user.username})
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already exists")
     
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     user_doc = {
         "username": user.username,
         "password": hashed_password,
         "wins": 0,
         "losses": 0,
         "games_played": 0,
+        "rating": DEFAULT_RATING,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
-    await db.users.insert_one(user_doc)
+    try:
+        await db.users.insert_one(user_doc)
+    except DuplicateKeyError:
+        # Lost a race with a registration of the same name
+        raise HTTPException(status_code=400, detail="Username already exists")
+    auth_cache.invalidate_user(user.username)
+    leaderboard_cache.apply(user_doc)
+    await announce_stats_change([user.username])
     
     access_token = create_access_token(data={"sub": user.username})
     return {"access_token": access_token, "token_type": "bearer"}
@@ -173,8 +336,15 @@ async def register(user: UserRegister):
 @api_router.post("/auth/login", response_model=Token)
 async def login(user: UserLogin):
     db_user = await db.users.find_one({"username": user.username})
-    if not db_user or not verify_password(user.password, db_user["password"]):
+    if not db_user:
         raise HTTPException(status_code=400, detail="Invalid credentials")
+    valid, new_hash = await verify_password(user.password, db_user["password"])
+    if not valid:
+        raise HTTPException(status_code=400, detail="Invalid credentials")
+    if new_hash:
+        # Stored hash predates the current cost factor
+        await db.users.update_one({"username": user.username}, {"$set": {"password": new_hash}})
+        auth_cache.invalidate_user(user.username)
     
     access_token = create_access_token(data={"sub": user.username})
     return {"access_token": access_token, "token_type": "bearer"}
@@ -186,38 +356,600 @@ async def get_me(current_user: dict = Depends(get_current_user)):
         wins=current_user.get("wins", 0),
         losses=current_user.get("losses", 0),
         games_played=current_user.get("games_played", 0),
+        rating=current_user.get("rating", DEFAULT_RATING),
         created_at=current_user["created_at"]
     )
 
 # Game Routes
 @api_router.get("/leaderboard", response_model=List[LeaderboardEntry])
-async def get_leaderboard():
-    users = await db.users.find({}, {"_id": 0, "password": 0}).to_list(100)
-    leaderboard = []
-    for user in users:
-        win_rate = user["wins"] / user["games_played"] * 100 if user["games_played"] > 0 else 0
-        leaderboard.append(LeaderboardEntry(
-            username=user["username"],
-            wins=user["wins"],
-            losses=user["losses"],
-            games_played=user["games_played"],
-            win_rate=round(win_rate, 2)
-        ))
-    leaderboard.sort(key=lambda x: (x.wins, x.win_rate), reverse=True)
-    return leaderboard[:10]
+async def get_leaderboard(limit: int = Query(10, ge=1, le=100), offset: int = Query(0, ge=0)):
+    return await leaderboard_cache.get(db.users, offset, limit)
+
+@api_router.get("/cache/stats")
+async def get_cache_stats():
+    return {"leaderboard": leaderboard_cache.stats(), "auth": auth_cache.stats()}
+
+@api_router.get("/server/stats")
+async def get_server_stats():
+    return {**manager.stats(), "persistence": persistence.stats(), "matchmaking": match_queue.stats()}
+
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@api_router.get("/admin/profile")
+async def profile_server(
+    seconds: float = Query(10, gt=0, le=PROFILE_MAX_SECONDS),
+    hz: int = Query(100, ge=1, le=1000),
+    admin: dict = Depends(get_admin_user)
+):
+    """Sample every thread's stack for ``seconds`` and return them as collapsed stacks for a flame graph."""
+    if profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    async with profile_lock:
+        stacks = await asyncio.to_thread(sample_stacks, seconds, 1 / hz)
+    return PlainTextResponse(format_collapsed(stacks))
+
+@api_router.get("/admin/stalls")
+async def get_loop_stalls(admin: dict = Depends(get_admin_user)):
+    """The latest event loop stalls the watchdog caught, newest first."""
+    if stall_watchdog is None:
+        return {"threshold_ms": 0, "stalls": 0, "recent": []}
+    return {
+        "threshold_ms": stall_watchdog.threshold * 1000,
+        "stalls": stall_watchdog.stalls,
+        "recent": [report.as_dict() for report in reversed(stall_watchdog.recent)],
+    }
 
 @api_router.get("/history", response_model=List[GameHistory])
-async def get_game_history(current_user: dict = Depends(get_current_user)):
-    username = current_user["username"]
+async def get_game_history(
+    response: Response,
+    before: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    current_user: dict = Depends(get_current_user)
+):
+    """Newest games first; a full page sets ``X-Next-Cursor``, passed back as ``before`` for the next."""
+    try:
+        after = decode_cursor(before) if before else None
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     games = await db.games.find(
-        {"$or": [{"player1": username}, {"player2": username}]},
-        {"_id": 0}
-    ).sort("finished_at", -1).limit(20).to_list(20)
+        history_filter(current_user["username"], after), HISTORY_PROJECTION
+    ).sort(HISTORY_SORT).limit(limit).to_list(limit)
+    if len(games) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(games[-1])
     return games
 
+@api_router.get("/stats/{username}")
+async def get_player_stats(username: str):
+    doc = await db.player_stats.find_one({"username": username}, PLAYER_STATS_PROJECTION)
+    if doc is None and not await db.users.find_one({"username": username}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="User not found")
+    pairs = await db.head_to_head.find(
+        {"players": username}, {"_id": 0, "players": 1, "wins": 1, "games": 1}
+    ).sort("games", -1).limit(HEAD_TO_HEAD_LIMIT).to_list(HEAD_TO_HEAD_LIMIT)
+    return summarize(username, doc, pairs)
+
+def ndjson(records):
+    for record in records:
+        yield json_dumps(record) + "\n"
+
+@api_router.get("/games/export")
+async def export_games(
+    after: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=100000),
+    current_user: dict = Depends(get_current_user)
+):
+    """Stream finished games as NDJSON records, oldest first.
+
+    Each record carries its ``cursor``; the last one, passed back as
+    ``after``, continues the export.
+    """
+    try:
+        key = decode_cursor(after) if after else None
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    cursor = db.games.find(export_filter(key), {"_id": 0}).sort(EXPORT_SORT).limit(limit).batch_size(500)
+
+    async def records():
+        async for game in cursor:
+            yield json_dumps({**export_record(game), "cursor": encode_cursor(game)}) + "\n"
+
+    return StreamingResponse(records(), media_type="application/x-ndjson")
+
+@api_router.get("/games/{game_id}/replay")
+async def replay_game(game_id: str, current_user: dict = Depends(get_current_user)):
+    game = await db.games.find_one({"id": game_id}, {"_id": 0})
+    if game is None or "moves" not in game:
+        raise HTTPException(status_code=404, detail="Replay not found")
+    return StreamingResponse(ndjson(replay_events(game)), media_type="application/x-ndjson")
+
+async def get_rating(username: str) -> int:
+    user = await db.users.find_one({"username": username}, {"_id": 0, "rating": 1})
+    if user is None:
+        return DEFAULT_RATING
+    if "rating" not in user:
+        # Accounts from before ratings: store the default so later $inc updates start from it
+        await db.users.update_one({"username": username, "rating": {"$exists": False}},
+                                  {"$set": {"rating": DEFAULT_RATING}})
+        return DEFAULT_RATING
+    return user["rating"]
+
+async def load_ratings(room: dict):
+    ratings = await asyncio.gather(*(get_rating(p) for p in room["players"]))
+    room["ratings"] = dict(zip(room["players"], ratings))
+
+async def open_room(room: dict) -> Optional[str]:
+    """Claim a fresh code for ``room`` and own it; None while the server drains."""
+    # Codes are claimed in the shared store so they resolve on every worker;
+    # with shards, only codes that hash to this one are handed out
+    while True:
+        if manager.draining:
+            return None
+        room_code = str(uuid.uuid4())[:6].upper()
+        if not manager.owns(room_code):
+            continue
+        room["code"] = room_code
+        if await manager.create_room(room_code, room):
+            return room_code
+
+def new_game_state(host: str, guest: str) -> dict:
+    return {
+        "boards": {guest: None, host: None},
+        "ready": {guest: False, host: False},
+        "current_turn": host,
+        "first_turn": host,
+        # One byte per shot in firing order, see move_log; each player's shots are read back from it
+        "moves": bytearray(),
+        "started_at": datetime.now(timezone.utc).isoformat()
+    }
+
+# Pending bot moves, referenced here so they are not garbage collected
+bot_tasks: Set[asyncio.Task] = set()
+chat_tasks: Set[asyncio.Task] = set()
+
+def schedule_bot_turn(room_code: str):
+    task = asyncio.create_task(play_bot_turn(room_code))
+    bot_tasks.add(task)
+    task.add_done_callback(bot_tasks.discard)
+
+async def play_bot_turn(room_code: str):
+    await asyncio.sleep(BOT_MOVE_DELAY)
+    await manager.run_in_room(room_code, play_bot_move, room_code)
+
+async def play_bot_move(room_code: str):
+    room = manager.rooms.get(room_code)
+    if room is None or room["status"] != "playing" or room["game_state"]["current_turn"] != BOT_USERNAME:
+        return
+    bot = room["bot"]
+    index = bot.choose()
+    try:
+        shot = await resolve_attack(room_code, room, BOT_USERNAME, index % BOARD_SIZE, index // BOARD_SIZE)
+    except Exception as e:
+        logger.error(f"Bot move failed in room {room_code}: {e}")
+        return
+    bot.record(index, shot.hit, shot.sunk_ship)
+
+# WebSocket message handlers
+ws_router = MessageRouter(latency=WS_HANDLER_SECONDS)
+
+@ws_router.handler("create_room")
+async def handle_create_room(username: str, message: dict):
+    match_queue.remove(username)
+    room = {
+        "code": None,
+        "players": [username],
+        "host": username,
+        "game_state": None,
+        "status": "waiting"
+    }
+    room_code = await open_room(room)
+    if room_code is None:
+        await manager.send_personal_message({
+            "type": "error",
+            "message": RESTARTING_MESSAGE
+        }, username)
+        return
+    await manager.bind(username, room_code)
+    await manager.send_personal_message({
+        "type": "room_created",
+        "room_code": room_code
+    }, username)
+
+@ws_router.handler("join_room", schema={"room_code": str})
+async def handle_join_room(username: str, message: dict):
+    room_code = message["room_code"]
+    if room_code not in manager.rooms:
+        await manager.send_personal_message({
+            "type": "error",
+            "message": "Room not found"
+        }, username)
+        return
+    
+    room = manager.rooms[room_code]
+    if username in room["players"]:
+        # Same user on a new socket, e.g. the lobby handing over to the game page
+        await manager.bind(username, room_code)
+        await manager.send_personal_message({
+            "type": "room_joined",
+            "room_code": room_code,
+            "players": room["players"],
+            "status": room["status"]
+        }, username)
+        return
+    if len(room["players"]) >= 2:
+        await manager.send_personal_message({
+            "type": "error",
+            "message": "Room is full"
+        }, username)
+        return
+    
+    room["players"].append(username)
+    await manager.bind(username, room_code)
+    room["status"] = "placement"
+    room["game_state"] = new_game_state(room["host"], username)
+    
+    await manager.broadcast_to_room({
+        "type": "player_joined",
+        "players": room["players"],
+        "status": "placement"
+    }, room_code)
+    await load_ratings(room)
+
+def game_shots(state: dict) -> dict:
+    first = state["first_turn"]
+    second = next(p for p in state["boards"] if p != first)
+    return shots_by_player(first, second, state["moves"])
+
+def game_snapshot(room: dict, username: str) -> dict:
+    """Everything ``username`` needs to redraw the game after missing events."""
+    snapshot = {
+        "type": "snapshot",
+        "room_code": room["code"],
+        "seq": room["seq"],
+        "players": room["players"],
+        "status": room["status"]
+    }
+    state = room["game_state"]
+    if state is None:
+        return snapshot
+    opponent = next((p for p in room["players"] if p != username), None)
+    board = state["boards"].get(username)
+    shots = game_shots(state)
+    snapshot.update({
+        "current_turn": state["current_turn"],
+        "ready": state["ready"].get(username, False),
+        "ships": None if board is None else {
+            name: [{"x": i % BOARD_SIZE, "y": i // BOARD_SIZE} for i in mask_cells(mask)]
+            for name, mask in zip(board.names, board.ship_masks)
+        },
+        "shots": [{"x": x, "y": y, "hit": hit} for x, y, hit in shots.get(username, ())],
+        "opponent_shots": [{"x": x, "y": y, "hit": hit} for x, y, hit in shots.get(opponent, ())]
+    })
+    return snapshot
+
+@ws_router.handler("resume", schema={"room_code": str, "last_seq": int})
+async def handle_resume(username: str, message: dict):
+    room_code = message["room_code"]
+    room = manager.rooms.get(room_code)
+    if room is None or username not in room["players"]:
+        await manager.send_personal_message({
+            "type": "room_closed",
+            "reason": "gone"
+        }, username)
+        return
+    # Catch up before binding, so the events the client sees stay in seq order
+    events = manager.events_since(room_code, message["last_seq"])
+    if events is None:
+        await manager.send_personal_message(game_snapshot(room, username), username)
+    else:
+        await manager.send_personal_message({
+            "type": "resumed",
+            "room_code": room_code,
+            "seq": room["seq"],
+            "events": events
+        }, username)
+    await manager.bind(username, room_code)
+
+def spectator_view(room: dict) -> dict:
+    """The public side of ``room``: shots, turn and sunk ships, but no ship positions."""
+    players = list(room["players"])
+    view = {
+        "room_code": room["code"],
+        "seq": room["seq"],
+        "players": players,
+        "status": room["status"],
+        "current_turn": None,
+        "shots": {p: [] for p in players},
+        "sunk": {p: [] for p in players}
+    }
+    state = room["game_state"]
+    if state is None:
+        return view
+    view["current_turn"] = state["current_turn"]
+    shots = game_shots(state)
+    for player in players:
+        view["shots"][player] = [list(shot) for shot in shots.get(player, ())]
+        opponent = next((p for p in players if p != player), None)
+        board = state["boards"].get(opponent)
+        if board is not None:
+            view["sunk"][player] = [name for name, left in zip(board.names, board.remaining) if left == 0]
+    return view
+
+@ws_router.handler("spectate", schema={"room_code": str})
+async def handle_spectate(username: str, message: dict):
+    room = manager.rooms.get(message["room_code"])
+    if room is None:
+        await manager.send_personal_message({
+            "type": "error",
+            "message": "Room not found"
+        }, username)
+        return
+    await manager.watch(username, room["code"], spectator_view(room))
+
+async def start_matched_game(host: str, guest: str):
+    room = {
+        "code": None,
+        "players": [host, guest],
+        "host": host,
+        "game_state": new_game_state(host, guest),
+        "status": "placement"
+    }
+    room_code = await open_room(room)
+    if room_code is None:
+        await manager.send_to_users({"type": "error", "message": RESTARTING_MESSAGE}, room["players"])
+        return
+    await manager.run_in_room(room_code, seat_matched_players, room_code, room)
+
+async def seat_matched_players(room_code: str, room: dict):
+    for player in room["players"]:
+        await manager.bind(player, room_code)
+    await manager.broadcast_to_room({
+        "type": "match_found",
+        "room_code": room_code,
+        "players": room["players"],
+        "status": "placement"
+    }, room_code)
+    await load_ratings(room)
+
+async def run_matchmaker():
+    while True:
+        await asyncio.sleep(MATCH_SWEEP_INTERVAL)
+        if manager.draining:
+            continue
+        for host, guest in match_queue.sweep():
+            try:
+                await start_matched_game(host, guest)
+            except Exception as e:
+                logger.error(f"Failed to start matched game: {e}")
+
+@ws_router.handler("find_match")
+async def handle_find_match(username: str, message: dict):
+    connection = manager.active_connections.get(username)
+    if username in manager.user_to_room or (connection and connection.room_code):
+        await manager.send_personal_message({
+            "type": "error",
+            "message": "Already in a room"
+        }, username)
+        return
+    
+    rating = await get_rating(username)
+    pair = match_queue.add(username, rating)
+    if pair:
+        await start_matched_game(*pair)
+    else:
+        await manager.send_personal_message({
+            "type": "match_searching",
+            "rating": rating
+        }, username)
+
+@ws_router.handler("cancel_match")
+async def handle_cancel_match(username: str, message: dict):
+    if match_queue.remove(username):
+        await manager.send_personal_message({"type": "match_cancelled"}, username)
+
+@ws_router.handler("add_bot")
+async def handle_add_bot(username: str, message: dict):
+    room_code = manager.user_to_room.get(username)
+    room = manager.rooms.get(room_code) if room_code else None
+    if room is None or room["host"] != username or len(room["players"]) != 1:
+        await manager.send_personal_message({
+            "type": "error",
+            "message": "Cannot add a bot to this room"
+        }, username)
+        return
+    
+    bot = BotPlayer()
+    room["bot"] = bot
+    room["players"].append(BOT_USERNAME)
+    room["status"] = "placement"
+    room["game_state"] = new_game_state(username, BOT_USERNAME)
+    room["game_state"]["boards"][BOT_USERNAME] = bot.place_fleet()
+    room["game_state"]["ready"][BOT_USERNAME] = True
+    
+    await manager.broadcast_to_room({
+        "type": "player_joined",
+        "players": room["players"],
+        "status": "placement"
+    }, room_code)
+    await manager.broadcast_to_room({
+        "type": "player_ready",
+        "player": BOT_USERNAME
+    }, room_code)
+
+@ws_router.handler("place_ships", schema={"ships": dict})
+async def handle_place_ships(username: str, message: dict):
+    room_code = manager.user_to_room.get(username)
+    if not room_code:
+        return
+    
+    room = manager.rooms[room_code]
+    if room["status"] != "placement" or room["game_state"]["ready"].get(username):
+        await manager.send_personal_message({
+            "type": "error",
+            "message": "Ships can no longer be placed"
+        }, username)
+        return
+    try:
+        board = Board.from_placement(message["ships"])
+    except PlacementError as e:
+        await manager.send_personal_message({
+            "type": "error",
+            "message": f"Invalid ship placement: {e}"
+        }, username)
+        return
+    room["game_state"]["boards"][username] = board
+    room["game_state"]["ready"][username] = True
+    
+    all_ready = all(room["game_state"]["ready"].values())
+    if all_ready:
+        room["status"] = "playing"
+        await manager.broadcast_to_room({
+            "type": "game_start",
+            "current_turn": room["game_state"]["current_turn"]
+        }, room_code)
+    else:
+        await manager.broadcast_to_room({
+            "type": "player_ready",
+            "player": username
+        }, room_code)
+
+@ws_router.handler("attack", schema={"x": int, "y": int})
+async def handle_attack(username: str, message: dict):
+    room_code = manager.user_to_room.get(username)
+    if not room_code:
+        return
+    
+    room = manager.rooms[room_code]
+    if room["status"] != "playing" or room["game_state"]["current_turn"] != username:
+        return
+    
+    x, y = message["x"], message["y"]
+    if cell_index(x, y) < 0:
+        await manager.send_personal_message({
+            "type": "error",
+            "message": "Invalid coordinates"
+        }, username)
+        return
+    await resolve_attack(room_code, room, username, x, y)
+
+async def resolve_attack(room_code: str, room: dict, username: str, x: int, y: int):
+    """Fire ``username``'s shot at (x, y), broadcast the outcome and return it."""
+    index = cell_index(x, y)
+    opponent = [p for p in room["players"] if p != username][0]
+    shot = room["game_state"]["boards"][opponent].fire(index)
+    hit = shot.hit
+    sunk_ship = shot.sunk_ship
+    
+    room["game_state"]["moves"].append(pack_shot(index, hit))
+    
+    if shot.won:
+        await finish_game(room_code, room, username, opponent)
+    else:
+        # Switch turn
+        room["game_state"]["current_turn"] = opponent
+        
+        await manager.broadcast_to_room({
+            "type": "attack_result",
+            "attacker": username,
+            "x": x,
+            "y": y,
+            "hit": hit,
+            "sunk_ship": sunk_ship,
+            "current_turn": opponent
+        }, room_code)
+        if opponent == BOT_USERNAME and "bot" in room:
+            schedule_bot_turn(room_code)
+    return shot
+
+async def finish_game(room_code: str, room: dict, winner: str, loser: str, forfeit: bool = False):
+    """Record the game, reveal the fleets to everyone in the room and close it."""
+    duration = (datetime.now(timezone.utc) - datetime.fromisoformat(room["game_state"]["started_at"])).seconds
+    game_doc = {
+        "id": str(uuid.uuid4()),
+        "player1": room["players"][0],
+        "player2": room["players"][1],
+        "winner": winner,
+        "loser": loser,
+        "duration_seconds": duration,
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+        "first_turn": room["game_state"]["first_turn"],
+        "fleets": [pack_fleet(room["game_state"]["boards"][p]) for p in room["players"]],
+        "moves": bytes(room["game_state"]["moves"])
+    }
+    if forfeit:
+        game_doc["forfeit"] = True
+    winner_stats = {"wins": 1, "games_played": 1}
+    loser_stats = {"losses": 1, "games_played": 1}
+    ratings = room.get("ratings")
+    if ratings:
+        delta = elo_delta(ratings[winner], ratings[loser])
+        winner_stats["rating"] = delta
+        loser_stats["rating"] = -delta
+    # Games against the bot go into history but not into win/loss stats
+    persistence.record_game(game_doc, [] if "bot" in room else [
+        (winner, winner_stats),
+        (loser, loser_stats),
+    ])
+    
+    # Fleets are revealed once the game is over, to players and spectators alike
+    await manager.broadcast_to_room({
+        "type": "game_over",
+        "winner": winner,
+        "loser": loser,
+        "forfeit": forfeit,
+        "fleets": {p: fleet_cells(room["game_state"]["boards"][p]) for p in room["players"]}
+    }, room_code)
+    
+    await manager.close_room(room_code)
+
+async def forfeit_game(room_code: str, room: dict, username: str):
+    """``username`` lost their seat mid-game; the other player wins."""
+    opponent = [p for p in room["players"] if p != username][0]
+    await finish_game(room_code, room, opponent, username, forfeit=True)
+
+@ws_router.handler("chat", schema={"message": str})
+async def handle_chat(username: str, message: dict):
+    room_code = manager.user_to_room.get(username)
+    if not room_code:
+        return
+    room = manager.rooms[room_code]
+    room.setdefault("chat_pending", []).append({
+        "username": username,
+        "message": message["message"],
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    })
+    if room.get("chat_flush_due"):
+        return
+    # The first message after a quiet spell goes out at once; a burst waits for the next window
+    wait = room.get("chat_sent_at", float("-inf")) + CHAT_BATCH_INTERVAL - asyncio.get_running_loop().time()
+    if wait <= 0:
+        await flush_chat(room_code, room)
+        return
+    room["chat_flush_due"] = True
+    task = asyncio.create_task(flush_chat_later(room_code, wait))
+    chat_tasks.add(task)
+    task.add_done_callback(chat_tasks.discard)
+
+async def flush_chat_later(room_code: str, delay: float):
+    await asyncio.sleep(delay)
+    await manager.run_in_room(room_code, flush_pending_chat, room_code)
+
+async def flush_pending_chat(room_code: str):
+    room = manager.rooms.get(room_code)
+    if room is not None:
+        await flush_chat(room_code, room)
+
+async def flush_chat(room_code: str, room: dict):
+    messages = room.pop("chat_pending", [])
+    room["chat_flush_due"] = False
+    room["chat_sent_at"] = asyncio.get_running_loop().time()
+    if messages:
+        await manager.broadcast_to_room({"type": "chat_batch", "messages": messages}, room_code)
+
 # WebSocket endpoint  
 @app.websocket("/api/ws/{token}")
-async def websocket_endpoint(websocket: WebSocket, token: str):
+async def websocket_endpoint(websocket: WebSocket, token: str, encoding: str = "json"):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username = payload.get("sub")
@@ -228,178 +960,38 @@ async def websocket_endpoint(websocket: WebSocket, token: str):
         await websocket.close(code=1008)
         return
 
-    await manager.connect(websocket, username)
+    codec = get_codec(encoding)
+    if codec is None:
+        await websocket.close(code=1003)
+        return
+
+    connection = await manager.connect(websocket, username, codec)
     
     try:
         while True:
-            data = await websocket.receive_text()
-            message = json.loads(data)
-            msg_type = message.get("type")
-
-            if msg_type == "create_room":
-                room_code = str(uuid.uuid4())[:6].upper()
-                manager.rooms[room_code] = {
-                    "code": room_code,
-                    "players": [username],
-                    "host": username,
-                    "game_state": None,
-                    "status": "waiting"
-                }
-                manager.user_to_room[username] = room_code
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            data = frame.get("text")
+            if data is None:
+                data = frame.get("bytes")
+            try:
+                if len(data) > MAX_FRAME_BYTES:
+                    raise ProtocolError("Frame too large")
+                await manager.route(connection, codec.decode(data))
+            except ProtocolError as e:
                 await manager.send_personal_message({
-                    "type": "room_created",
-                    "room_code": room_code
+                    "type": "error",
+                    "message": str(e)
                 }, username)
 
-            elif msg_type == "join_room":
-                room_code = message.get("room_code")
-                if room_code not in manager.rooms:
-                    await manager.send_personal_message({
-                        "type": "error",
-                        "message": "Room not found"
-                    }, username)
-                    continue
-                
-                room = manager.rooms[room_code]
-                if len(room["players"]) >= 2:
-                    await manager.send_personal_message({
-                        "type": "error",
-                        "message": "Room is full"
-                    }, username)
-                    continue
-                
-                room["players"].append(username)
-                manager.user_to_room[username] = room_code
-                room["status"] = "placement"
-                room["game_state"] = {
-                    "boards": {username: {}, room["host"]: {}},
-                    "ready": {username: False, room["host"]: False},
-                    "current_turn": room["host"],
-                    "hits": {username: [], room["host"]: []},
-                    "started_at": datetime.now(timezone.utc).isoformat()
-                }
-                
-                await manager.broadcast_to_room({
-                    "type": "player_joined",
-                    "players": room["players"],
-                    "status": "placement"
-                }, room_code)
-
-            elif msg_type == "place_ships":
-                room_code = manager.user_to_room.get(username)
-                if not room_code:
-                    continue
-                
-                room = manager.rooms[room_code]
-                ships = message.get("ships")
-                room["game_state"]["boards"][username] = ships
-                room["game_state"]["ready"][username] = True
-                
-                all_ready = all(room["game_state"]["ready"].values())
-                if all_ready:
-                    room["status"] = "playing"
-                    await manager.broadcast_to_room({
-                        "type": "game_start",
-                        "current_turn": room["game_state"]["current_turn"]
-                    }, room_code)
-                else:
-                    await manager.broadcast_to_room({
-                        "type": "player_ready",
-                        "player": username
-                    }, room_code)
-
-            elif msg_type == "attack":
-                room_code = manager.user_to_room.get(username)
-                if not room_code:
-                    continue
-                
-                room = manager.rooms[room_code]
-                if room["game_state"]["current_turn"] != username:
-                    continue
-                
-                x, y = message.get("x"), message.get("y")
-                opponent = [p for p in room["players"] if p != username][0]
-                opponent_board = room["game_state"]["boards"][opponent]
-                
-                hit = False
-                sunk_ship = None
-                for ship_name, ship_data in opponent_board.items():
-                    for coord in ship_data["coords"]:
-                        if coord["x"] == x and coord["y"] == y:
-                            hit = True
-                            coord["hit"] = True
-                            if all(c.get("hit", False) for c in ship_data["coords"]):
-                                sunk_ship = ship_name
-                            break
-                
-                room["game_state"]["hits"][username].append({"x": x, "y": y, "hit": hit})
-                
-                # Check win condition
-                all_sunk = all(
-                    all(c.get("hit", False) for c in ship["coords"])
-                    for ship in opponent_board.values()
-                )
-                
-                if all_sunk:
-                    # Game over
-                    duration = (datetime.now(timezone.utc) - datetime.fromisoformat(room["game_state"]["started_at"])).seconds
-                    game_doc = {
-                        "id": str(uuid.uuid4()),
-                        "player1": room["players"][0],
-                        "player2": room["players"][1],
-                        "winner": username,
-                        "loser": opponent,
-                        "duration_seconds": duration,
-                        "finished_at": datetime.now(timezone.utc).isoformat()
-                    }
-                    await db.games.insert_one(game_doc)
-                    
-                    # Update stats
-                    await db.users.update_one(
-                        {"username": username},
-                        {"$inc": {"wins": 1, "games_played": 1}}
-                    )
-                    await db.users.update_one(
-                        {"username": opponent},
-                        {"$inc": {"losses": 1, "games_played": 1}}
-                    )
-                    
-                    await manager.broadcast_to_room({
-                        "type": "game_over",
-                        "winner": username,
-                        "loser": opponent
-                    }, room_code)
-                    
-                    del manager.rooms[room_code]
-                else:
-                    # Switch turn
-                    room["game_state"]["current_turn"] = opponent
-                    
-                    await manager.broadcast_to_room({
-                        "type": "attack_result",
-                        "attacker": username,
-                        "x": x,
-                        "y": y,
-                        "hit": hit,
-                        "sunk_ship": sunk_ship,
-                        "current_turn": opponent
-                    }, room_code)
-
-            elif msg_type == "chat":
-                room_code = manager.user_to_room.get(username)
-                if room_code:
-                    await manager.broadcast_to_room({
-                        "type": "chat",
-                        "username": username,
-                        "message": message.get("message"),
-                        "timestamp": datetime.now(timezone.utc).isoformat()
-                    }, room_code)
-
     except WebSocketDisconnect:
-        manager.disconnect(username)
+        await manager.disconnect(username, connection)
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
-        manager.disconnect(username)
+        await manager.disconnect(username, connection)
+    if username not in manager.active_connections:
+        match_queue.remove(username)
 
 app.include_router(api_router)
 
@@ -409,6 +1001,7 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 logging.basicConfig(
@@ -417,6 +1010,110 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def create_indexes():
+    await ensure_indexes(db)
+
+loop_lag_task: Optional[asyncio.Task] = None
+matchmaker_task: Optional[asyncio.Task] = None
+
+def snapshot_path() -> Optional[str]:
+    return ROOM_SNAPSHOT_PATH and ROOM_SNAPSHOT_PATH.format(worker=manager.worker_id)
+
+# Rooms of the last snapshot that nobody has come back to yet, and when their seats expire
+restored_rooms: Optional[RoomSnapshot] = None
+restored_until = 0.0
+restore_expiry_task: Optional[asyncio.Task] = None
+
+async def restore_rooms(path: str):
+    """Own the rooms a previous process left in ``path``; their players resume into them.
+
+    Only the codes are read here. Each room is decoded by
+    :func:`load_restored_room` when its first frame arrives.
+    """
+    global restored_rooms, restored_until, restore_expiry_task
+    start = time.perf_counter()
+    try:
+        snapshot = RoomSnapshot(path)
+    except (OSError, SnapshotError) as e:
+        logger.error(f"Could not restore rooms from {path}: {e}")
+        return
+    codes = snapshot.codes()
+    claimed = await manager.claim_rooms(codes)
+    if len(claimed) < len(codes):
+        for room_code in set(codes).difference(claimed):
+            snapshot.discard(room_code)
+    # Restored once; a crash later must not bring back these states
+    os.remove(path)
+    restored_rooms, restored_until = snapshot, time.monotonic() + RESTORE_SEAT_GRACE
+    manager.load_room = load_restored_room
+    restore_expiry_task = asyncio.create_task(expire_restored_rooms())
+    logger.info(f"Restored {len(claimed)} of {len(codes)} rooms in {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+async def load_restored_room(room_code: str) -> Optional[dict]:
+    room = restored_rooms.take(room_code) if restored_rooms is not None else None
+    if room is None:
+        return None
+    away = [p for p in room["players"] if p != BOT_USERNAME]
+    manager.restore_room(room, away, max(restored_until - time.monotonic(), 0.0))
+    # The bot's pending move was cancelled with the old process
+    if room["status"] == "playing" and room["game_state"]["current_turn"] == BOT_USERNAME and "bot" in room:
+        schedule_bot_turn(room_code)
+    return room
+
+async def expire_restored_rooms():
+    """Give up the restored rooms nobody resumed into once their seats would have expired."""
+    global restored_rooms
+    await asyncio.sleep(RESTORE_SEAT_GRACE)
+    snapshot, restored_rooms = restored_rooms, None
+    manager.load_room = None
+    await manager.release_rooms(snapshot.codes())
+    logger.info(f"Released {len(snapshot)} restored rooms nobody resumed")
+    snapshot.close()
+
+async def snapshot_rooms(path: str):
+    """Drain and write every live room to ``path`` for the next process to restore."""
+    await manager.drain(DRAIN_TIMEOUT)
+    start = time.perf_counter()
+    if restore_expiry_task is not None:
+        restore_expiry_task.cancel()
+    # Restored rooms still waiting for their players are carried over
+    pending = restored_rooms.take_all() if restored_rooms is not None else []
+    count = write_snapshot(path, [*manager.rooms.values(), *pending])
+    await manager.release_rooms([*manager.rooms, *(room["code"] for room in pending)])
+    logger.info(f"Wrote {count} rooms to {path} in {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+@app.on_event("startup")
+async def start_connection_manager():
+    global loop_lag_task, matchmaker_task
+    manager.on_forfeit = forfeit_game
+    await manager.start(ws_router.dispatch)
+    await manager.store.subscribe(STATS_CHANNEL, on_stats_notice)
+    path = snapshot_path()
+    if path and os.path.exists(path):
+        await restore_rooms(path)
+    persistence.start()
+    loop_lag_task = asyncio.create_task(sample_event_loop_lag())
+    if stall_watchdog is not None:
+        stall_watchdog.start(asyncio.get_running_loop())
+    matchmaker_task = asyncio.create_task(run_matchmaker())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    for task in (loop_lag_task, matchmaker_task):
+        if task is not None:
+            task.cancel()
+    if stall_watchdog is not None:
+        stall_watchdog.stop()
+    path = snapshot_path()
+    if path:
+        try:
+            await snapshot_rooms(path)
+        except Exception as e:
+            logger.error(f"Could not write room snapshot to {path}: {e}")
+    for task in list(bot_tasks) + list(chat_tasks) + list(stats_refresh_tasks):
+        task.cancel()
+    await manager.stop()
+    await persistence.stop()
+    client.close()
+    password_hasher.shutdown()
\ No newline at end of file
@@ -0,0 +1,118 @@
+"""Run one server process per core on a single host, with rooms hashed onto them.
+
+Every shard is a full server worker: its own event loop, its own sockets and
+the rooms it owns, each run by a :class:`room_actor.RoomActor`. Rooms are
+placed with a consistent hash ring over the shard ids, so every shard can
+tell which one owns a room code without asking the room store. A shard only
+hands out codes that hash to itself, so creating a room never leaves the
+shard that received the request, and ``join_room``, ``resume`` and
+``spectate`` frames go straight to the owner over the room store's pub/sub
+like any other forwarded frame.
+
+Running it::
+
+    ROOM_STORE=redis python shards.py --shards 4 --port 8001
+
+The launcher binds the port once and hands the socket to ``--shards``
+uvicorn processes, started with ``SHARD_INDEX`` and ``SHARD_COUNT`` set, and
+restarts any that exit. Shards talk to each other through Redis, so more
+than one needs ``ROOM_STORE=redis``.
+"""
+import argparse
+import bisect
+import hashlib
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+# Points per shard on the ring; more points even out the share each shard gets
+RING_REPLICAS = 64
+
+
+def shard_id(index: int) -> str:
+    return f"shard-{index}"
+
+
+def _point(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    def __init__(self, nodes: Sequence[str], replicas: int = RING_REPLICAS):
+        if not nodes:
+            raise ValueError("A hash ring needs at least one node")
+        points = sorted((_point(f"{node}#{i}"), node) for node in nodes for i in range(replicas))
+        self.nodes = list(nodes)
+        self.points = [point for point, _ in points]
+        self.owners = [node for _, node in points]
+
+    @classmethod
+    def for_shards(cls, count: int) -> "HashRing":
+        return cls([shard_id(i) for i in range(count)])
+
+    def owner(self, key: str) -> str:
+        i = bisect.bisect(self.points, _point(key))
+        return self.owners[i % len(self.owners)]
+
+
+def shard_from_env(env=os.environ) -> Optional[int]:
+    """This process's shard index, or None outside the launcher."""
+    index = env.get("SHARD_INDEX")
+    return None if index is None else int(index)
+
+
+def spawn(index: int, count: int, fd: int, extra_args: List[str]) -> subprocess.Popen:
+    env = {**os.environ, "SHARD_INDEX": str(index), "SHARD_COUNT": str(count)}
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--fd", str(fd), *extra_args],
+        cwd=Path(__file__).resolve().parent,
+        env=env,
+        pass_fds=(fd,),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shards", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8001)
+    args, uvicorn_args = parser.parse_known_args()
+    if args.shards > 1 and os.environ.get("ROOM_STORE", "memory") != "redis":
+        parser.error("more than one shard needs ROOM_STORE=redis")
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    shards: Dict[int, subprocess.Popen] = {
+        i: spawn(i, args.shards, sock.fileno(), uvicorn_args) for i in range(args.shards)
+    }
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    while not stopping:
+        time.sleep(1.0)
+        for i, process in shards.items():
+            if process.poll() is not None and not stopping:
+                print(f"shard {i} exited with {process.returncode}, restarting", file=sys.stderr)
+                shards[i] = spawn(i, args.shards, sock.fileno(), uvicorn_args)
+    for process in shards.values():
+        process.terminate()
+    for process in shards.values():
+        process.wait()
+
+
+if __name__ == "__main__":
+    main()
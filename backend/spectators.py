@@ -0,0 +1,224 @@
+"""Spectator fan-out, kept apart from the players' send path.
+
+Each worker keeps one :class:`RoomFeed` per room its local sockets are
+watching. The room owner hands every room event to the feeds (its own, and
+one envelope per other watching worker) with an O(1) append. The hub's own
+task then does the fan-out, so the two players' frames are already queued
+before any spectator work starts, and a big audience only costs the hub.
+
+An event is encoded once per codec and that one payload is queued for every
+spectator. A spectator whose queue is full is not disconnected and does not
+pile up a backlog: it is marked stale and skipped, and once its queue has
+drained it gets a single snapshot of the public view instead of everything
+it missed. The snapshot is also encoded once per codec and shared.
+
+The public view has the players, turn and every shot fired, but no ship
+positions until ``game_over`` reveals them.
+"""
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Sends between yields to the event loop during a large fan-out
+FANOUT_BATCH = 500
+RESYNC_INTERVAL = 0.5
+END_OF_FEED = {"type": "spectate_end"}
+
+
+def apply_event(view: Dict, message: Dict):
+    """Fold a room event into a public spectator view."""
+    msg_type = message.get("type")
+    if msg_type == "player_joined":
+        view["players"] = message["players"]
+        view["status"] = message["status"]
+        for player in message["players"]:
+            view["shots"].setdefault(player, [])
+            view["sunk"].setdefault(player, [])
+    elif msg_type == "game_start":
+        view["status"] = "playing"
+        view["current_turn"] = message["current_turn"]
+    elif msg_type == "attack_result":
+        attacker = message["attacker"]
+        view["shots"].setdefault(attacker, []).append([message["x"], message["y"], message["hit"]])
+        if message.get("sunk_ship"):
+            view["sunk"].setdefault(attacker, []).append(message["sunk_ship"])
+        view["current_turn"] = message["current_turn"]
+    elif msg_type == "game_over":
+        view["status"] = "finished"
+        view["winner"] = message["winner"]
+        view["fleets"] = message.get("fleets")
+    if "seq" in message:
+        view["seq"] = message["seq"]
+
+
+class RoomFeed:
+    __slots__ = ("room_code", "owner", "view", "connections", "stale", "pending", "snapshots")
+
+    def __init__(self, room_code: str, owner: str, view: Dict):
+        self.room_code = room_code
+        self.owner = owner
+        self.view = view
+        self.connections: Set = set()
+        self.stale: Set = set()
+        self.pending: Deque[Dict] = deque()
+        # codec -> encoded snapshot of the current view
+        self.snapshots: Dict = {}
+
+
+class SpectatorHub:
+    def __init__(self, fanout_batch: int = FANOUT_BATCH, resync_interval: float = RESYNC_INTERVAL):
+        self.fanout_batch = fanout_batch
+        self.resync_interval = resync_interval
+        self.feeds: Dict[str, RoomFeed] = {}
+        self.ready: Deque[str] = deque()
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.frames_sent = 0
+        self.encodes = 0
+        self.snapshots_sent = 0
+
+    def __len__(self) -> int:
+        return sum(len(feed.connections) for feed in self.feeds.values())
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def watch(self, room_code: str, connection, view: Dict, owner: str):
+        """Start feeding ``room_code`` to ``connection``, beginning with a snapshot of ``view``."""
+        self.unwatch(connection)
+        feed = self.feeds.get(room_code)
+        if feed is None:
+            feed = self.feeds[room_code] = RoomFeed(room_code, owner, view)
+        elif view.get("seq", 0) > feed.view.get("seq", 0):
+            feed.view = view
+            feed.snapshots.clear()
+        feed.connections.add(connection)
+        # Stale connections get the snapshot on the next flush
+        feed.stale.add(connection)
+        connection.watching = room_code
+        self._schedule(feed)
+
+    def unwatch(self, connection) -> Optional[RoomFeed]:
+        """Stop feeding ``connection``; return its feed if that left it with no spectators."""
+        room_code = getattr(connection, "watching", None)
+        connection.watching = None
+        feed = self.feeds.get(room_code)
+        if feed is None:
+            return None
+        feed.connections.discard(connection)
+        feed.stale.discard(connection)
+        if feed.connections:
+            return None
+        del self.feeds[room_code]
+        return feed
+
+    def publish(self, room_code: str, message: Dict):
+        feed = self.feeds.get(room_code)
+        if feed is None:
+            return
+        feed.pending.append(message)
+        self._schedule(feed)
+
+    def end(self, room_code: str):
+        """Send what is pending, then ``spectate_end``, then drop the feed."""
+        self.publish(room_code, END_OF_FEED)
+
+    def _schedule(self, feed: RoomFeed):
+        self.ready.append(feed.room_code)
+        self.wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.resync_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Spectator fan-out failed: {e}")
+
+    async def flush(self):
+        """Fan out every pending event, then resync spectators whose queues have drained."""
+        rooms = set(self.ready)
+        self.ready.clear()
+        rooms.update(code for code, feed in self.feeds.items() if feed.stale)
+        for room_code in rooms:
+            feed = self.feeds.get(room_code)
+            if feed is None:
+                continue
+            while feed.pending:
+                message = feed.pending.popleft()
+                if message is END_OF_FEED:
+                    # Stale spectators still get the final state first
+                    await self._resync(feed)
+                    await self._fan_out(feed, message)
+                    for connection in feed.connections:
+                        connection.watching = None
+                    del self.feeds[room_code]
+                    break
+                apply_event(feed.view, message)
+                feed.snapshots.clear()
+                await self._fan_out(feed, message)
+            else:
+                await self._resync(feed)
+
+    async def _fan_out(self, feed: RoomFeed, message: Dict):
+        payloads = {}
+        sent = 0
+        for connection in list(feed.connections):
+            if connection in feed.stale:
+                continue
+            codec = connection.codec
+            payload = payloads.get(codec)
+            if payload is None:
+                payload = payloads[codec] = codec.encode(message)
+                self.encodes += 1
+            if connection.offer(payload):
+                self.frames_sent += 1
+            else:
+                feed.stale.add(connection)
+            sent += 1
+            if sent % self.fanout_batch == 0:
+                await asyncio.sleep(0)
+
+    async def _resync(self, feed: RoomFeed):
+        for connection in list(feed.stale):
+            if connection.closed:
+                feed.stale.discard(connection)
+                continue
+            if len(connection.queue) > connection.max_queue // 2:
+                continue
+            codec = connection.codec
+            payload = feed.snapshots.get(codec)
+            if payload is None:
+                payload = feed.snapshots[codec] = codec.encode(dict(feed.view, type="spectate_snapshot"))
+                self.encodes += 1
+            if connection.offer(payload):
+                feed.stale.discard(connection)
+                self.snapshots_sent += 1
+
+    def stats(self) -> Dict:
+        return {
+            "rooms": len(self.feeds),
+            "spectators": len(self),
+            "stale": sum(len(feed.stale) for feed in self.feeds.values()),
+            "frames_sent": self.frames_sent,
+            "encodes": self.encodes,
+            "snapshots_sent": self.snapshots_sent,
+        }
@@ -0,0 +1,64 @@
+"""Hashed timing wheel for connection heartbeats and room idle deadlines.
+
+Deadlines are rounded up to whole ticks. A timer that is due at tick ``t``
+lives in slot ``t % slots``. Scheduling, rescheduling and cancelling are
+dict operations on that one slot. Advancing the wheel visits only the slots
+for the ticks that have passed, and expires the entries there whose tick
+has come; entries for later laps of the wheel stay where they are.
+"""
+import math
+import time
+from typing import Callable, Dict, Hashable, List
+
+
+class TimingWheel:
+    def __init__(self, tick: float = 1.0, slots: int = 512, clock: Callable[[], float] = time.monotonic):
+        self.tick = tick
+        self.size = slots
+        self.clock = clock
+        self.slots: List[Dict[Hashable, int]] = [{} for _ in range(slots)]
+        # key -> slot index, for O(1) cancel
+        self.timers: Dict[Hashable, int] = {}
+        # Last tick processed; also a cheap coarse clock for callers
+        self.current = int(clock() / tick)
+
+    def __len__(self) -> int:
+        return len(self.timers)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.timers
+
+    def schedule(self, key: Hashable, delay: float):
+        """Fire ``key`` after ``delay`` seconds, replacing any timer it already has."""
+        self.cancel(key)
+        due = max(self.current + 1, math.ceil((self.clock() + delay) / self.tick))
+        slot = due % self.size
+        self.slots[slot][key] = due
+        self.timers[key] = slot
+
+    def cancel(self, key: Hashable) -> bool:
+        slot = self.timers.pop(key, None)
+        if slot is None:
+            return False
+        del self.slots[slot][key]
+        return True
+
+    def advance(self) -> List[Hashable]:
+        """Move to the current time and return the keys that have expired."""
+        now = int(self.clock() / self.tick)
+        steps = now - self.current
+        if steps <= 0:
+            return []
+        expired = []
+        # After a full lap every slot has been visited once
+        for t in range(self.current + 1, self.current + 1 + min(steps, self.size)):
+            slot = self.slots[t % self.size]
+            if not slot:
+                continue
+            due_keys = [key for key, due in slot.items() if due <= now]
+            for key in due_keys:
+                del slot[key]
+                del self.timers[key]
+            expired.extend(due_keys)
+        self.current = now
+        return expired
@@ -0,0 +1,101 @@
+"""Attack latency on the event loop during a login storm.
+
+A steady stream of simulated ``attack`` frames is processed on the loop while
+N concurrent logins verify bcrypt hashes, either inline (the old handlers) or
+through the bounded PasswordHasher pool. Reports p50/p99 attack latency.
+
+Usage: python benchmarks/bench_auth_storm.py [--logins N] [--rounds R]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from passlib.context import CryptContext  # noqa: E402
+
+from game_engine import Board, cell_index  # noqa: E402
+from password_hasher import HasherBusy, PasswordHasher  # noqa: E402
+
+ATTACK_INTERVAL = 0.002
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def attack_stream(stop, latencies):
+    """Handle one attack frame every ATTACK_INTERVAL and record its delay."""
+    # A Carrier along the top row, out of the way of the shots below it
+    board = Board(["Carrier"], [0b11111])
+    loop = asyncio.get_running_loop()
+    n = 0
+    while not stop.is_set():
+        due = loop.time() + ATTACK_INTERVAL
+        await asyncio.sleep(ATTACK_INTERVAL)
+        result = board.fire(cell_index(n % 10, 1 + n // 10 % 9))
+        json.dumps({"type": "attack_result", "hit": result.hit})
+        latencies.append(loop.time() - due)
+        n += 1
+        board.shots = 0
+
+
+async def login_storm(mode, context, hashed, logins, workers):
+    if mode == "inline":
+        async def login():
+            context.verify("secret", hashed)
+    else:
+        hasher = PasswordHasher(context, workers=workers, queue_size=logins)
+
+        async def login():
+            try:
+                await hasher.verify_and_update("secret", hashed)
+            except HasherBusy:
+                pass
+
+    await asyncio.gather(*(login() for _ in range(logins)))
+
+
+async def run(mode, context, hashed, logins, workers):
+    latencies = []
+    stop = asyncio.Event()
+    stream = asyncio.create_task(attack_stream(stop, latencies))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    if mode != "idle":
+        await login_storm(mode, context, hashed, logins, workers)
+    else:
+        await asyncio.sleep(0.5)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await stream
+    return latencies, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=args.rounds)
+    hashed = context.hash("secret")
+    print(f"logins: {args.logins}, bcrypt rounds: {args.rounds}, pool workers: {args.workers}")
+    for mode in ("idle", "inline", "pool"):
+        latencies, elapsed = asyncio.run(run(mode, context, hashed, args.logins, args.workers))
+        print(
+            f"{mode:>6}: storm {elapsed * 1000:7.1f} ms | attack latency "
+            f"p50 {statistics.median(latencies) * 1000:7.2f} ms  "
+            f"p99 {percentile(latencies, 99) * 1000:7.2f} ms  "
+            f"max {max(latencies) * 1000:7.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
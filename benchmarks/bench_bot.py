@@ -0,0 +1,52 @@
+"""Bot opponent cost: time per targeting decision and shots needed to win.
+
+Plays the bot against random boards and reports the per-move decision time
+(p50/p99) and the mean number of shots it needs to sink the whole fleet.
+
+Usage: python benchmarks/bench_bot.py [--games N] [--seed S]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from bot import BotPlayer, random_board  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    timings = []
+    shots_to_win = []
+    for game in range(args.games):
+        board = random_board(rng)
+        bot = BotPlayer(seed=args.seed + game)
+        shots = 0
+        while True:
+            start = time.perf_counter()
+            index = bot.choose()
+            timings.append(time.perf_counter() - start)
+            result = board.fire(index)
+            bot.record(index, result.hit, result.sunk_ship)
+            shots += 1
+            if result.won:
+                break
+        shots_to_win.append(shots)
+
+    timings.sort()
+    print(f"games: {args.games}, moves: {len(timings)}")
+    print(f"decision p50 {timings[len(timings) // 2] * 1e6:7.1f} us  "
+          f"p99 {timings[int(len(timings) * 0.99)] * 1e6:7.1f} us")
+    print(f"shots to win: mean {sum(shots_to_win) / len(shots_to_win):.1f}, "
+          f"min {min(shots_to_win)}, max {max(shots_to_win)}")
+
+
+if __name__ == "__main__":
+    main()
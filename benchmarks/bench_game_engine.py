@@ -0,0 +1,106 @@
+"""Micro-benchmark: bitboard engine vs. the dict walk the attack handler used.
+
+Usage: python benchmarks/bench_game_engine.py [--games N]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from game_engine import BOARD_SIZE, FLEET, Board, cell_index  # noqa: E402
+
+
+def random_ships(rng):
+    taken = set()
+    ships = {}
+    for name, size in FLEET:
+        while True:
+            horizontal = rng.random() < 0.5
+            x = rng.randrange(BOARD_SIZE - (size - 1 if horizontal else 0))
+            y = rng.randrange(BOARD_SIZE - (0 if horizontal else size - 1))
+            cells = [(x + i, y) if horizontal else (x, y + i) for i in range(size)]
+            if not taken.intersection(cells):
+                break
+        taken.update(cells)
+        ships[name] = {"coords": [{"x": cx, "y": cy, "hit": False} for cx, cy in cells]}
+    return ships
+
+
+def dict_walk(board, x, y):
+    """The per-shot work the original attack handler did."""
+    hit = False
+    sunk_ship = None
+    for ship_name, ship_data in board.items():
+        for coord in ship_data["coords"]:
+            if coord["x"] == x and coord["y"] == y:
+                hit = True
+                coord["hit"] = True
+                if all(c.get("hit", False) for c in ship_data["coords"]):
+                    sunk_ship = ship_name
+                break
+    all_sunk = all(
+        all(c.get("hit", False) for c in ship["coords"])
+        for ship in board.values()
+    )
+    return hit, sunk_ship, all_sunk
+
+
+def run_dict(layouts, shot_orders):
+    shots = 0
+    start = time.perf_counter()
+    for ships, order in zip(layouts, shot_orders):
+        for x, y in order:
+            shots += 1
+            if dict_walk(ships, x, y)[2]:
+                break
+    return shots, time.perf_counter() - start
+
+
+def run_bitboard(layouts, shot_orders):
+    shots = 0
+    start = time.perf_counter()
+    for ships, order in zip(layouts, shot_orders):
+        board = Board.from_placement(ships)
+        for x, y in order:
+            shots += 1
+            if board.fire(cell_index(x, y)).won:
+                break
+    return shots, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    cells = [(x, y) for y in range(BOARD_SIZE) for x in range(BOARD_SIZE)]
+    layouts = [random_ships(rng) for _ in range(args.games)]
+    orders = [rng.sample(cells, len(cells)) for _ in range(args.games)]
+
+    # The dict walk mutates "hit" flags, so give it its own copy of each layout
+    dict_layouts = [
+        {name: {"coords": [dict(c) for c in ship["coords"]]} for name, ship in ships.items()}
+        for ships in layouts
+    ]
+    dict_shots, dict_time = run_dict(dict_layouts, orders)
+    bit_shots, bit_time = run_bitboard(layouts, orders)
+    assert dict_shots == bit_shots
+
+    print(f"games: {args.games}, shots: {bit_shots}")
+    print(f"dict walk: {dict_time * 1e9 / dict_shots:8.0f} ns/shot")
+    print(f"bitboard:  {bit_time * 1e9 / bit_shots:8.0f} ns/shot (includes board build)")
+    print(f"speedup:   {dict_time / bit_time:8.1f}x")
+
+    start = time.perf_counter()
+    for ships in layouts:
+        Board.from_placement(ships)
+    print(f"validated placement: {(time.perf_counter() - start) * 1e6 / len(layouts):6.2f} us/board")
+
+
+if __name__ == "__main__":
+    main()
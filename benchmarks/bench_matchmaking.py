@@ -0,0 +1,87 @@
+"""Matchmaking queue: time-to-match and matcher CPU cost.
+
+Players with normally distributed ratings arrive at ``--rate`` per second of
+simulated time (the queue runs on a fake clock). The sweep runs once per
+simulated second. The benchmark reports the simulated wait until a match,
+the peak queue length, and the real CPU time spent in ``add`` and ``sweep``.
+A ``--burst`` run first queues that many players at once, for example after
+a restart.
+
+Usage: python benchmarks/bench_matchmaking.py [--players N] [--rate R] [--burst B]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from matchmaking import MatchQueue  # noqa: E402
+
+
+def percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=200000)
+    parser.add_argument("--rate", type=float, default=200, help="arrivals per simulated second")
+    parser.add_argument("--burst", type=int, default=50000, help="players queued at time zero")
+    parser.add_argument("--mean", type=float, default=1200)
+    parser.add_argument("--stddev", type=float, default=250)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    now = [0.0]
+    queue = MatchQueue(clock=lambda: now[0])
+    joined = {}
+    waits = []
+    add_time = sweep_time = 0.0
+    sweeps = 0
+    peak = 0
+
+    def rating():
+        return max(0, int(rng.gauss(args.mean, args.stddev)))
+
+    def matched(pair):
+        for username in pair:
+            waits.append(now[0] - joined.pop(username))
+
+    total = args.burst + args.players
+    next_sweep = 1.0
+    for i in range(total):
+        if i >= args.burst:
+            now[0] += rng.expovariate(args.rate)
+        while now[0] >= next_sweep:
+            saved, now[0] = now[0], next_sweep
+            start = time.perf_counter()
+            pairs = queue.sweep()
+            sweep_time += time.perf_counter() - start
+            sweeps += 1
+            for pair in pairs:
+                matched(pair)
+            now[0] = saved
+            next_sweep += 1.0
+        username = f"p{i}"
+        joined[username] = now[0]
+        start = time.perf_counter()
+        pair = queue.add(username, rating())
+        add_time += time.perf_counter() - start
+        if pair:
+            matched(pair)
+        peak = max(peak, len(queue))
+
+    waits.sort()
+    print(f"players: {total} ({args.burst} burst + {args.players} at {args.rate}/s), "
+          f"matched: {len(waits)}, still waiting: {len(queue)}, peak queue: {peak}")
+    print(f"time to match (simulated): p50 {percentile(waits, 50):.2f} s  p90 {percentile(waits, 90):.2f} s  "
+          f"p99 {percentile(waits, 99):.2f} s  max {waits[-1]:.2f} s")
+    print(f"add:   {add_time / total * 1e6:.2f} us per player")
+    print(f"sweep: {sweep_time / max(sweeps, 1) * 1e6:.1f} us per sweep over {sweeps} sweeps")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Messages/second per core for each WebSocket codec.
+
+Measures the server-side work per frame: decode an inbound ``attack``,
+validate and dispatch it through a MessageRouter, and encode the outbound
+``attack_result``. The stdlib ``json`` module is included as the baseline the
+old handler used.
+
+Usage: python benchmarks/bench_protocol.py [--messages N]
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from protocol import CODECS, MessageRouter, orjson  # noqa: E402
+
+RESULT = {
+    "type": "attack_result", "attacker": "player_one", "x": 4, "y": 7,
+    "hit": True, "sunk_ship": None, "current_turn": "player_two",
+}
+
+
+class StdlibJsonCodec:
+    name = "stdlib-json"
+
+    def encode(self, message):
+        return json.dumps(message)
+
+    def decode(self, data):
+        return json.loads(data)
+
+
+def make_router():
+    router = MessageRouter()
+
+    @router.handler("attack", schema={"x": int, "y": int})
+    async def handle_attack(ctx, message):
+        pass
+
+    return router
+
+
+async def run_codec(codec, router, messages):
+    frame = codec.encode({"type": "attack", "x": 4, "y": 7})
+    start = time.perf_counter()
+    for _ in range(messages):
+        await router.dispatch(None, codec.decode(frame))
+        codec.encode(RESULT)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200000)
+    args = parser.parse_args()
+
+    router = make_router()
+    codecs = [StdlibJsonCodec()] + list(CODECS.values())
+    print(f"orjson: {'yes' if orjson else 'no'}, messages: {args.messages}")
+    for codec in codecs:
+        elapsed = asyncio.run(run_codec(codec, router, args.messages))
+        size = len(codec.encode(RESULT))
+        print(f"{codec.name:>12}: {args.messages / elapsed:10.0f} msg/s  attack_result {size:3d} bytes")
+
+
+if __name__ == "__main__":
+    main()
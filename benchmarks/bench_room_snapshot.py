@@ -0,0 +1,108 @@
+"""Time to snapshot and restore live rooms across a restart.
+
+Builds ``--rooms`` rooms in the shapes a busy server holds them: a few
+waiting for a guest, some placing ships, and most mid-game with a random
+number of shots fired, some of those against the bot. It then times
+what a restart costs:
+
+* write: draining is done; every room is written to the snapshot file;
+* restore: a fresh ConnectionManager maps the file and claims every code,
+  which is all that stands between startup and accepting connections;
+* first frame: one room is decoded and owned with its seats held, paid
+  when its first player resumes; reported per room, over every room.
+
+Usage: python benchmarks/bench_room_snapshot.py [--rooms N] [--path FILE]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from bot import BOT_USERNAME, BotPlayer, random_board  # noqa: E402
+from connections import ConnectionManager  # noqa: E402
+from move_log import pack_shot  # noqa: E402
+from room_snapshot import RoomSnapshot, write_snapshot  # noqa: E402
+
+STARTED_AT = "2024-05-01T12:00:00+00:00"
+
+
+def make_room(n: int, rng: random.Random) -> dict:
+    code = f"{n:06X}"
+    host = f"player{2 * n}"
+    kind = rng.random()
+    if kind < 0.1:
+        return {"code": code, "players": [host], "host": host, "status": "waiting", "seq": 0, "game_state": None}
+    bot = kind > 0.9
+    guest = BOT_USERNAME if bot else f"player{2 * n + 1}"
+    boards = {guest: random_board(rng), host: random_board(rng)}
+    moves = bytearray()
+    status = "placement" if kind < 0.2 else "playing"
+    shooter, target = host, guest
+    if status == "playing":
+        for _ in range(rng.randrange(80)):
+            index = rng.randrange(100)
+            moves.append(pack_shot(index, boards[target].fire(index).hit))
+            shooter, target = target, shooter
+    room = {
+        "code": code, "players": [host, guest], "host": host, "status": status, "seq": len(moves) + 3,
+        "game_state": {
+            "boards": boards, "ready": {guest: True, host: status == "playing"}, "current_turn": shooter,
+            "first_turn": host, "moves": moves, "started_at": STARTED_AT,
+        },
+    }
+    if bot:
+        room["bot"] = BotPlayer(seed=n)
+    else:
+        room["ratings"] = {host: 1200, guest: 1200}
+    return room
+
+
+async def restore(path: str):
+    manager = ConnectionManager()
+    start = time.perf_counter()
+    snapshot = RoomSnapshot(path)
+    await manager.claim_rooms(snapshot.codes())
+    restore_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for room_code in snapshot.codes():
+        room = snapshot.take(room_code)
+        manager.restore_room(room, [p for p in room["players"] if p != BOT_USERNAME], 120)
+    first_frame_seconds = time.perf_counter() - start
+    snapshot.close()
+    return restore_seconds, first_frame_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rooms", type=int, default=100000)
+    parser.add_argument("--path", default=os.path.join(tempfile.gettempdir(), "bench_rooms.snap"))
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    rooms = [make_room(n, rng) for n in range(args.rooms)]
+    bots = sum("bot" in room for room in rooms)
+
+    start = time.perf_counter()
+    write_snapshot(args.path, rooms)
+    write_seconds = time.perf_counter() - start
+    size = os.path.getsize(args.path)
+
+    restore_seconds, first_frame_seconds = asyncio.run(restore(args.path))
+    os.remove(args.path)
+
+    print(f"rooms: {args.rooms} ({bots} against the bot), "
+          f"snapshot: {size / 1e6:.2f} MB, {size / args.rooms:.0f} B/room")
+    print(f"write:   {write_seconds * 1e3:8.1f} ms  {write_seconds / args.rooms * 1e6:.2f} us/room")
+    print(f"restore: {restore_seconds * 1e3:8.1f} ms  {restore_seconds / args.rooms * 1e6:.2f} us/room")
+    print(f"first frame:          {first_frame_seconds / args.rooms * 1e6:.2f} us/room")
+
+
+if __name__ == "__main__":
+    main()
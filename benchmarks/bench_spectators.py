@@ -0,0 +1,94 @@
+"""Player latency with a large spectator audience.
+
+Two players trade ``--moves`` attacks in one room while ``--spectators``
+sockets watch it through the manager's SpectatorHub. Every socket is an
+in-process fake that records when each frame was written. The benchmark
+reports how long after ``broadcast_to_room`` the players' frames were
+written, and how long the audience took to receive the same event. Run it
+with ``--spectators 0`` for the baseline.
+
+Usage: python benchmarks/bench_spectators.py [--spectators N] [--moves M]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from connections import ConnectionManager  # noqa: E402
+
+
+class TimedSocket:
+    __slots__ = ("last_write",)
+
+    def __init__(self):
+        self.last_write = 0.0
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        self.last_write = time.perf_counter()
+
+    async def close(self, code=1000):
+        pass
+
+
+def percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(spectators: int, moves: int):
+    manager = ConnectionManager()
+    manager.spectators.start()
+    players = {name: TimedSocket() for name in ("host", "guest")}
+    await manager.create_room("ROOM", {"code": "ROOM", "players": list(players)})
+    for name, socket in players.items():
+        await manager.connect(socket, name)
+        await manager.bind(name, "ROOM")
+    view = {"room_code": "ROOM", "seq": 0, "players": list(players), "status": "playing",
+            "current_turn": "host", "shots": {p: [] for p in players}, "sunk": {p: [] for p in players}}
+    watchers = []
+    for i in range(spectators):
+        socket = TimedSocket()
+        watchers.append(socket)
+        await manager.connect(socket, f"watcher{i}")
+        await manager.watch(f"watcher{i}", "ROOM", view)
+    await asyncio.sleep(0.5)
+
+    player_latency, audience_latency = [], []
+    for n in range(moves):
+        start = time.perf_counter()
+        await manager.broadcast_to_room({
+            "type": "attack_result", "attacker": "host", "x": n % 10, "y": n // 10 % 10,
+            "hit": False, "sunk_ship": None, "current_turn": "guest",
+        }, "ROOM")
+        while any(socket.last_write < start for socket in players.values()):
+            await asyncio.sleep(0)
+        player_latency.append(max(s.last_write for s in players.values()) - start)
+        while watchers and any(socket.last_write < start for socket in watchers):
+            await asyncio.sleep(0)
+        if watchers:
+            audience_latency.append(max(s.last_write for s in watchers) - start)
+    await manager.spectators.stop()
+    return sorted(player_latency), sorted(audience_latency), manager.spectators.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--spectators", type=int, default=10000)
+    parser.add_argument("--moves", type=int, default=200)
+    args = parser.parse_args()
+
+    players, audience, stats = asyncio.run(run(args.spectators, args.moves))
+    print(f"spectators: {args.spectators}, moves: {args.moves}")
+    print(f"players:  p50 {percentile(players, 50) * 1e3:.3f} ms  p99 {percentile(players, 99) * 1e3:.3f} ms")
+    if audience:
+        print(f"audience: p50 {percentile(audience, 50) * 1e3:.3f} ms  p99 {percentile(audience, 99) * 1e3:.3f} ms")
+    print(f"encodes: {stats['encodes']}, frames sent: {stats['frames_sent']}, snapshots: {stats['snapshots_sent']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Timer expiry cost: hashed timing wheel vs. scanning every deadline.
+
+Schedules ``--timers`` deadlines spread over ``--spread`` seconds, then steps
+a fake clock one second at a time until all have fired. The scan baseline
+checks every outstanding deadline each second, which is what a periodic
+sweep over rooms and connections would do.
+
+Usage: python benchmarks/bench_timing_wheel.py [--timers N] [--spread S]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from timing_wheel import TimingWheel  # noqa: E402
+
+
+def run_wheel(delays, spread):
+    now = [0.0]
+    wheel = TimingWheel(clock=lambda: now[0])
+    for key, delay in enumerate(delays):
+        wheel.schedule(key, delay)
+    fired = 0
+    start = time.perf_counter()
+    for second in range(1, spread + 2):
+        now[0] = second
+        fired += len(wheel.advance())
+    return time.perf_counter() - start, fired
+
+
+def run_scan(delays, spread):
+    deadlines = dict(enumerate(delays))
+    fired = 0
+    start = time.perf_counter()
+    for second in range(1, spread + 2):
+        due = [key for key, deadline in deadlines.items() if deadline <= second]
+        for key in due:
+            del deadlines[key]
+        fired += len(due)
+    return time.perf_counter() - start, fired
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--timers", type=int, default=100000)
+    parser.add_argument("--spread", type=int, default=600, help="seconds over which deadlines fall")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    delays = [rng.uniform(0, args.spread) for _ in range(args.timers)]
+    for name, run in (("timing wheel", run_wheel), ("scan", run_scan)):
+        elapsed, fired = run(delays, args.spread)
+        print(f"{name:>12}: {fired} timers fired in {elapsed * 1000:8.1f} ms "
+              f"({elapsed / fired * 1e6:.2f} us per timer)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Finished-game insert throughput: sequential writes vs. write-behind batches.
+
+Mongo is modelled as collections that cost one network round trip (``--rtt``
+milliseconds) per call. The sequential mode replays what the attack handler
+used to do per game over: ``insert_one`` plus two ``update_one`` calls. The
+write-behind mode queues games into WriteBehindQueue and lets it flush
+``bulk_write`` batches.
+
+Usage: python benchmarks/bench_write_behind.py [--games N] [--rtt MS]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from move_log import pack_shot  # noqa: E402
+from persistence import WriteBehindQueue  # noqa: E402
+
+# A typical finished game: 60 shots of which 17 hit, alternating turns
+MOVES = bytes(pack_shot(i, i % 3 == 0 and i < 51) for i in range(60))
+
+
+class SimulatedCollection:
+    def __init__(self, rtt):
+        self.rtt = rtt
+        self.calls = 0
+
+    async def _round_trip(self):
+        self.calls += 1
+        await asyncio.sleep(self.rtt)
+
+    async def insert_one(self, doc):
+        await self._round_trip()
+
+    async def update_one(self, query, update):
+        await self._round_trip()
+
+    async def bulk_write(self, ops, ordered=True):
+        await self._round_trip()
+
+
+class SimulatedDB:
+    def __init__(self, rtt):
+        self.games = SimulatedCollection(rtt)
+        self.users = SimulatedCollection(rtt)
+        self.player_stats = SimulatedCollection(rtt)
+        self.head_to_head = SimulatedCollection(rtt)
+
+    def calls(self):
+        return self.games.calls + self.users.calls + self.player_stats.calls + self.head_to_head.calls
+
+
+def make_game(i):
+    return {
+        "id": str(i), "player1": f"p{i}", "player2": f"q{i}", "winner": f"p{i}", "loser": f"q{i}",
+        "duration_seconds": 240, "first_turn": f"p{i}", "moves": MOVES,
+    }
+
+
+async def finish_sequential(db, i, latencies):
+    start = time.perf_counter()
+    game = make_game(i)
+    await db.games.insert_one(game)
+    await db.users.update_one({"username": game["winner"]}, {"$inc": {"wins": 1, "games_played": 1}})
+    await db.users.update_one({"username": game["loser"]}, {"$inc": {"losses": 1, "games_played": 1}})
+    latencies.append(time.perf_counter() - start)
+
+
+async def run_sequential(games, rtt, concurrency):
+    db = SimulatedDB(rtt)
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            await finish_sequential(db, i, latencies)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(games)))
+    return time.perf_counter() - start, latencies, db.calls()
+
+
+async def run_write_behind(games, rtt, batch_size):
+    db = SimulatedDB(rtt)
+    queue = WriteBehindQueue(db, batch_size=batch_size, flush_interval=0.01)
+    queue.start()
+    latencies = []
+    start = time.perf_counter()
+    for i in range(games):
+        t = time.perf_counter()
+        game = make_game(i)
+        queue.record_game(game, [
+            (game["winner"], {"wins": 1, "games_played": 1}),
+            (game["loser"], {"losses": 1, "games_played": 1}),
+        ])
+        latencies.append(time.perf_counter() - t)
+        if i % 100 == 0:
+            await asyncio.sleep(0)
+    await queue.stop()
+    return time.perf_counter() - start, latencies, db.calls()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=20000)
+    parser.add_argument("--rtt", type=float, default=1.0, help="round trip in ms")
+    parser.add_argument("--concurrency", type=int, default=100, help="concurrent game overs (sequential mode)")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    rtt = args.rtt / 1000
+
+    print(f"games: {args.games}, rtt: {args.rtt} ms")
+    for name, run in (
+        ("sequential", run_sequential(args.games, rtt, args.concurrency)),
+        ("write-behind", run_write_behind(args.games, rtt, args.batch_size)),
+    ):
+        elapsed, latencies, calls = asyncio.run(run)
+        latencies.sort()
+        print(
+            f"{name:>12}: {args.games / elapsed:10.0f} games/s  {calls:6d} db calls  "
+            f"game_over delay p99 {latencies[int(len(latencies) * 0.99)] * 1000:7.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""In-process load generator for the game server.
+
+Starts the FastAPI app inside this process against an in-memory Mongo
+stand-in (mongomock-motor) and drives it through the raw ASGI interface, so
+no sockets, uvicorn or remote deployment are involved. N simulated players
+are paired up and play complete games (create_room, join_room, place_ships,
+attack until game_over, periodic chat) while a pool of REST clients polls
+/leaderboard and /history and logs in.
+
+Reports throughput and p50/p95/p99 latency per message type and writes the
+results as JSON, tagged with the git commit, so runs can be compared with
+``--compare previous.json``.
+
+Rate limits are off by default because simulated players send far faster
+than people; pass ``--ws-rate-limits``/``--room-rate-limits`` to measure
+the server with them on.
+
+Usage: python benchmarks/load_test.py --players 2000 --rest-clients 20
+Requires: pip install -r benchmarks/requirements.txt
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+
+def percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class LatencyRecorder:
+    def __init__(self):
+        self.samples = {}
+
+    def record(self, name, started):
+        self.samples.setdefault(name, []).append(time.perf_counter() - started)
+
+    def summary(self, elapsed):
+        result = {}
+        for name, samples in sorted(self.samples.items()):
+            ordered = sorted(samples)
+            result[name] = {
+                "count": len(ordered),
+                "per_second": round(len(ordered) / elapsed, 1),
+                "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+                "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+                "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+            }
+        return result
+
+
+class ASGIWebSocket:
+    """A WebSocket client speaking ASGI directly to the app."""
+
+    def __init__(self, app, path):
+        self.to_app = asyncio.Queue()
+        self.from_app = asyncio.Queue()
+        path, _, query = path.partition("?")
+        scope = {
+            "type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws",
+            "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+            "root_path": "", "headers": [], "subprotocols": [],
+            "server": ("loadtest", 80), "client": ("127.0.0.1", 0),
+        }
+        self.task = asyncio.create_task(app(scope, self.to_app.get, self.from_app.put))
+
+    async def connect(self):
+        await self.to_app.put({"type": "websocket.connect"})
+        message = await self.from_app.get()
+        if message["type"] != "websocket.accept":
+            raise RuntimeError(f"WebSocket rejected: {message}")
+
+    async def send(self, message):
+        await self.to_app.put({"type": "websocket.receive", "text": json.dumps(message)})
+
+    async def expect(self, *types):
+        """Wait for the next message of one of ``types``, skipping others."""
+        while True:
+            event = await self.from_app.get()
+            if event["type"] == "websocket.close":
+                raise RuntimeError("server closed the socket")
+            message = json.loads(event.get("text") or event["bytes"])
+            if message.get("type") == "ping":
+                await self.send({"type": "pong"})
+                continue
+            if message.get("type") == "error":
+                raise RuntimeError(f"server error: {message.get('message')}")
+            if message.get("type") in types:
+                return message
+
+    async def close(self):
+        await self.to_app.put({"type": "websocket.disconnect", "code": 1000})
+        try:
+            await asyncio.wait_for(self.task, 5)
+        except (asyncio.TimeoutError, Exception):
+            self.task.cancel()
+
+
+def random_fleet(rng, fleet, size):
+    taken = set()
+    ships = {}
+    for name, length in fleet:
+        while True:
+            horizontal = rng.random() < 0.5
+            x = rng.randrange(size - (length - 1 if horizontal else 0))
+            y = rng.randrange(size - (0 if horizontal else length - 1))
+            cells = [(x + i, y) if horizontal else (x, y + i) for i in range(length)]
+            if not taken.intersection(cells):
+                break
+        taken.update(cells)
+        ships[name] = {"coords": [{"x": cx, "y": cy, "hit": False} for cx, cy in cells]}
+    return ships
+
+
+async def play_game(server, tokens, recorder, rng, args, stop):
+    from game_engine import BOARD_SIZE, FLEET
+
+    host = ASGIWebSocket(server.app, f"/api/ws/{tokens[0]}")
+    guest = ASGIWebSocket(server.app, f"/api/ws/{tokens[1]}")
+    await host.connect()
+    await guest.connect()
+    think = args.think_ms / 1000
+    try:
+        while not stop.is_set():
+            t = time.perf_counter()
+            await host.send({"type": "create_room"})
+            room_code = (await host.expect("room_created"))["room_code"]
+            recorder.record("create_room", t)
+
+            t = time.perf_counter()
+            await guest.send({"type": "join_room", "room_code": room_code})
+            await guest.expect("player_joined")
+            recorder.record("join_room", t)
+            await host.expect("player_joined")
+
+            for player, reply in ((host, "player_ready"), (guest, "game_start")):
+                t = time.perf_counter()
+                await player.send({"type": "place_ships", "ships": random_fleet(rng, FLEET, BOARD_SIZE)})
+                await player.expect(reply)
+                recorder.record("place_ships", t)
+            await host.expect("game_start")
+
+            targets = {
+                p: rng.sample([(x, y) for y in range(BOARD_SIZE) for x in range(BOARD_SIZE)], BOARD_SIZE * BOARD_SIZE)
+                for p in (host, guest)
+            }
+            attacker, defender = host, guest
+            turn = 0
+            while True:
+                if think:
+                    await asyncio.sleep(think)
+                x, y = targets[attacker].pop()
+                t = time.perf_counter()
+                await attacker.send({"type": "attack", "x": x, "y": y})
+                result = await attacker.expect("attack_result", "game_over")
+                recorder.record("attack", t)
+                await defender.expect(result["type"])
+                if result["type"] == "game_over":
+                    break
+                turn += 1
+                if args.chat_every and turn % args.chat_every == 0:
+                    t = time.perf_counter()
+                    await attacker.send({"type": "chat", "message": "gl hf"})
+                    await attacker.expect("chat_batch")
+                    recorder.record("chat", t)
+                    await defender.expect("chat_batch")
+                attacker, defender = defender, attacker
+            recorder.record_game()
+    finally:
+        await host.close()
+        await guest.close()
+
+
+async def rest_client(client, token, username, recorder, stop):
+    headers = {"Authorization": f"Bearer {token}"}
+    credentials = {"username": username, "password": "loadtest"}
+    requests = [
+        ("GET /leaderboard", lambda: client.get("/api/leaderboard")),
+        ("GET /history", lambda: client.get("/api/history", headers=headers)),
+        ("GET /auth/me", lambda: client.get("/api/auth/me", headers=headers)),
+        ("POST /auth/login", lambda: client.post("/api/auth/login", json=credentials)),
+    ]
+    while not stop.is_set():
+        for name, request in requests:
+            t = time.perf_counter()
+            response = await request()
+            if response.status_code != 200:
+                raise RuntimeError(f"{name} returned {response.status_code}")
+            recorder.record(name, t)
+
+
+async def run(args):
+    import httpx
+    from mongomock_motor import AsyncMongoMockClient
+
+    import server
+
+    db = AsyncMongoMockClient()["loadtest"]
+    server.db = db
+    server.persistence.db = db
+    await server.app.router.startup()
+
+    password = server.pwd_context.hash("loadtest")
+    usernames = [f"player{i}" for i in range(max(args.players, args.rest_clients))]
+    await db.users.insert_many([
+        {"username": u, "password": password, "wins": 0, "losses": 0, "games_played": 0,
+         "created_at": "2024-01-01T00:00:00+00:00"}
+        for u in usernames
+    ])
+    tokens = [server.create_access_token({"sub": u}) for u in usernames]
+
+    recorder = LatencyRecorder()
+    games = [0]
+    recorder.record_game = lambda: games.__setitem__(0, games[0] + 1)
+    stop = asyncio.Event()
+    rng = random.Random(args.seed)
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+        tasks = [
+            asyncio.create_task(play_game(server, tokens[i:i + 2], recorder, rng, args, stop))
+            for i in range(0, args.players - 1, 2)
+        ]
+        tasks += [
+            asyncio.create_task(rest_client(client, tokens[i], usernames[i], recorder, stop))
+            for i in range(args.rest_clients)
+        ]
+        start = time.perf_counter()
+        done, _ = await asyncio.wait(tasks, timeout=args.duration)
+        stop.set()
+        for task in done:
+            task.result()
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    await server.app.router.shutdown()
+    summary = recorder.summary(elapsed)
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "args": vars(args),
+        "elapsed_s": round(elapsed, 3),
+        "games_completed": games[0],
+        "messages_per_second": round(sum(s["count"] for s in summary.values()) / elapsed, 1),
+        "latency": summary,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_report(result, baseline=None):
+    print(f"commit {result['commit']}: {result['games_completed']} games, "
+          f"{result['messages_per_second']} msg/s over {result['elapsed_s']} s")
+    print(f"{'message':>18} {'count':>8} {'per s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, row in result["latency"].items():
+        line = (f"{name:>18} {row['count']:8d} {row['per_second']:9.1f} "
+                f"{row['p50_ms']:9.3f} {row['p95_ms']:9.3f} {row['p99_ms']:9.3f}")
+        old = (baseline or {}).get("latency", {}).get(name)
+        if old and old["p99_ms"]:
+            line += f"   p99 {(row['p99_ms'] / old['p99_ms'] - 1) * 100:+6.1f}% vs {baseline['commit']}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--rest-clients", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--think-ms", type=float, default=0, help="pause before each attack")
+    parser.add_argument("--chat-every", type=int, default=10, help="chat every N turns, 0 disables")
+    parser.add_argument("--bcrypt-rounds", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--ws-rate-limits", default="",
+                        help="WS_RATE_LIMITS for the server; empty (the default) turns per-socket limits off")
+    parser.add_argument("--room-rate-limits", default="",
+                        help="ROOM_RATE_LIMITS for the server; empty (the default) turns per-room limits off")
+    parser.add_argument("--output", help="JSON results path (default: benchmarks/results/load-<commit>.json)")
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    args = parser.parse_args()
+
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "loadtest")
+    os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+    # Simulated players send far faster than people, so the production
+    # limits would throttle the load generator rather than the server
+    os.environ["WS_RATE_LIMITS"] = args.ws_rate_limits
+    os.environ["ROOM_RATE_LIMITS"] = args.room_rate_limits
+
+    result = asyncio.run(run(args))
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print_report(result, baseline)
+
+    output = Path(args.output or ROOT / "benchmarks" / "results" / f"load-{result['commit']}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Offline self-play between bot strategies, spread over a process pool.
+
+Games are simulated in batches by ``simulator.play_games`` (vectorized across
+boards, same hit/sink/win rules as the server). Each finished batch is
+written as a compressed columnar ``part-NNNNN.npz`` file (uint8 columns
+shots_a, shots_b, winner, length) as soon as it arrives. The run then
+reports games/second, win rates and the game length distribution.
+
+Usage: python benchmarks/self_play.py --games 1000000 --a density --b hunt_target
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+# One BLAS thread per worker process; the pool provides the parallelism
+for var in ("OPENBLAS_NUM_THREADS", "OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(var, "1")
+
+import numpy as np  # noqa: E402
+
+from simulator import STRATEGIES, play_games  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--a", default="density", choices=sorted(STRATEGIES), help="strategy moving first")
+    parser.add_argument("--b", default="hunt_target", choices=sorted(STRATEGIES))
+    parser.add_argument("--batch", type=int, default=5000, help="games per task")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="directory for part files (default: benchmarks/results/selfplay-<a>-vs-<b>)")
+    parser.add_argument("--no-output", action="store_true", help="report only, write no files")
+    args = parser.parse_args()
+
+    output = None
+    if not args.no_output:
+        output = Path(args.output or ROOT / "benchmarks" / "results" / f"selfplay-{args.a}-vs-{args.b}")
+        output.mkdir(parents=True, exist_ok=True)
+
+    lengths = np.zeros(256, dtype=np.int64)
+    shots_a = np.zeros(256, dtype=np.int64)
+    shots_b = np.zeros(256, dtype=np.int64)
+    b_wins = 0
+    games = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(args.workers) as pool:
+        futures = {}
+        for part, first in enumerate(range(0, args.games, args.batch)):
+            n = min(args.batch, args.games - first)
+            futures[pool.submit(play_games, args.a, args.b, n, args.seed * 1_000_003 + part)] = part
+        for future in as_completed(futures):
+            columns = future.result()
+            if output is not None:
+                np.savez_compressed(output / f"part-{futures[future]:05d}.npz", **columns)
+            lengths += np.bincount(columns["length"], minlength=256)
+            shots_a += np.bincount(columns["shots_a"], minlength=256)
+            shots_b += np.bincount(columns["shots_b"], minlength=256)
+            b_wins += int(columns["winner"].sum())
+            games += len(columns["winner"])
+    elapsed = time.perf_counter() - start
+
+    def quantile(hist, q):
+        return int(np.searchsorted(np.cumsum(hist), q * hist.sum()))
+
+    def mean(hist):
+        return float((np.arange(len(hist)) * hist).sum() / hist.sum())
+
+    print(f"{games} games of {args.a} (first) vs {args.b} in {elapsed:.1f} s: "
+          f"{games / elapsed:,.0f} games/s on {args.workers} workers")
+    print(f"win rate: {args.a} {1 - b_wins / games:.4f}, {args.b} {b_wins / games:.4f}")
+    for name, hist in ((f"shots to win ({args.a})", shots_a), (f"shots to win ({args.b})", shots_b),
+                       ("game length", lengths)):
+        print(f"{name:>28}: mean {mean(hist):6.2f}  p10 {quantile(hist, 0.1):3d}  p50 {quantile(hist, 0.5):3d}  "
+              f"p90 {quantile(hist, 0.9):3d}  p99 {quantile(hist, 0.99):3d}")
+    if output is not None:
+        print(f"columns written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ import '@/App.css';
 import LandingPage from '@/pages/LandingPage';
 import Lobby from '@/pages/Lobby';
 import Game from '@/pages/Game';
+import Spectate from '@/pages/Spectate';
 import Leaderboard from '@/pages/Leaderboard';
 import History from '@/pages/History';
 
@@ -58,6 +59,9 @@ function App() {
         <Route path="/game/:roomCode" element={
           token ? <Game token={token} user={user} onLogout={logout} /> : <Navigate to="/" />
         } />
+        <Route path="/watch/:roomCode" element={
+          token ? <Spectate token={token} user={user} onLogout={logout} /> : <Navigate to="/" />
+        } />
         <Route path="/leaderboard" element={
           token ? <Leaderboard token={token} user={user} onLogout={logout} /> : <Navigate to="/" />
         } />
@@ -9,6 +9,10 @@ import { ArrowLeft, Send, Loader2 } from 'lucide-react';
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const WS_URL = BACKEND_URL.replace('https://', 'wss://').replace('http://', 'ws://');
 
+const RECONNECT_DELAYS = [500, 1000, 2000, 4000, 8000];
+
+const emptyBoard = () => Array(10).fill(null).map(() => Array(10).fill(null));
+
 const SHIPS = [
   { name: 'Carrier', size: 5, label: 'Tàu sân bay (5)' },
   { name: 'Battleship', size: 4, label: 'Tàu chiến (4)' },
@@ -22,8 +26,8 @@ export default function Game({ token, user }) {
   const navigate = useNavigate();
   const [ws, setWs] = useState(null);
   const [gamePhase, setGamePhase] = useState('placement'); // placement, ready, playing, finished
-  const [myBoard, setMyBoard] = useState(Array(10).fill(null).map(() => Array(10).fill(null)));
-  const [opponentBoard, setOpponentBoard] = useState(Array(10).fill(null).map(() => Array(10).fill(null)));
+  const [myBoard, setMyBoard] = useState(emptyBoard);
+  const [opponentBoard, setOpponentBoard] = useState(emptyBoard);
   const [placedShips, setPlacedShips] = useState([]);
   const [currentShipIndex, setCurrentShipIndex] = useState(0);
   const [isHorizontal, setIsHorizontal] = useState(true);
@@ -34,73 +38,74 @@ export default function Game({ token, user }) {
   const [myHits, setMyHits] = useState([]);
   const [opponentHits, setOpponentHits] = useState([]);
   const wsRef = useRef(null);
+  // Last room event seen, so a reconnect can ask for just what it missed
+  const lastSeqRef = useRef(0);
+  const closingRef = useRef(false);
+  const finishedRef = useRef(false);
+  const retriesRef = useRef(0);
+  const reconnectTimerRef = useRef(null);
 
   useEffect(() => {
+    closingRef.current = false;
+    lastSeqRef.current = 0;
     connectWebSocket();
     return () => {
+      closingRef.current = true;
+      clearTimeout(reconnectTimerRef.current);
       if (wsRef.current) {
         wsRef.current.close();
       }
     };
   }, [token, roomCode]);
 
+  const applySnapshot = (data) => {
+    setPlayers(data.players);
+    if (data.current_turn) setCurrentTurn(data.current_turn);
+    const mine = emptyBoard();
+    const ships = data.ships || {};
+    Object.entries(ships).forEach(([name, coords]) => {
+      coords.forEach(({ x, y }) => { mine[y][x] = name; });
+    });
+    (data.opponent_shots || []).forEach(({ x, y, hit }) => {
+      if (hit) mine[y][x] = 'hit';
+    });
+    const theirs = emptyBoard();
+    (data.shots || []).forEach(({ x, y, hit }) => {
+      theirs[y][x] = hit ? 'hit' : 'miss';
+    });
+    setMyBoard(mine);
+    setOpponentBoard(theirs);
+    setMyHits(data.shots || []);
+    setOpponentHits(data.opponent_shots || []);
+    setPlacedShips(Object.entries(ships).map(([name, coords]) => ({ name, coords })));
+    setCurrentShipIndex(Object.keys(ships).length);
+    if (data.status === 'playing') {
+      setGamePhase('playing');
+    } else if (data.ready) {
+      setGamePhase('ready');
+    } else {
+      setGamePhase('placement');
+    }
+  };
+
   const connectWebSocket = () => {
     const websocket = new WebSocket(`${WS_URL}/ws/${token}`);
     
     websocket.onopen = () => {
       console.log('WebSocket connected');
+      retriesRef.current = 0;
       setWs(websocket);
       wsRef.current = websocket;
-      websocket.send(JSON.stringify({ type: 'join_room', room_code: roomCode }));
+      if (lastSeqRef.current > 0) {
+        websocket.send(JSON.stringify({ type: 'resume', room_code: roomCode, last_seq: lastSeqRef.current }));
+      } else {
+        websocket.send(JSON.stringify({ type: 'join_room', room_code: roomCode }));
+      }
     };
 
     websocket.onmessage = (event) => {
       console.log('Game WebSocket message:', event.data);
-      const data = JSON.parse(event.data);
-      
-      if (data.type === 'player_joined') {
-        setPlayers(data.players);
-        toast.success('Đối thủ đã tham gia!');
-      } else if (data.type === 'player_ready') {
-        toast.info(`${data.player} đã sẵn sàng`);
-      } else if (data.type === 'game_start') {
-        setGamePhase('playing');
-        setCurrentTurn(data.current_turn);
-        toast.success('Trò chơi bắt đầu!');
-      } else if (data.type === 'attack_result') {
-        if (data.attacker === user.username) {
-          // My attack
-          const newBoard = [...opponentBoard];
-          newBoard[data.y][data.x] = data.hit ? 'hit' : 'miss';
-          setOpponentBoard(newBoard);
-          setMyHits([...myHits, { x: data.x, y: data.y, hit: data.hit }]);
-          toast.success(data.hit ? 'Trúng đích!' : 'Trượt!');
-          if (data.sunk_ship) {
-            toast.success(`Đã đánh chìm ${data.sunk_ship}!`);
-          }
-        } else {
-          // Opponent's attack on my board
-          const newBoard = [...myBoard];
-          if (data.hit) {
-            newBoard[data.y][data.x] = 'hit';
-          }
-          setMyBoard(newBoard);
-          setOpponentHits([...opponentHits, { x: data.x, y: data.y, hit: data.hit }]);
-        }
-        setCurrentTurn(data.current_turn);
-      } else if (data.type === 'game_over') {
-        setGamePhase('finished');
-        if (data.winner === user.username) {
-          toast.success('Bạn đã chiến thắng!');
-        } else {
-          toast.error('Bạn đã thua!');
-        }
-      } else if (data.type === 'chat') {
-        console.log('Chat message received:', data);
-        setChatMessages(prev => [...prev, data]);
-      } else if (data.type === 'error') {
-        toast.error(data.message);
-      }
+      handleMessage(JSON.parse(event.data), websocket);
     };
 
     websocket.onerror = (error) => {
@@ -109,9 +114,91 @@ export default function Game({ token, user }) {
 
     websocket.onclose = () => {
       setWs(null);
+      if (closingRef.current || finishedRef.current) return;
+      // The server holds our seat for a while; come back and catch up
+      const delay = RECONNECT_DELAYS[Math.min(retriesRef.current, RECONNECT_DELAYS.length - 1)];
+      retriesRef.current += 1;
+      toast.info('Mất kết nối, đang kết nối lại...');
+      reconnectTimerRef.current = setTimeout(connectWebSocket, delay);
     };
   };
 
+  const handleMessage = (data, websocket) => {
+    // resumed and snapshot carry the room's latest seq; they move lastSeqRef
+    // themselves once their contents are applied
+    if (data.seq !== undefined && data.type !== 'resumed' && data.type !== 'snapshot') {
+      // Already applied, e.g. replayed and then delivered live
+      if (data.seq <= lastSeqRef.current) return;
+      lastSeqRef.current = data.seq;
+    }
+
+    if (data.type === 'resumed') {
+      data.events.forEach(event => handleMessage(event, websocket));
+      lastSeqRef.current = Math.max(lastSeqRef.current, data.seq);
+    } else if (data.type === 'snapshot') {
+      lastSeqRef.current = data.seq;
+      applySnapshot(data);
+    } else if (data.type === 'player_away') {
+      if (data.player !== user.username) toast.info(`${data.player} đã mất kết nối`);
+    } else if (data.type === 'player_returned') {
+      if (data.player !== user.username) toast.info(`${data.player} đã quay lại`);
+    } else if (data.type === 'room_joined') {
+      setPlayers(data.players);
+    } else if (data.type === 'player_joined') {
+      setPlayers(data.players);
+      toast.success('Đối thủ đã tham gia!');
+    } else if (data.type === 'player_ready') {
+      toast.info(`${data.player} đã sẵn sàng`);
+    } else if (data.type === 'game_start') {
+      setGamePhase('playing');
+      setCurrentTurn(data.current_turn);
+      toast.success('Trò chơi bắt đầu!');
+    } else if (data.type === 'attack_result') {
+      if (data.attacker === user.username) {
+        // My attack
+        setOpponentBoard(prev => {
+          const newBoard = prev.map(row => [...row]);
+          newBoard[data.y][data.x] = data.hit ? 'hit' : 'miss';
+          return newBoard;
+        });
+        setMyHits(prev => [...prev, { x: data.x, y: data.y, hit: data.hit }]);
+        toast.success(data.hit ? 'Trúng đích!' : 'Trượt!');
+        if (data.sunk_ship) {
+          toast.success(`Đã đánh chìm ${data.sunk_ship}!`);
+        }
+      } else {
+        // Opponent's attack on my board
+        if (data.hit) {
+          setMyBoard(prev => {
+            const newBoard = prev.map(row => [...row]);
+            newBoard[data.y][data.x] = 'hit';
+            return newBoard;
+          });
+        }
+        setOpponentHits(prev => [...prev, { x: data.x, y: data.y, hit: data.hit }]);
+      }
+      setCurrentTurn(data.current_turn);
+    } else if (data.type === 'game_over') {
+      finishedRef.current = true;
+      setGamePhase('finished');
+      if (data.winner === user.username) {
+        toast.success('Bạn đã chiến thắng!');
+      } else {
+        toast.error('Bạn đã thua!');
+      }
+    } else if (data.type === 'chat_batch') {
+      setChatMessages(prev => [...prev, ...data.messages]);
+    } else if (data.type === 'ping') {
+      websocket.send(JSON.stringify({ type: 'pong' }));
+    } else if (data.type === 'room_closed') {
+      finishedRef.current = true;
+      toast.error(data.reason === 'idle' ? 'Phòng đã bị đóng do không hoạt động' : 'Phòng không còn tồn tại');
+      navigate('/lobby');
+    } else if (data.type === 'error') {
+      toast.error(data.message);
+    }
+  };
+
   const placeShip = (row, col) => {
     if (currentShipIndex >= SHIPS.length) return;
     
@@ -165,6 +252,12 @@ export default function Game({ token, user }) {
     }
   };
 
+  const addBot = () => {
+    if (ws && ws.readyState === WebSocket.OPEN) {
+      ws.send(JSON.stringify({ type: 'add_bot' }));
+    }
+  };
+
   const sendChat = () => {
     if (!chatInput.trim() || !ws) return;
     
@@ -243,6 +336,16 @@ export default function Game({ token, user }) {
                 </Button>
               </div>
             )}
+            {players.length < 2 && (
+              <Button
+                data-testid="add-bot-btn"
+                onClick={addBot}
+                variant="outline"
+                className="mt-2 border-white/30 text-white hover:bg-white/10"
+              >
+                Chơi với máy
+              </Button>
+            )}
           </div>
         )}
 
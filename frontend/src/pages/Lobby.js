@@ -4,7 +4,7 @@ import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '@/components/ui/card';
 import { toast } from 'sonner';
-import { LogOut, Plus, Users, Trophy, History as HistoryIcon } from 'lucide-react';
+import { LogOut, Plus, Users, Trophy, History as HistoryIcon, Swords } from 'lucide-react';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const WS_URL = BACKEND_URL.replace('https://', 'wss://').replace('http://', 'ws://');
@@ -12,6 +12,7 @@ const WS_URL = BACKEND_URL.replace('https://', 'wss://').replace('http://', 'ws:
 export default function Lobby({ token, user, onLogout }) {
   const [roomCode, setRoomCode] = useState('');
   const [ws, setWs] = useState(null);
+  const [searching, setSearching] = useState(false);
   const navigate = useNavigate();
   const wsRef = useRef(null);
 
@@ -43,6 +44,15 @@ export default function Lobby({ token, user, onLogout }) {
         console.log('Room created, navigating to:', `/game/${data.room_code}`);
         toast.success(`Phòng đã tạo: ${data.room_code}`);
         navigate(`/game/${data.room_code}`);
+      } else if (data.type === 'match_found') {
+        toast.success(`Đã tìm thấy đối thủ: ${data.room_code}`);
+        navigate(`/game/${data.room_code}`);
+      } else if (data.type === 'match_searching') {
+        setSearching(true);
+      } else if (data.type === 'match_cancelled') {
+        setSearching(false);
+      } else if (data.type === 'ping') {
+        websocket.send(JSON.stringify({ type: 'pong' }));
       } else if (data.type === 'error') {
         console.error('WebSocket error message:', data.message);
         toast.error(data.message);
@@ -72,6 +82,14 @@ export default function Lobby({ token, user, onLogout }) {
     }
   };
 
+  const toggleMatchmaking = () => {
+    if (!ws || ws.readyState !== WebSocket.OPEN) {
+      toast.error('Chưa kết nối đến server');
+      return;
+    }
+    ws.send(JSON.stringify({ type: searching ? 'cancel_match' : 'find_match' }));
+  };
+
   const joinRoom = () => {
     if (!roomCode) {
       toast.error('Vui lòng nhập mã phòng');
@@ -80,6 +98,14 @@ export default function Lobby({ token, user, onLogout }) {
     navigate(`/game/${roomCode.toUpperCase()}`);
   };
 
+  const watchRoom = () => {
+    if (!roomCode) {
+      toast.error('Vui lòng nhập mã phòng');
+      return;
+    }
+    navigate(`/watch/${roomCode.toUpperCase()}`);
+  };
+
   return (
     <div className="min-h-screen bg-gradient-to-br from-blue-900 via-slate-800 to-blue-950 p-4">
       <div className="max-w-4xl mx-auto">
@@ -144,10 +170,39 @@ export default function Lobby({ token, user, onLogout }) {
               >
                 Tham Gia
               </Button>
+              <Button
+                data-testid="watch-room-btn"
+                onClick={watchRoom}
+                variant="outline"
+                className="w-full border-white/30 text-white hover:bg-white/10"
+              >
+                Xem Trận
+              </Button>
             </CardContent>
           </Card>
         </div>
 
+        <Card className="bg-white/10 backdrop-blur-md border-white/20 mb-8">
+          <CardHeader>
+            <CardTitle className="text-white flex items-center gap-2">
+              <Swords className="w-5 h-5" />
+              Tìm Trận
+            </CardTitle>
+            <CardDescription className="text-blue-200">
+              Ghép với đối thủ cùng trình độ{user?.rating ? ` (điểm: ${user.rating})` : ''}
+            </CardDescription>
+          </CardHeader>
+          <CardContent>
+            <Button
+              data-testid="find-match-btn"
+              onClick={toggleMatchmaking}
+              className="w-full bg-emerald-500 hover:bg-emerald-600 text-white"
+            >
+              {searching ? 'Đang tìm... (Hủy)' : 'Tìm Trận'}
+            </Button>
+          </CardContent>
+        </Card>
+
         <div className="grid md:grid-cols-2 gap-6">
           <Card
             data-testid="leaderboard-card"
@@ -0,0 +1,122 @@
+import { useState, useEffect, useRef } from 'react';
+import { useParams, useNavigate } from 'react-router-dom';
+import { Button } from '@/components/ui/button';
+import { Card } from '@/components/ui/card';
+import { toast } from 'sonner';
+import { ArrowLeft, Eye } from 'lucide-react';
+
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+const WS_URL = BACKEND_URL.replace('https://', 'wss://').replace('http://', 'ws://');
+
+const emptyView = { players: [], status: 'waiting', current_turn: null, shots: {}, sunk: {}, fleets: null };
+
+export default function Spectate({ token }) {
+  const { roomCode } = useParams();
+  const navigate = useNavigate();
+  const [view, setView] = useState(emptyView);
+  const [ended, setEnded] = useState(false);
+  const wsRef = useRef(null);
+
+  useEffect(() => {
+    const websocket = new WebSocket(`${WS_URL}/ws/${token}`);
+    wsRef.current = websocket;
+
+    websocket.onopen = () => {
+      websocket.send(JSON.stringify({ type: 'spectate', room_code: roomCode }));
+    };
+
+    websocket.onmessage = (event) => {
+      const data = JSON.parse(event.data);
+
+      if (data.type === 'spectate_snapshot') {
+        setView({ ...emptyView, ...data });
+      } else if (data.type === 'player_joined') {
+        setView(prev => ({ ...prev, players: data.players, status: data.status }));
+      } else if (data.type === 'game_start') {
+        setView(prev => ({ ...prev, status: 'playing', current_turn: data.current_turn }));
+      } else if (data.type === 'attack_result') {
+        setView(prev => ({
+          ...prev,
+          current_turn: data.current_turn,
+          shots: { ...prev.shots, [data.attacker]: [...(prev.shots[data.attacker] || []), [data.x, data.y, data.hit]] },
+          sunk: data.sunk_ship
+            ? { ...prev.sunk, [data.attacker]: [...(prev.sunk[data.attacker] || []), data.sunk_ship] }
+            : prev.sunk
+        }));
+      } else if (data.type === 'game_over') {
+        setView(prev => ({ ...prev, status: 'finished', winner: data.winner, fleets: data.fleets }));
+        toast.success(`${data.winner} đã chiến thắng!`);
+      } else if (data.type === 'spectate_end') {
+        setEnded(true);
+      } else if (data.type === 'ping') {
+        websocket.send(JSON.stringify({ type: 'pong' }));
+      } else if (data.type === 'error') {
+        toast.error(data.message);
+      }
+    };
+
+    return () => websocket.close();
+  }, [token, roomCode]);
+
+  // The board of ``player`` shows the shots their opponent fired at it
+  const renderBoard = (player) => {
+    const opponent = view.players.find(p => p !== player);
+    const cells = Array(10).fill(null).map(() => Array(10).fill(null));
+    const fleet = view.fleets && view.fleets[player];
+    if (fleet) {
+      Object.values(fleet).forEach(coords => coords.forEach(([x, y]) => { cells[y][x] = 'ship'; }));
+    }
+    ((opponent && view.shots[opponent]) || []).forEach(([x, y, hit]) => { cells[y][x] = hit ? 'hit' : 'miss'; });
+
+    return (
+      <Card key={player} className="bg-white/10 backdrop-blur-md border-white/20 p-4">
+        <h3 className="text-white text-lg font-semibold mb-1">
+          {player} {view.current_turn === player && view.status === 'playing' && <span className="text-cyan-400 text-sm">(đang bắn)</span>}
+        </h3>
+        <p className="text-blue-200 text-sm mb-3">
+          Tàu bị chìm: {((opponent && view.sunk[opponent]) || []).join(', ') || 'chưa có'}
+        </p>
+        <div className="grid grid-cols-10 gap-0 aspect-square">
+          {cells.map((row, y) => row.map((cell, x) => (
+            <div
+              key={`${x}-${y}`}
+              data-testid={`cell-${player}-${y}-${x}`}
+              className={`${cell === 'hit' ? 'bg-red-500' : cell === 'miss' ? 'bg-blue-400' : cell === 'ship' ? 'bg-gray-400' : 'bg-blue-200/30'} border border-white/20 flex items-center justify-center font-bold text-white`}
+            >
+              {cell === 'hit' ? 'X' : cell === 'miss' ? '•' : null}
+            </div>
+          )))}
+        </div>
+      </Card>
+    );
+  };
+
+  return (
+    <div className="min-h-screen bg-gradient-to-br from-blue-900 via-slate-800 to-blue-950 p-4">
+      <div className="max-w-7xl mx-auto">
+        <div className="flex justify-between items-center mb-6">
+          <Button data-testid="back-to-lobby-btn" onClick={() => navigate('/lobby')} variant="outline" className="border-white/30 text-white hover:bg-white/10">
+            <ArrowLeft className="w-4 h-4 mr-2" />
+            Quay lại
+          </Button>
+          <div className="text-white text-center">
+            <h2 className="text-2xl font-bold flex items-center gap-2" style={{ fontFamily: 'Playfair Display, serif' }}>
+              <Eye className="w-6 h-6" />
+              Xem phòng: {roomCode}
+            </h2>
+            {view.status === 'finished' && <p className="text-sm text-cyan-400">{view.winner} đã chiến thắng</p>}
+            {ended && view.status !== 'finished' && <p className="text-sm text-red-300">Phòng đã đóng</p>}
+          </div>
+          <div className="w-24" />
+        </div>
+
+        <div className="grid md:grid-cols-2 gap-6">
+          {view.players.map(renderBoard)}
+        </div>
+        {view.players.length === 0 && (
+          <p className="text-white/70 text-center">Đang chờ dữ liệu trận đấu...</p>
+        )}
+      </div>
+    </div>
+  );
+}
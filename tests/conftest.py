@@ -0,0 +1,55 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+# server.py reads these at import time; the Mongo client connects lazily
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "battleship_test")
+
+
+class FakeWebSocket:
+    """Records what a ConnectionManager sends; a stalled one blocks sends until ``gate`` is set."""
+
+    def __init__(self, stalled=False):
+        self.sent = []
+        self.closed_with = None
+        self.gate = asyncio.Event()
+        if not stalled:
+            self.gate.set()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        await self.gate.wait()
+        self.sent.append(data)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+async def seat_players(manager, *players, stalled=()):
+    """Create room ``ROOM`` on ``manager`` with ``players`` connected and bound; returns their sockets."""
+    sockets = {}
+    await manager.create_room("ROOM", {"code": "ROOM", "players": list(players)})
+    for name in players:
+        sockets[name] = FakeWebSocket(stalled=name in stalled)
+        await manager.connect(sockets[name], name)
+        await manager.bind(name, "ROOM")
+    return sockets
+
+
+@pytest.fixture
+def fake_websocket():
+    return FakeWebSocket
+
+
+@pytest.fixture
+def setup_room():
+    return seat_players
@@ -0,0 +1,52 @@
+import time
+
+from auth_cache import AuthCache, TTLCache
+
+
+def test_lru_eviction():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["size"] == 2
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = TTLCache(maxsize=10, ttl=5)
+    cache.put("a", 1)
+    cache.put("b", 2, ttl=1)
+    now[0] += 2
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    now[0] += 4
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_token_never_outlives_jwt_expiry():
+    cache = AuthCache(ttl=60)
+    cache.put_token("expired", "alice", exp=time.time() - 1)
+    assert cache.get_token("expired") is None
+    cache.put_token("fresh", "alice", exp=time.time() + 3600)
+    assert cache.get_token("fresh") == "alice"
+
+
+def test_invalidate_and_disable():
+    cache = AuthCache()
+    cache.put_user("alice", {"username": "alice", "wins": 1})
+    assert cache.get_user("alice")["wins"] == 1
+    cache.invalidate_user("alice")
+    assert cache.get_user("alice") is None
+
+    disabled = AuthCache(enabled=False)
+    disabled.put_user("alice", {"username": "alice"})
+    disabled.put_token("t", "alice")
+    assert disabled.get_user("alice") is None
+    assert disabled.get_token("t") is None
+    assert disabled.stats()["users"]["size"] == 0
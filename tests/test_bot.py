@@ -0,0 +1,47 @@
+import random
+
+from bot import PLACEMENTS, BotPlayer, random_board
+from game_engine import BOARD_SIZE, FLEET, cell_index
+
+
+def test_placement_tables_cover_every_legal_position():
+    for length, matrix in PLACEMENTS.items():
+        assert matrix.shape == (2 * BOARD_SIZE * (BOARD_SIZE - length + 1), BOARD_SIZE * BOARD_SIZE)
+        assert (matrix.sum(axis=1) == length).all()
+
+
+def test_random_board_places_whole_fleet_without_overlap():
+    board = random_board(random.Random(3))
+    assert bin(board.occupancy).count("1") == sum(length for _, length in FLEET)
+    assert board.ships_left == len(FLEET)
+
+
+def test_bot_never_repeats_and_always_wins():
+    rng = random.Random(7)
+    for seed in range(20):
+        board = random_board(rng)
+        bot = BotPlayer(seed=seed)
+        for shots in range(1, 101):
+            index = bot.choose()
+            result = board.fire(index)
+            assert not result.repeat
+            bot.record(index, result.hit, result.sunk_ship)
+            if result.won:
+                break
+        assert result.won and shots < 100
+
+
+def test_bot_targets_around_a_hit():
+    bot = BotPlayer(seed=0)
+    bot.record(cell_index(5, 5), True)
+    neighbours = {cell_index(4, 5), cell_index(6, 5), cell_index(5, 4), cell_index(5, 6)}
+    assert bot.choose() in neighbours
+
+
+def test_sunk_ship_cells_stop_attracting_shots():
+    bot = BotPlayer(seed=0)
+    bot.record(cell_index(0, 0), True)
+    bot.record(cell_index(1, 0), True, "Destroyer")
+    assert bot.afloat[2] == 0
+    assert bot.sunk.sum() == 2
+    assert bot.density()[cell_index(2, 0)] < bot.density()[cell_index(5, 5)]
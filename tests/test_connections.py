@@ -0,0 +1,246 @@
+import asyncio
+import json
+
+from connections import ConnectionManager
+from timing_wheel import TimingWheel
+
+
+def test_broadcast_encodes_once_and_preserves_order(setup_room):
+    async def scenario():
+        manager = ConnectionManager()
+        sockets = await setup_room(manager, "a", "b", "c")
+        for i in range(3):
+            await manager.broadcast_to_room({"type": "attack_result", "n": i}, "ROOM")
+        await asyncio.sleep(0)
+        frames = {name: ws.sent for name, ws in sockets.items()}
+        assert [json.loads(f)["n"] for f in frames["a"]] == [0, 1, 2]
+        # Every recipient got the very same encoded string
+        assert all(frames["a"][i] is frames["c"][i] for i in range(3))
+
+    asyncio.run(scenario())
+
+
+def test_stalled_client_does_not_delay_others(setup_room):
+    async def scenario():
+        manager = ConnectionManager()
+        sockets = await setup_room(manager, "a", "b", stalled={"b"})
+        await manager.broadcast_to_room({"type": "attack_result"}, "ROOM")
+        await asyncio.sleep(0)
+        assert len(sockets["a"].sent) == 1
+        assert sockets["b"].sent == []
+        sockets["b"].gate.set()
+        await asyncio.sleep(0)
+        assert len(sockets["b"].sent) == 1
+
+    asyncio.run(scenario())
+
+
+def test_chat_overflow_drops_oldest(setup_room):
+    async def scenario():
+        manager = ConnectionManager(send_queue_size=2)
+        sockets = await setup_room(manager, "a", stalled={"a"})
+        for i in range(4):
+            await manager.broadcast_to_room({"type": "chat", "message": str(i)}, "ROOM")
+        await asyncio.sleep(0)
+        sockets["a"].gate.set()
+        await asyncio.sleep(0.01)
+        assert [json.loads(f)["message"] for f in sockets["a"].sent] == ["2", "3"]
+        assert manager.dropped_messages == 2
+        assert manager.slow_consumer_events == 2
+
+    asyncio.run(scenario())
+
+
+def test_game_event_overflow_disconnects(setup_room):
+    async def scenario():
+        manager = ConnectionManager(send_queue_size=1)
+        sockets = await setup_room(manager, "a", "b", stalled={"a"})
+        for _ in range(3):
+            await manager.broadcast_to_room({"type": "attack_result"}, "ROOM")
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.01)
+        assert manager.active_connections["a"].closed
+        assert sockets["a"].closed_with == 1008
+        assert len(sockets["b"].sent) == 3
+
+    asyncio.run(scenario())
+
+
+def test_game_event_overflow_evicts_chat_first(setup_room):
+    async def scenario():
+        manager = ConnectionManager(send_queue_size=2)
+        sockets = await setup_room(manager, "a", stalled={"a"})
+        for i in range(3):
+            await manager.broadcast_to_room({"type": "chat", "message": str(i)}, "ROOM")
+            await asyncio.sleep(0)
+        # "0" is in the stalled write; the queue holds "1" and "2"
+        await manager.broadcast_to_room({"type": "attack_result"}, "ROOM")
+        assert not manager.active_connections["a"].closed
+        sockets["a"].gate.set()
+        await asyncio.sleep(0.01)
+        assert [json.loads(f)["type"] for f in sockets["a"].sent] == ["chat", "chat", "attack_result"]
+        assert [json.loads(f).get("message") for f in sockets["a"].sent[:2]] == ["0", "2"]
+        assert manager.dropped_messages == 1
+
+    asyncio.run(scenario())
+
+
+def test_stale_socket_disconnect_keeps_new_one(fake_websocket):
+    async def scenario():
+        manager = ConnectionManager(seat_grace=0)
+        await manager.create_room("ROOM", {"code": "ROOM", "players": ["a"]})
+        old = await manager.connect(fake_websocket(), "a")
+        await manager.bind("a", "ROOM")
+        new = await manager.connect(fake_websocket(), "a")
+        await manager.bind("a", "ROOM")
+        await manager.disconnect("a", old)
+        assert manager.active_connections["a"] is new
+        assert "ROOM" in manager.rooms
+        await manager.disconnect("a", new)
+        assert "ROOM" not in manager.rooms
+        assert await manager.store.room_owner("ROOM") is None
+
+    asyncio.run(scenario())
+
+
+def make_clocked_manager(heartbeat_timeout=30, seat_grace=0):
+    now = [0.0]
+    manager = ConnectionManager(
+        ping_interval=10, heartbeat_timeout=heartbeat_timeout, room_idle_timeout=60, seat_grace=seat_grace,
+        wheel=TimingWheel(clock=lambda: now[0]),
+    )
+    return manager, now
+
+
+async def advance(manager, now, seconds):
+    for _ in range(int(seconds)):
+        now[0] += 1
+        await manager.expire_timers()
+    # Room timers run as jobs on the room's actor, then their frames are written
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+def test_heartbeat_pings_and_reaps_silent_connections(setup_room):
+    async def scenario():
+        manager, now = make_clocked_manager()
+        sockets = await setup_room(manager, "a", "b")
+        await advance(manager, now, 10)
+        assert json.loads(sockets["a"].sent[-1]) == {"type": "ping"}
+        # "a" answers every ping, "b" never does
+        for _ in range(3):
+            await manager.route(manager.active_connections["a"], {"type": "pong"})
+            await advance(manager, now, 10)
+        assert "a" in manager.active_connections
+        assert "b" not in manager.active_connections
+        assert sockets["b"].closed_with == 1001
+        assert manager.reaped_connections == 1
+        assert manager.rooms["ROOM"]["players"] == ["a"]
+
+    asyncio.run(scenario())
+
+
+def test_idle_room_is_reaped_and_activity_defers_it(setup_room):
+    async def scenario():
+        manager, now = make_clocked_manager(heartbeat_timeout=1000)
+        manager.dispatch = lambda username, message: asyncio.sleep(0)
+        sockets = await setup_room(manager, "a")
+        await advance(manager, now, 50)
+        await manager.route(manager.active_connections["a"], {"type": "chat", "message": "hi"})
+        await advance(manager, now, 50)
+        assert "ROOM" in manager.rooms
+        await advance(manager, now, 15)
+        assert "ROOM" not in manager.rooms
+        assert manager.reaped_rooms == 1
+        assert {"type": "room_closed", "reason": "idle", "seq": 1} in [json.loads(f) for f in sockets["a"].sent]
+        assert ("room", "ROOM") not in manager.wheel
+
+    asyncio.run(scenario())
+
+
+def test_dropped_player_keeps_seat_and_catches_up(fake_websocket, setup_room):
+    async def scenario():
+        manager, now = make_clocked_manager(heartbeat_timeout=1000, seat_grace=20)
+        sockets = await setup_room(manager, "a", "b")
+        await manager.broadcast_to_room({"type": "attack_result", "n": 0}, "ROOM")
+        await manager.disconnect("b")
+        assert manager.rooms["ROOM"]["away"] == {"b"}
+        await manager.broadcast_to_room({"type": "attack_result", "n": 1}, "ROOM")
+        await advance(manager, now, 10)
+        missed = manager.events_since("ROOM", 1)
+        assert [(e["seq"], e["type"]) for e in missed] == [(2, "player_away"), (3, "attack_result")]
+        assert manager.events_since("ROOM", 3) == []
+
+        await manager.connect(fake_websocket(), "b")
+        await manager.bind("b", "ROOM")
+        assert manager.rooms["ROOM"]["away"] == set()
+        assert ("seat", ("ROOM", "b")) not in manager.wheel
+        await advance(manager, now, 20)
+        assert manager.rooms["ROOM"]["players"] == ["a", "b"]
+        assert "player_returned" in [json.loads(f)["type"] for f in sockets["a"].sent]
+
+    asyncio.run(scenario())
+
+
+def test_seat_is_given_up_after_grace_period(setup_room):
+    async def scenario():
+        manager, now = make_clocked_manager(heartbeat_timeout=1000, seat_grace=20)
+        await setup_room(manager, "a", "b")
+        await manager.disconnect("b")
+        await advance(manager, now, 19)
+        assert manager.rooms["ROOM"]["players"] == ["a", "b"]
+        await advance(manager, now, 1)
+        assert manager.rooms["ROOM"]["players"] == ["a"]
+        assert "b" not in manager.user_to_room
+
+    asyncio.run(scenario())
+
+
+def test_seat_given_up_mid_game_forfeits_it(setup_room):
+    async def scenario():
+        manager, now = make_clocked_manager(heartbeat_timeout=1000, seat_grace=20)
+        sockets = await setup_room(manager, "a", "b")
+        manager.rooms["ROOM"]["status"] = "playing"
+        forfeits = []
+
+        async def on_forfeit(room_code, room, username):
+            forfeits.append((room_code, list(room["players"]), username))
+            await manager.broadcast_to_room({"type": "game_over", "winner": "a", "loser": username}, room_code)
+
+        manager.on_forfeit = on_forfeit
+        await manager.disconnect("b")
+        await advance(manager, now, 20)
+        assert forfeits == [("ROOM", ["a", "b"], "b")]
+        assert "ROOM" not in manager.rooms
+        # An attack from "a" now finds no room instead of a one-player game
+        assert "a" not in manager.user_to_room
+        await asyncio.sleep(0.01)
+        assert json.loads(sockets["a"].sent[-1])["type"] == "game_over"
+
+    asyncio.run(scenario())
+
+
+def test_seat_given_up_mid_game_closes_room_without_forfeit_hook(setup_room):
+    async def scenario():
+        manager, now = make_clocked_manager(heartbeat_timeout=1000, seat_grace=20)
+        sockets = await setup_room(manager, "a", "b")
+        manager.rooms["ROOM"]["status"] = "playing"
+        await manager.disconnect("b")
+        await advance(manager, now, 20)
+        assert "ROOM" not in manager.rooms
+        await asyncio.sleep(0.01)
+        assert json.loads(sockets["a"].sent[-1]) == {"type": "room_closed", "reason": "forfeit", "seq": 2}
+
+    asyncio.run(scenario())
+
+
+def test_events_since_reports_gaps_past_the_buffer(setup_room):
+    async def scenario():
+        manager = ConnectionManager(event_buffer=4)
+        await setup_room(manager, "a")
+        for i in range(10):
+            await manager.broadcast_to_room({"type": "chat", "message": str(i)}, "ROOM")
+        assert [e["seq"] for e in manager.events_since("ROOM", 6)] == [7, 8, 9, 10]
+        assert manager.events_since("ROOM", 5) is None
+
+    asyncio.run(scenario())
@@ -0,0 +1,93 @@
+import pytest
+
+from game_engine import FLEET, LEGAL_PLACEMENTS, Board, PlacementError, cell_index, mask_cells
+
+
+def make_board():
+    # Destroyer on (0, 0)-(1, 0), Cruiser on (5, 5)-(5, 7)
+    return Board(["Destroyer", "Cruiser"], [0b11, (1 << 55) | (1 << 65) | (1 << 75)])
+
+
+def test_cell_index_bounds():
+    assert cell_index(0, 0) == 0
+    assert cell_index(9, 9) == 99
+    assert cell_index(3, 2) == 23
+    assert cell_index(10, 0) == -1
+    assert cell_index(-1, 0) == -1
+    assert cell_index("1", 0) == -1
+    assert cell_index(True, 0) == -1
+    assert cell_index(None, None) == -1
+
+
+def test_board_counts_ship_cells():
+    board = make_board()
+    assert board.names == ["Destroyer", "Cruiser"]
+    assert mask_cells(board.ship_masks[1]) == [55, 65, 75]
+    assert board.remaining == [2, 3]
+    assert board.ships_left == 2
+
+
+def test_miss_and_hit():
+    board = make_board()
+    assert board.fire(cell_index(9, 9)) == (False, None, False, False)
+    assert board.fire(cell_index(0, 0)) == (True, None, False, False)
+    assert board.hits == 1
+
+
+def test_sink_and_win():
+    board = make_board()
+    board.fire(cell_index(0, 0))
+    assert board.fire(cell_index(1, 0)).sunk_ship == "Destroyer"
+    board.fire(cell_index(5, 5))
+    board.fire(cell_index(5, 6))
+    result = board.fire(cell_index(5, 7))
+    assert result.sunk_ship == "Cruiser"
+    assert result.won
+
+
+def test_repeat_shot_does_not_double_count():
+    board = make_board()
+    board.fire(cell_index(0, 0))
+    result = board.fire(cell_index(0, 0))
+    assert result.hit and result.repeat
+    assert board.remaining[0] == 1
+    assert board.fire(cell_index(1, 0)).sunk_ship == "Destroyer"
+
+
+def standard_fleet():
+    return {
+        name: {"coords": [{"x": i, "y": row} for i in range(length)]}
+        for row, (name, length) in enumerate(FLEET)
+    }
+
+
+def test_from_placement_accepts_standard_fleet():
+    ships = standard_fleet()
+    ships["Destroyer"] = {"coords": [{"x": 9, "y": 9, "hit": False}, {"x": 9, "y": 8, "hit": False}]}
+    board = Board.from_placement(ships)
+    assert board.names == [name for name, _ in FLEET]
+    assert mask_cells(board.ship_masks[-1]) == [89, 99]
+
+
+@pytest.mark.parametrize("change, reason", [
+    (lambda s: s.pop("Cruiser"), "exactly one"),
+    (lambda s: s.update(Extra={"coords": []}), "exactly one"),
+    (lambda s: s["Carrier"]["coords"].append({"x": 5, "y": 0}), "5 cells"),
+    (lambda s: s.update(Destroyer={"coords": [{"x": 0, "y": 4}] * 2}), "straight line"),
+    (lambda s: s.update(Destroyer={"coords": [{"x": 0, "y": 4}, {"x": 2, "y": 4}]}), "straight line"),
+    (lambda s: s.update(Destroyer={"coords": [{"x": 9, "y": 4}, {"x": 0, "y": 5}]}), "straight line"),
+    (lambda s: s.update(Destroyer={"coords": [{"x": 9, "y": 4}, {"x": 10, "y": 4}]}), "off the board"),
+    (lambda s: s.update(Destroyer={"coords": [{"x": 0, "y": 0}, {"x": 1, "y": 0}]}), "overlaps"),
+    (lambda s: s.update(Destroyer={"coords": "AB"}), "2 cells"),
+    (lambda s: s.update(Destroyer={"coords": ["a", "b"]}), "off the board"),
+])
+def test_from_placement_rejects_bad_layouts(change, reason):
+    ships = standard_fleet()
+    change(ships)
+    with pytest.raises(PlacementError, match=reason):
+        Board.from_placement(ships)
+
+
+def test_placement_masks_cover_every_straight_line():
+    assert len(LEGAL_PLACEMENTS[5]) == 2 * 10 * 6
+    assert len(LEGAL_PLACEMENTS[2]) == 2 * 10 * 9
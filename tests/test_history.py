@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from history import (
+    EXPORT_SORT, HISTORY_PROJECTION, HISTORY_SORT, CursorError, decode_cursor, encode_cursor, export_filter,
+    history_filter,
+)
+
+
+def games(count):
+    # Pairs of games share a finish time, so pages must break ties on the id
+    return [
+        {
+            "id": f"g{i:03d}", "player1": "a" if i % 3 else "b", "player2": "b" if i % 3 else "a",
+            "winner": "a", "loser": "b", "duration_seconds": 60,
+            "finished_at": f"2024-05-01T12:{i // 2:02d}:00+00:00", "moves": b"",
+        }
+        for i in range(count)
+    ]
+
+
+def test_cursor_round_trip():
+    game = {"id": "g1", "finished_at": "2024-05-01T12:00:00.123456+00:00"}
+    assert decode_cursor(encode_cursor(game)) == (game["finished_at"], "g1")
+    for bad in ("not a cursor", "", encode_cursor({"id": 1, "finished_at": "x"})):
+        with pytest.raises(CursorError):
+            decode_cursor(bad)
+
+
+def test_pages_walk_the_whole_history_once():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["test"]
+        docs = games(45)
+        await db.games.insert_many([dict(doc) for doc in docs])
+        await db.games.insert_one({**docs[0], "id": "other", "player1": "c", "player2": "d"})
+
+        seen, after = [], None
+        while True:
+            cursor = db.games.find(history_filter("a", after), HISTORY_PROJECTION).sort(HISTORY_SORT).limit(10)
+            page = await cursor.to_list(10)
+            seen += [game["id"] for game in page]
+            if len(page) < 10:
+                break
+            after = decode_cursor(encode_cursor(page[-1]))
+        expected = sorted(docs, key=lambda g: (g["finished_at"], g["id"]), reverse=True)
+        assert seen == [game["id"] for game in expected]
+        assert "moves" not in page[0]
+
+    asyncio.run(scenario())
+
+
+def test_export_pages_keep_games_sharing_a_finish_time():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["test"]
+        docs = games(25)
+        await db.games.insert_many([dict(doc) for doc in docs])
+        await db.games.insert_one({"id": "no-moves", "finished_at": docs[0]["finished_at"]})
+
+        seen, after = [], None
+        while True:
+            page = await db.games.find(export_filter(after)).sort(EXPORT_SORT).limit(3).to_list(3)
+            seen += [game["id"] for game in page]
+            if len(page) < 3:
+                break
+            after = decode_cursor(encode_cursor(page[-1]))
+        assert seen == [game["id"] for game in sorted(docs, key=lambda g: (g["finished_at"], g["id"]))]
+
+    asyncio.run(scenario())
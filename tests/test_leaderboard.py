@@ -0,0 +1,113 @@
+import asyncio
+
+from leaderboard import LeaderboardCache, make_entry, rank_key
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length):
+        return self.docs[:length]
+
+
+class FakeUsers:
+    """Serves the leaderboard pipeline from a plain list of user docs."""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.calls = 0
+
+    def aggregate(self, pipeline):
+        self.calls += 1
+        stages = {k: v for stage in pipeline for k, v in stage.items()}
+        ranked = sorted(self.docs, key=lambda d: rank_key(make_entry(d)))
+        start = stages["$skip"]
+        return FakeCursor(ranked[start:start + stages["$limit"]])
+
+
+def user(name, wins, losses):
+    return {"username": name, "wins": wins, "losses": losses, "games_played": wins + losses}
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_ranks_by_wins_then_win_rate():
+    users = FakeUsers([user("a", 3, 3), user("b", 3, 0), user("c", 5, 5), user("d", 0, 0)])
+    cache = LeaderboardCache(capacity=10)
+    entries = run(cache.get(users, 0, 10))
+    assert [e["username"] for e in entries] == ["c", "b", "a", "d"]
+    assert entries[1]["win_rate"] == 100.0
+    assert entries[2]["win_rate"] == 50.0
+
+
+def test_reads_are_served_from_memory():
+    users = FakeUsers([user("a", 1, 0), user("b", 0, 1)])
+    cache = LeaderboardCache(capacity=10)
+    run(cache.get(users, 0, 10))
+    run(cache.get(users, 0, 1))
+    run(cache.get(users, 1, 5))
+    assert users.calls == 1
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_apply_updates_in_place():
+    docs = [user(n, w, 0) for n, w in (("a", 5), ("b", 4), ("c", 3), ("d", 2))]
+    users = FakeUsers(docs)
+    cache = LeaderboardCache(capacity=3)
+    run(cache.get(users, 0, 3))
+    assert not cache.exhaustive
+
+    # "d" is outside the cache and climbs to the top
+    docs[3]["wins"] = 6
+    docs[3]["games_played"] = 6
+    cache.apply(docs[3])
+    assert [e["username"] for e in cache.entries] == ["d", "a", "b"]
+
+    # "b" loses and stays in place; "a" loses and stays above the tail
+    cache.apply(user("a", 5, 1))
+    assert [e["username"] for e in cache.entries] == ["d", "a", "b"]
+    assert cache.entries[1]["losses"] == 1
+    assert users.calls == 1
+
+
+def test_evicted_tail_falls_through_to_reload():
+    docs = [user("a", 5, 0), user("b", 4, 0), user("c", 4, 0)]
+    users = FakeUsers(docs)
+    cache = LeaderboardCache(capacity=2)
+    run(cache.get(users, 0, 2))
+    # "b" drops below "c", who is not cached, so "b" is evicted
+    docs[1]["losses"] = 1
+    docs[1]["games_played"] = 5
+    cache.apply(docs[1])
+    assert [e["username"] for e in cache.entries] == ["a"]
+    entries = run(cache.get(users, 0, 2))
+    assert [e["username"] for e in entries] == ["a", "c"]
+    assert users.calls == 2
+
+
+def test_pages_beyond_capacity_query_mongo():
+    users = FakeUsers([user(str(i), i, 0) for i in range(20)])
+    cache = LeaderboardCache(capacity=5)
+    entries = run(cache.get(users, 10, 5))
+    assert [e["wins"] for e in entries] == [9, 8, 7, 6, 5]
+    assert not cache.loaded
+
+
+def test_reloads_once_older_than_max_age():
+    now = [0.0]
+    docs = [user("a", 2, 0), user("b", 1, 0)]
+    users = FakeUsers(docs)
+    cache = LeaderboardCache(capacity=10, max_age=30, clock=lambda: now[0])
+    run(cache.get(users, 0, 10))
+    # Another worker's game, never announced to this one
+    docs[1]["wins"] = 3
+    docs[1]["games_played"] = 3
+    now[0] = 29
+    assert [e["username"] for e in run(cache.get(users, 0, 10))] == ["a", "b"]
+    now[0] = 31
+    assert [e["username"] for e in run(cache.get(users, 0, 10))] == ["b", "a"]
+    assert users.calls == 2
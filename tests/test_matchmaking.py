@@ -0,0 +1,53 @@
+from matchmaking import MatchQueue, elo_delta
+
+
+def make_queue(**kwargs):
+    now = [0.0]
+    queue = MatchQueue(clock=lambda: now[0], **kwargs)
+    return queue, now
+
+
+def test_elo_delta():
+    assert elo_delta(1200, 1200) == 16
+    assert elo_delta(1600, 1200) < 16 < elo_delta(1200, 1600)
+    assert elo_delta(3000, 0) == 1
+
+
+def test_close_ratings_match_on_arrival():
+    queue, _ = make_queue()
+    assert queue.add("alice", 1210) is None
+    assert queue.add("bob", 1240) == ("alice", "bob")
+    assert len(queue) == 0
+    assert queue.bucket_keys == []
+
+
+def test_closest_rating_wins():
+    queue, _ = make_queue(initial_window=100)
+    queue.add("far", 1100)
+    queue.add("near", 1280)
+    assert queue.add("carol", 1250) == ("near", "carol")
+    assert "far" in queue
+
+
+def test_window_widens_on_sweep():
+    queue, now = make_queue(widen_step=100, widen_interval=5)
+    queue.add("alice", 1000)
+    queue.add("bob", 1180)
+    assert queue.sweep() == []
+    now[0] = 5
+    assert queue.sweep() == []
+    now[0] = 10
+    assert queue.sweep() == [("alice", "bob")]
+    assert queue.stats()["matched"] == 2
+    assert queue.stats()["mean_wait_seconds"] == 10
+
+
+def test_remove_and_requeue():
+    queue, _ = make_queue()
+    queue.add("alice", 1200)
+    assert queue.remove("alice")
+    assert not queue.remove("alice")
+    queue.add("bob", 1200)
+    queue.add("bob", 2000)
+    assert len(queue) == 1
+    assert queue.add("carol", 1200) is None
@@ -0,0 +1,49 @@
+import asyncio
+
+from metrics import Registry
+from protocol import MessageRouter
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.histogram("op_seconds", "Op latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value)
+    lines = registry.render().splitlines()
+    assert 'op_seconds_bucket{le="0.1"} 2' in lines
+    assert 'op_seconds_bucket{le="1.0"} 3' in lines
+    assert 'op_seconds_bucket{le="+Inf"} 4' in lines
+    assert "op_seconds_count 4" in lines
+    assert "op_seconds_sum 3.65" in lines
+
+
+def test_labelled_children_and_callbacks():
+    registry = Registry()
+    errors = registry.counter("errors_total", "Errors", ["collection", "op"])
+    child = errors.labels("users", "find")
+    assert errors.labels("users", "find") is child
+    child.inc()
+    child.inc(2)
+    registry.gauge("rooms", "Rooms", ["status"], callback=lambda: {("waiting",): 3, ("playing",): 1})
+    registry.gauge("connections", "Connections", callback=lambda: 7)
+    lines = registry.render().splitlines()
+    assert 'errors_total{collection="users",op="find"} 3' in lines
+    assert 'rooms{status="waiting"} 3' in lines
+    assert 'rooms{status="playing"} 1' in lines
+    assert "connections 7" in lines
+    assert "# TYPE rooms gauge" in lines
+
+
+def test_router_times_each_registered_handler():
+    registry = Registry()
+    latency = registry.histogram("handler_seconds", "Handler latency", ["msg_type"])
+    router = MessageRouter(latency=latency)
+
+    @router.handler("ping")
+    async def ping(ctx, message):
+        pass
+
+    assert ("ping",) in latency.children
+    asyncio.run(router.dispatch(None, {"type": "ping"}))
+    asyncio.run(router.dispatch(None, {"type": "ping"}))
+    assert latency.labels("ping").count == 2
@@ -0,0 +1,44 @@
+import base64
+import random
+
+from bot import random_board
+from game_engine import Board, cell_index
+from move_log import export_record, pack_fleet, pack_shot, replay_events, unpack_fleet
+
+
+def test_standard_fleet_packs_to_one_byte_per_ship():
+    board = random_board(random.Random(3))
+    packed = pack_fleet(board)
+    assert len(packed) == 6
+    assert unpack_fleet(packed).ship_masks == board.ship_masks
+
+
+def test_irregular_fleet_falls_back_to_masks():
+    board = Board(["Blob", "Carrier"], [0b1101, 1 << 99])
+    packed = pack_fleet(board)
+    restored = unpack_fleet(packed)
+    assert restored.names == ["Blob", "Carrier"]
+    assert restored.ship_masks == board.ship_masks
+
+
+def test_replay_rebuilds_shots_and_sinkings():
+    host = Board(["Destroyer"], [0b11])
+    guest = random_board(random.Random(1))
+    moves = bytes([
+        pack_shot(cell_index(9, 9), bool(guest.occupancy >> 99 & 1)),
+        pack_shot(cell_index(0, 0), True),
+        pack_shot(cell_index(9, 8), bool(guest.occupancy >> 89 & 1)),
+        pack_shot(cell_index(1, 0), True),
+    ])
+    game = {
+        "id": "g1", "player1": "host", "player2": "guest", "winner": "guest",
+        "duration_seconds": 30, "finished_at": "2024-01-01T00:00:00+00:00",
+        "first_turn": "host", "fleets": [pack_fleet(host), pack_fleet(guest)], "moves": moves,
+    }
+    events = list(replay_events(game))
+    assert [e["type"] for e in events] == ["game", "placement", "placement", "shot", "shot", "shot", "shot"]
+    assert events[1]["ships"] == {"Destroyer": [[0, 0], [1, 0]]}
+    shots = events[3:]
+    assert [s["player"] for s in shots] == ["host", "guest", "host", "guest"]
+    assert (shots[3]["x"], shots[3]["y"], shots[3]["hit"], shots[3]["sunk_ship"]) == (1, 0, True, "Destroyer")
+    assert base64.b64decode(export_record(game)["moves"]) == moves
@@ -0,0 +1,51 @@
+import asyncio
+
+from passlib.context import CryptContext
+
+from password_hasher import HasherBusy, PasswordHasher
+
+
+def make_context(rounds):
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+
+
+def test_hash_and_verify():
+    async def scenario():
+        hasher = PasswordHasher(make_context(4), workers=2, queue_size=2)
+        hashed = await hasher.hash("secret")
+        assert await hasher.verify_and_update("secret", hashed) == (True, None)
+        assert (await hasher.verify_and_update("wrong", hashed))[0] is False
+        hasher.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_rejects_when_saturated():
+    async def scenario():
+        hasher = PasswordHasher(make_context(8), workers=1, queue_size=1, retry_after=3)
+        results = await asyncio.gather(
+            *(hasher.hash("pw") for _ in range(3)), return_exceptions=True
+        )
+        busy = [r for r in results if isinstance(r, HasherBusy)]
+        assert len(busy) == 1
+        assert busy[0].retry_after == 3
+        assert hasher.rejected == 1
+        assert hasher.in_flight == 0
+        hasher.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_rehashes_legacy_cost_factor():
+    legacy = make_context(4).hash("secret")
+
+    async def scenario():
+        hasher = PasswordHasher(make_context(5), workers=1, queue_size=0)
+        valid, new_hash = await hasher.verify_and_update("secret", legacy)
+        assert valid
+        assert new_hash and "$05$" in new_hash
+        assert hasher.rehashed == 1
+        assert await hasher.verify_and_update("secret", new_hash) == (True, None)
+        hasher.shutdown()
+
+    asyncio.run(scenario())
@@ -0,0 +1,159 @@
+import asyncio
+
+import pytest
+from pymongo.errors import AutoReconnect
+
+from persistence import WriteBehindQueue
+
+
+class FakeCollection:
+    def __init__(self, failures=0, delay=0.0):
+        self.batches = []
+        self.failures = failures
+        self.delay = delay
+
+    async def bulk_write(self, ops, ordered=True):
+        await asyncio.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            raise AutoReconnect("connection reset")
+        self.batches.append(ops)
+
+
+class FakeDB:
+    def __init__(self, game_failures=0, delay=0.0):
+        self.games = FakeCollection(game_failures, delay)
+        self.users = FakeCollection()
+        self.player_stats = FakeCollection()
+        self.head_to_head = FakeCollection()
+
+
+def game(game_id):
+    return {"id": game_id, "winner": "a", "loser": "b"}, [
+        ("a", {"wins": 1, "games_played": 1}),
+        ("b", {"losses": 1, "games_played": 1}),
+    ]
+
+
+def test_groups_games_into_batches():
+    async def scenario():
+        db = FakeDB()
+        flushed = []
+
+        async def on_flushed(usernames):
+            flushed.append(usernames)
+
+        queue = WriteBehindQueue(db, batch_size=3, flush_interval=10, on_flushed=on_flushed)
+        queue.start()
+        for i in range(7):
+            queue.record_game(*game(str(i)))
+        # Two full batches go out on size; the last game waits for the timer
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if len(db.games.batches) == 2:
+                break
+        assert [len(ops) for ops in db.games.batches] == [3, 3]
+        assert queue.stats()["pending_games"] == 1
+        await queue.stop()
+        assert [len(ops) for ops in db.games.batches] == [3, 3, 1]
+        assert [len(ops) for ops in db.users.batches] == [6, 6, 2]
+        assert [len(ops) for ops in db.player_stats.batches] == [12, 12, 4]
+        assert flushed[0] == {"a", "b"}
+        assert queue.stats()["games_written"] == 7
+
+    asyncio.run(scenario())
+
+
+def test_flushes_on_interval():
+    async def scenario():
+        db = FakeDB()
+        queue = WriteBehindQueue(db, batch_size=100, flush_interval=0.01)
+        queue.start()
+        queue.record_game(*game("1"))
+        await asyncio.sleep(0.05)
+        assert len(db.games.batches) == 1
+        await queue.stop()
+
+    asyncio.run(scenario())
+
+
+def test_retries_failed_batches():
+    async def scenario():
+        db = FakeDB(game_failures=2)
+        queue = WriteBehindQueue(db, retry_delay=0.001)
+        queue.record_game(*game("1"))
+        await queue.flush()
+        assert len(db.games.batches) == 1
+        assert queue.stats()["failed_batches"] == 0
+
+        db = FakeDB(game_failures=10)
+        queue = WriteBehindQueue(db, max_retries=3, retry_delay=0.001)
+        queue.record_game(*game("2"))
+        await queue.flush()
+        assert db.games.batches == []
+        assert queue.stats()["failed_batches"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_stop_waits_for_the_batch_being_written():
+    async def scenario():
+        db = FakeDB(delay=0.05)
+        queue = WriteBehindQueue(db, flush_interval=0.001)
+        queue.start()
+        queue.record_game(*game("1"))
+        await asyncio.sleep(0.01)
+        # The background flush is inside bulk_write now
+        await queue.stop()
+        assert queue.stats()["games_written"] == 1
+        assert queue.stats()["pending_games"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_flush_keeps_its_batch():
+    async def scenario():
+        queue = WriteBehindQueue(FakeDB(delay=0.05))
+        queue.record_game(*game("1"))
+        flush = asyncio.create_task(queue.flush())
+        await asyncio.sleep(0.01)
+        flush.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await flush
+        assert queue.stats()["pending_games"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_unexpected_errors_count_as_failed_batches():
+    async def scenario():
+        queue = WriteBehindQueue(FakeDB())
+        queue.record_game({"id": "broken"}, [("a", {"wins": 1})])
+        queue.record_game(*game("1"))
+        queue.batch_size = 1
+        await queue.flush()
+        await queue.flush()
+        assert queue.stats()["failed_batches"] == 1
+        assert queue.stats()["games_written"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_replayed_batch_is_idempotent():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["test"]
+        await db.users.insert_many([
+            {"username": "a", "wins": 0, "losses": 0, "games_played": 0},
+            {"username": "b", "wins": 0, "losses": 0, "games_played": 0},
+        ])
+        queue = WriteBehindQueue(db)
+        for _ in range(2):
+            queue.record_game(*game("same-game"))
+            await queue.flush()
+        assert await db.games.count_documents({}) == 1
+        a = await db.users.find_one({"username": "a"})
+        assert (a["wins"], a["games_played"]) == (1, 1)
+
+    asyncio.run(scenario())
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from move_log import pack_shot
+from persistence import WriteBehindQueue
+from player_stats import PLAYER_STATS_PROJECTION, shot_counts, summarize
+
+
+def game(game_id, winner, loser, duration, moves=b"", first_turn=None):
+    doc = {
+        "id": game_id, "player1": winner, "player2": loser, "winner": winner, "loser": loser,
+        "duration_seconds": duration, "first_turn": first_turn or winner, "moves": moves,
+    }
+    return doc, [
+        (winner, {"wins": 1, "games_played": 1}),
+        (loser, {"losses": 1, "games_played": 1}),
+    ]
+
+
+def test_shot_counts_alternate_from_first_turn():
+    moves = bytes([pack_shot(0, True), pack_shot(1, False), pack_shot(2, True), pack_shot(3, True)])
+    doc, _ = game("g", "a", "b", 10, moves, first_turn="b")
+    assert shot_counts(doc) == {"b": [2, 2], "a": [2, 1]}
+
+
+def test_summarize_without_games():
+    stats = summarize("nobody", None, [])
+    assert stats["games_played"] == 0
+    assert stats["win_rate"] == stats["accuracy"] == 0.0
+    assert stats["best_duration_seconds"] is None
+
+
+def test_stats_are_maintained_per_game():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["test"]
+        queue = WriteBehindQueue(db)
+        hit, miss = pack_shot(0, True), pack_shot(1, False)
+        queue.record_game(*game("g1", "a", "b", 90, bytes([hit, miss, hit])))
+        queue.record_game(*game("g2", "a", "b", 60, bytes([miss, hit])))
+        queue.record_game(*game("g3", "b", "a", 120))
+        queue.record_game(*game("g4", "a", "c", 200))
+        await queue.flush()
+        # A replayed batch does not count its games twice
+        queue.record_game(*game("g4", "a", "c", 200))
+        await queue.flush()
+
+        doc = await db.player_stats.find_one({"username": "a"}, PLAYER_STATS_PROJECTION)
+        pairs = await db.head_to_head.find({"players": "a"}, {"_id": 0}).sort("games", -1).to_list(None)
+        stats = summarize("a", doc, pairs)
+        assert (stats["games_played"], stats["wins"], stats["losses"]) == (4, 3, 1)
+        assert stats["win_rate"] == 75.0
+        assert stats["avg_duration_seconds"] == 117.5
+        assert stats["best_duration_seconds"] == 60
+        assert (stats["current_streak"], stats["longest_win_streak"]) == (1, 2)
+        assert (stats["shots"], stats["hits"], stats["accuracy"]) == (3, 2, 66.67)
+        assert stats["head_to_head"] == [
+            {"opponent": "b", "games": 3, "wins": 2, "losses": 1},
+            {"opponent": "c", "games": 1, "wins": 1, "losses": 0},
+        ]
+
+        b = await db.player_stats.find_one({"username": "b"})
+        assert (b["streak"], b["longest_streak"], b["best_duration"]) == (1, 1, 120)
+        assert await db.player_stats.count_documents({}) == 3
+
+    asyncio.run(scenario())
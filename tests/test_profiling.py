@@ -0,0 +1,62 @@
+import asyncio
+import sys
+import threading
+import time
+
+from profiling import StallWatchdog, collapse_stack, format_collapsed, sample_stacks
+
+
+def block_the_loop(seconds):
+    time.sleep(seconds)
+
+
+def test_collapse_stack_is_outermost_first():
+    def inner():
+        return collapse_stack(sys._getframe(), root="main")
+
+    def outer():
+        return inner()
+
+    frames = outer().split(";")
+    assert frames[0] == "main"
+    assert frames[-1].startswith("inner (test_profiling.py:")
+    assert frames[-2].startswith("outer (test_profiling.py:")
+    assert format_collapsed({"a;b": 1, "a;c": 3}) == "a;c 3\na;b 1\n"
+
+
+def test_sampling_finds_a_busy_thread():
+    stop = threading.Event()
+
+    def spin():
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=spin, name="spinner")
+    worker.start()
+    try:
+        stacks = sample_stacks(0.2, interval=0.005)
+    finally:
+        stop.set()
+        worker.join()
+    spinning = sum(count for stack, count in stacks.items() if stack.startswith("spinner;") and "spin (" in stack)
+    assert spinning >= 5
+
+
+def test_watchdog_reports_what_blocked_the_loop():
+    async def scenario():
+        watchdog = StallWatchdog(threshold=0.05, sample_interval=0.005)
+        watchdog.start(asyncio.get_running_loop())
+        try:
+            # Awaiting is not a stall
+            await asyncio.sleep(0.2)
+            assert watchdog.stalls == 0
+            block_the_loop(0.3)
+            await asyncio.sleep(0.05)
+        finally:
+            watchdog.stop()
+        assert watchdog.stalls == 1
+        report = watchdog.recent[-1]
+        assert 0.2 < report.seconds < 0.5
+        assert any("block_the_loop (test_profiling.py:" in stack for stack in report.stacks)
+
+    asyncio.run(scenario())
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from protocol import (
+    BINARY_CODEC, CODECS, JSON_CODEC, MessageRouter, ProtocolError, compile_schema, get_codec,
+)
+
+
+def test_compile_schema_checks_exact_types():
+    validate = compile_schema({"x": int, "name": (str, type(None))})
+    assert validate({"x": 1, "name": "a"}) is None
+    assert validate({"x": 1}) is None
+    assert validate({"x": True}) == "x"
+    assert validate({"x": 1, "name": 3}) == "name"
+
+
+def test_binary_attack_layout():
+    frame = BINARY_CODEC.encode({"type": "attack", "x": 3, "y": 7})
+    assert frame == bytes((1, 3, 7))
+    assert BINARY_CODEC.decode(frame) == {"type": "attack", "x": 3, "y": 7}
+
+
+@pytest.mark.parametrize("sunk_ship", [None, "Destroyer"])
+@pytest.mark.parametrize("seq", [None, 70000])
+def test_binary_attack_result_round_trip(sunk_ship, seq):
+    message = {
+        "type": "attack_result", "attacker": "alice", "x": 9, "y": 0,
+        "hit": sunk_ship is not None, "sunk_ship": sunk_ship, "current_turn": "bob",
+    }
+    if seq is not None:
+        message["seq"] = seq
+    frame = BINARY_CODEC.encode(message)
+    assert frame[0] == 2
+    assert BINARY_CODEC.decode(frame) == message
+
+
+def test_binary_falls_back_to_json():
+    message = {"type": "chat", "message": "hi"}
+    frame = BINARY_CODEC.encode(message)
+    assert frame[0] == 0
+    assert BINARY_CODEC.decode(frame) == message
+    # Text frames are always JSON
+    assert BINARY_CODEC.decode('{"type": "chat"}') == {"type": "chat"}
+    # Names that do not fit a u8 length prefix
+    message = {
+        "type": "attack_result", "attacker": "é" * 200, "x": 1, "y": 2,
+        "hit": False, "sunk_ship": None, "current_turn": "bob",
+    }
+    frame = BINARY_CODEC.encode(message)
+    assert frame[0] == 0
+    assert BINARY_CODEC.decode(frame) == message
+
+
+def test_malformed_frames_raise_protocol_error():
+    for codec, frame in [
+        (JSON_CODEC, "{bad"),
+        (JSON_CODEC, "[1, 2]"),
+        (BINARY_CODEC, b""),
+        (BINARY_CODEC, b"\x01\x02"),
+        (BINARY_CODEC, b"\x02\x01\x01\x00\x09ab"),
+        # Ends where a string length should be
+        (BINARY_CODEC, b"\x02\x01\x01\x00"),
+        (BINARY_CODEC, b"\x02\x01\x01\x02\x01a"),
+        (BINARY_CODEC, b"\x02\x01\x01\x04\x01\x00"),
+        # Invalid UTF-8 in a name, and in a JSON frame
+        (BINARY_CODEC, b"\x02\x01\x01\x00\x02\xff\xfe\x01b"),
+        (BINARY_CODEC, b"\x00\xff\xfe"),
+        (BINARY_CODEC, b"\x7f"),
+    ]:
+        with pytest.raises(ProtocolError):
+            codec.decode(frame)
+
+
+def test_msgpack_round_trip():
+    codec = CODECS.get("msgpack")
+    if codec is None:
+        pytest.skip("msgpack not installed")
+    message = {"type": "place_ships", "ships": {"Destroyer": {"coords": [{"x": 1, "y": 2}]}}}
+    assert codec.decode(codec.encode(message)) == message
+
+
+def test_get_codec():
+    assert get_codec(None) is JSON_CODEC
+    assert get_codec("binary") is BINARY_CODEC
+    assert get_codec("xml") is None
+
+
+def test_router_dispatch_and_validation():
+    router = MessageRouter()
+    seen = []
+
+    @router.handler("attack", schema={"x": int, "y": int})
+    async def handle_attack(ctx, message):
+        seen.append((ctx, message["x"], message["y"]))
+
+    async def scenario():
+        await router.dispatch("conn", {"type": "attack", "x": 1, "y": 2})
+        with pytest.raises(ProtocolError, match="Invalid field: y"):
+            await router.dispatch("conn", {"type": "attack", "x": 1, "y": "2"})
+        with pytest.raises(ProtocolError, match="Unknown message type"):
+            await router.dispatch("conn", {"type": "nope"})
+
+    asyncio.run(scenario())
+    assert seen == [("conn", 1, 2)]
@@ -0,0 +1,101 @@
+"""The hot queries must be planned as index scans.
+
+mongomock has no query planner, so this needs a real MongoDB at
+``MONGO_URL`` and is skipped without one. It builds the indexes from
+:data:`indexes.INDEXES` in a scratch database, seeds enough documents
+for the planner to care, and explains each query.
+"""
+import os
+
+import pytest
+
+pymongo = pytest.importorskip("pymongo")
+
+from history import (  # noqa: E402
+    EXPORT_SORT, HISTORY_PROJECTION, HISTORY_SORT, decode_cursor, encode_cursor, export_filter, history_filter,
+)
+from indexes import INDEXES  # noqa: E402
+from leaderboard import LEADERBOARD_INDEX  # noqa: E402
+
+PAGE = 20
+
+
+@pytest.fixture(scope="module")
+def db():
+    client = pymongo.MongoClient(os.environ["MONGO_URL"], serverSelectionTimeoutMS=500)
+    try:
+        client.admin.command("ping")
+    except pymongo.errors.PyMongoError:
+        pytest.skip("needs a MongoDB at MONGO_URL")
+    db = client[f"battleship_query_plans_{os.getpid()}"]
+    for name, indexes in INDEXES.items():
+        db[name].create_indexes(indexes)
+    db.users.insert_many([{"username": f"user{i}", "wins": i % 7, "games_played": i % 11} for i in range(500)])
+    db.games.insert_many([
+        {
+            "id": f"g{i:05d}", "player1": f"user{i % 50}", "player2": f"user{(i * 7 + 1) % 50}",
+            "winner": f"user{i % 50}", "loser": f"user{(i * 7 + 1) % 50}", "duration_seconds": 60,
+            "finished_at": f"2024-05-01T{i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}+00:00",
+            "moves": b"",
+        }
+        for i in range(5000)
+    ])
+    db.player_stats.insert_many([{"username": f"user{i}", "games": i} for i in range(500)])
+    db.head_to_head.insert_many([
+        {"pair": f"user{i}|user{j}", "players": [f"user{i}", f"user{j}"], "games": i + j}
+        for i in range(40) for j in range(i + 1, 40)
+    ])
+    yield db
+    client.drop_database(db.name)
+    client.close()
+
+
+def stages(plan):
+    """Every stage name in an explained plan, however the server nests them."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from stages(value)
+
+
+def history_page(db, after=None):
+    return db.games.find(history_filter("user3", after), HISTORY_PROJECTION).sort(HISTORY_SORT).limit(PAGE)
+
+
+def deep_cursor(db):
+    games = list(db.games.find(history_filter("user3"), {"id": 1, "finished_at": 1}).sort(HISTORY_SORT))
+    return decode_cursor(encode_cursor(games[len(games) // 2]))
+
+
+HOT_QUERIES = {
+    "auth user": lambda db: db.users.find({"username": "user42"}).limit(1),
+    "leaderboard": lambda db: db.users.find({}).sort(LEADERBOARD_INDEX).limit(PAGE),
+    "history first page": lambda db: history_page(db),
+    "history deep page": lambda db: history_page(db, deep_cursor(db)),
+    "replay": lambda db: db.games.find({"id": "g00042"}).limit(1),
+    "export": lambda db: db.games.find(
+        export_filter(("2024-05-01T00:30:00+00:00", "g01800"))
+    ).sort(EXPORT_SORT).limit(PAGE),
+    "player stats": lambda db: db.player_stats.find({"username": "user42"}).limit(1),
+    "head to head": lambda db: db.head_to_head.find({"players": "user3"}).sort("games", -1).limit(PAGE),
+}
+
+
+@pytest.mark.parametrize("name", list(HOT_QUERIES))
+def test_hot_queries_use_an_index(db, name):
+    plan = HOT_QUERIES[name](db).explain()
+    used = set(stages(plan["queryPlanner"]["winningPlan"]))
+    assert "COLLSCAN" not in used, f"{name} scans the collection: {used}"
+    # A blocking SORT stage means the index does not give the order
+    assert "SORT" not in used, f"{name} sorts in memory: {used}"
+
+
+def test_history_pages_cost_the_same_at_any_depth(db):
+    for after in (None, deep_cursor(db)):
+        stats = history_page(db, after).explain()["executionStats"]
+        assert stats["nReturned"] == PAGE
+        assert stats["totalDocsExamined"] <= 2 * PAGE
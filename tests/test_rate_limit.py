@@ -0,0 +1,64 @@
+import asyncio
+import json
+
+from connections import ConnectionManager
+from rate_limit import RateLimits, TokenBucket
+
+
+def test_token_bucket_refills_up_to_burst():
+    now = [0.0]
+    bucket = TokenBucket(rate=2, burst=3, clock=lambda: now[0])
+    assert [bucket.take() for _ in range(4)] == [True, True, True, False]
+    now[0] = 0.5
+    assert bucket.take()
+    assert not bucket.take()
+    now[0] = 100
+    assert [bucket.take() for _ in range(4)] == [True, True, True, False]
+
+
+def test_parse_and_unlisted_types_share_a_bucket():
+    limits = RateLimits.parse("chat=1/2, *=5")
+    assert limits.limits == {"chat": (1.0, 2.0), "*": (5.0, 5.0)}
+    assert limits.key("chat") == "chat"
+    assert limits.key("made_up") == limits.key(["not", "hashable"]) == "*"
+    assert RateLimits.parse("chat=1/2").key("attack") is None
+
+
+def test_flooding_connection_is_throttled_then_dropped(setup_room):
+    async def scenario():
+        manager = ConnectionManager(rate_limits=RateLimits.parse("chat=1/2"), throttle_strikes=3)
+        handled = []
+        manager.dispatch = lambda username, message: asyncio.sleep(0, handled.append(message))
+        sockets = await setup_room(manager, "a", "b")
+        flooder = manager.active_connections["a"]
+        for _ in range(5):
+            await manager.route(flooder, {"type": "chat", "message": "spam"})
+        await manager.route(flooder, {"type": "attack", "x": 0, "y": 0})
+        await asyncio.sleep(0)
+        assert [m["type"] for m in handled] == ["chat", "chat", "attack"]
+        assert manager.throttled_messages == {"chat": 3}
+        # One error for the whole run of throttled frames
+        assert [json.loads(f)["message"] for f in sockets["a"].sent] == ["Rate limit exceeded"]
+
+        await manager.route(flooder, {"type": "chat", "message": "spam"})
+        assert manager.throttle_disconnects == 1
+        assert "a" not in manager.active_connections
+        assert "b" in manager.active_connections
+
+    asyncio.run(scenario())
+
+
+def test_room_limit_is_shared_by_its_players(setup_room):
+    async def scenario():
+        manager = ConnectionManager(room_rate_limits=RateLimits.parse("chat=1/3"))
+        handled = []
+        manager.dispatch = lambda username, message: asyncio.sleep(0, handled.append(username))
+        sockets = await setup_room(manager, "a", "b")
+        for name in ("a", "b", "a", "b"):
+            await manager.route(manager.active_connections[name], {"type": "chat", "message": "hi"})
+        await asyncio.sleep(0)
+        assert handled == ["a", "b", "a"]
+        assert json.loads(sockets["b"].sent[-1])["message"] == "Room rate limit exceeded"
+        assert manager.throttle_disconnects == 0
+
+    asyncio.run(scenario())
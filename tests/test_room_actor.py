@@ -0,0 +1,81 @@
+import asyncio
+import json
+
+from connections import ConnectionManager
+from protocol import ProtocolError
+
+
+def racy_dispatch(manager, fired):
+    """An attack handler that awaits between its turn check and the turn switch."""
+    async def dispatch(username, message):
+        room = manager.rooms[manager.user_to_room[username]]
+        if room["turn"] != username:
+            return
+        await asyncio.sleep(0.01)
+        fired.append(username)
+        room["turn"] = next(p for p in room["players"] if p != username)
+
+    return dispatch
+
+
+def test_frames_for_a_room_run_one_at_a_time(setup_room):
+    async def scenario():
+        manager = ConnectionManager()
+        fired = []
+        manager.dispatch = racy_dispatch(manager, fired)
+        await setup_room(manager, "a", "b")
+        manager.rooms["ROOM"]["turn"] = "a"
+        a = manager.active_connections["a"]
+        # The second frame is checked only after the first one switched the turn
+        await asyncio.gather(
+            manager.route(a, {"type": "attack"}),
+            manager.route(a, {"type": "attack"}),
+            manager.route(manager.active_connections["b"], {"type": "attack"}),
+        )
+        assert fired == ["a", "b"]
+        assert manager.actors["ROOM"].jobs_run == 3
+
+    asyncio.run(scenario())
+
+
+def test_jobs_on_the_actor_can_reenter_it_and_close_the_room(setup_room):
+    async def scenario():
+        manager = ConnectionManager()
+        calls = []
+
+        async def dispatch(username, message):
+            # Waiting on the room from its own actor runs inline instead of deadlocking
+            await manager.run_in_room("ROOM", manager.close_room, "ROOM")
+            calls.append(message["n"])
+
+        manager.dispatch = dispatch
+        await setup_room(manager, "a")
+        actor = manager.actors["ROOM"]
+        await manager.route(manager.active_connections["a"], {"type": "chat", "n": 1})
+        assert calls == [1]
+        assert "ROOM" not in manager.actors
+        await asyncio.sleep(0)
+        assert actor.task.done()
+        # Later frames run without an actor
+        await manager.route(manager.active_connections["a"], {"type": "chat", "n": 2})
+        assert calls == [1, 2]
+
+    asyncio.run(scenario())
+
+
+def test_forwarded_frame_errors_are_reported(setup_room):
+    async def scenario():
+        manager = ConnectionManager()
+
+        async def dispatch(username, message):
+            raise ProtocolError("Invalid field: x")
+
+        await manager.start(dispatch)
+        sockets = await setup_room(manager, "a")
+        await manager._handle_envelope({"kind": "frame", "from": "a", "worker": "w2", "message": {"type": "attack"}})
+        for _ in range(3):
+            await asyncio.sleep(0)
+        assert json.loads(sockets["a"].sent[-1]) == {"type": "error", "message": "Invalid field: x"}
+        await manager.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,175 @@
+import asyncio
+import random
+
+import numpy as np
+import pytest
+
+from bot import BOT_USERNAME, BotPlayer, random_board
+from connections import ConnectionManager
+from move_log import pack_shot
+from room_snapshot import RoomSnapshot, SnapshotError, read_snapshot, write_snapshot
+
+
+def playing_room(code, rng, shots=9, bot=False):
+    host, guest = "host-" + code, BOT_USERNAME if bot else "guest-" + code
+    boards = {guest: random_board(rng), host: random_board(rng)}
+    moves = bytearray()
+    shooter, target = host, guest
+    for _ in range(shots):
+        index = rng.randrange(100)
+        moves.append(pack_shot(index, boards[target].fire(index).hit))
+        shooter, target = target, shooter
+    room = {
+        "code": code, "players": [host, guest], "host": host, "status": "playing", "seq": 40,
+        "ratings": {host: 1250, guest: 1190},
+        "game_state": {
+            "boards": boards, "ready": {guest: True, host: True}, "current_turn": shooter,
+            "first_turn": host, "moves": moves, "started_at": "2024-05-01T12:00:00+00:00",
+        },
+    }
+    if bot:
+        room["bot"] = BotPlayer()
+        del room["ratings"]
+    return room
+
+
+def test_rooms_round_trip(tmp_path):
+    rng = random.Random(7)
+    placement = playing_room("PLACE1", rng, shots=0)
+    placement.update(status="placement", seq=2)
+    placement["game_state"]["boards"]["guest-PLACE1"] = None
+    placement["game_state"]["ready"]["guest-PLACE1"] = False
+    # The bot has placed its fleet; the human has not
+    bot_placing = playing_room("BOTPLC", rng, shots=0, bot=True)
+    bot_placing.update(status="placement", seq=3)
+    bot_placing["game_state"]["boards"]["host-BOTPLC"] = None
+    bot_placing["game_state"]["ready"]["host-BOTPLC"] = False
+    left = playing_room("LEFT01", rng)
+    # The guest gave up their seat; the game still knows both players
+    left["players"].remove("guest-LEFT01")
+    rooms = [
+        {"code": "WAIT01", "players": ["solo"], "host": "solo", "status": "waiting", "seq": 0, "game_state": None},
+        placement,
+        bot_placing,
+        playing_room("PLAY01", rng),
+        left,
+        playing_room("BOT001", rng, shots=30, bot=True),
+    ]
+    path = str(tmp_path / "rooms.snap")
+    assert write_snapshot(path, rooms) == 6
+    restored = read_snapshot(path)
+
+    assert [r["code"] for r in restored] == [r["code"] for r in rooms]
+    for before, after in zip(rooms, restored):
+        for key in ("players", "host", "status", "seq"):
+            assert after[key] == before[key]
+        assert after.get("ratings") == before.get("ratings")
+        if before["game_state"] is None:
+            assert after["game_state"] is None
+            continue
+        old, new = before["game_state"], after["game_state"]
+        for key in ("ready", "current_turn", "first_turn", "moves", "started_at"):
+            assert new[key] == old[key], key
+        for player, board in old["boards"].items():
+            if board is None:
+                assert new["boards"][player] is None
+                continue
+            restored_board = new["boards"][player]
+            for field in ("names", "ship_masks", "remaining", "shots", "ships_left"):
+                assert getattr(restored_board, field) == getattr(board, field)
+
+    assert not restored[2]["bot"].shots.any()
+
+    # The bot relearns what its own shots found
+    bot_room = restored[-1]
+    bot = bot_room["bot"]
+    host_board = rooms[-1]["game_state"]["boards"]["host-BOT001"]
+    fired = [byte & 0x7F for byte in bot_room["game_state"]["moves"][1::2]]
+    assert sorted(np.flatnonzero(bot.shots).tolist()) == sorted(set(fired))
+    assert all(bool(bot.hits[i]) == bool(host_board.occupancy >> i & 1) for i in fired)
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "rooms.snap"
+    path.write_bytes(b"not a snapshot at all, really")
+    with pytest.raises(SnapshotError):
+        read_snapshot(str(path))
+
+
+def test_restored_room_holds_seats_until_resume(tmp_path):
+    async def scenario():
+        manager = ConnectionManager(seat_grace=30)
+        path = str(tmp_path / "rooms.snap")
+        write_snapshot(path, [playing_room("ROOM", random.Random(1))])
+        room = read_snapshot(path)[0]
+        assert await manager.claim_rooms(["ROOM"]) == ["ROOM"]
+        manager.restore_room(room, ["host-ROOM"], seat_grace=60)
+        assert manager.user_to_room["host-ROOM"] == "ROOM"
+        assert room["away"] == {"host-ROOM"}
+        assert ("seat", ("ROOM", "host-ROOM")) in manager.wheel
+        # The ring buffer did not survive, so a resuming client is sent a full snapshot
+        assert manager.events_since("ROOM", 39) is None
+        assert manager.events_since("ROOM", 40) == []
+        # A second process can not take the same code
+        assert await ConnectionManager(manager.store, worker_id="other").claim_rooms(["ROOM"]) == []
+
+    asyncio.run(scenario())
+
+
+def test_rooms_are_decoded_when_first_needed(tmp_path, fake_websocket):
+    async def scenario():
+        path = str(tmp_path / "rooms.snap")
+        rng = random.Random(3)
+        write_snapshot(path, [playing_room(code, rng) for code in ("ROOM1", "ROOM2")])
+        snapshot = RoomSnapshot(path)
+        assert snapshot.codes() == ["ROOM1", "ROOM2"]
+
+        manager = ConnectionManager()
+        handled = []
+
+        async def dispatch(username, message):
+            handled.append((username, message["room_code"] in manager.rooms))
+
+        async def load_room(room_code):
+            room = snapshot.take(room_code)
+            if room is not None:
+                manager.restore_room(room, room["players"], seat_grace=60)
+            return room
+
+        manager.dispatch = dispatch
+        manager.load_room = load_room
+        connection = await manager.connect(fake_websocket(), "host-ROOM2")
+        await manager.route(connection, {"type": "resume", "room_code": "ROOM2", "seq": 40})
+        assert handled == [("host-ROOM2", True)]
+        assert list(manager.rooms) == ["ROOM2"]
+        assert "ROOM2" not in snapshot and len(snapshot) == 1
+        # Unknown codes reach the handler, which reports them as usual
+        await manager.route(connection, {"type": "join_room", "room_code": "NOPE"})
+        assert handled[-1] == ("host-ROOM2", False)
+        snapshot.close()
+
+    asyncio.run(scenario())
+
+
+def test_draining_finishes_queued_frames_then_drops_new_ones(setup_room):
+    async def scenario():
+        manager = ConnectionManager()
+        handled = []
+
+        async def dispatch(username, message):
+            await asyncio.sleep(0.01)
+            handled.append(message["n"])
+
+        manager.dispatch = dispatch
+        await setup_room(manager, "a")
+        connection = manager.active_connections["a"]
+        first = asyncio.create_task(manager.route(connection, {"type": "attack", "n": 1}))
+        await asyncio.sleep(0)
+        await manager.drain(timeout=1)
+        assert handled == [1]
+        await manager.route(connection, {"type": "attack", "n": 2})
+        assert handled == [1]
+        assert not await manager.create_room("NEW", {"code": "NEW", "players": []})
+        await first
+
+    asyncio.run(scenario())
@@ -0,0 +1,186 @@
+import asyncio
+import json
+
+from connections import ConnectionManager
+from room_store import InMemoryRoomStore, MemoryBroker, RedisRoomStore
+
+
+class FakeRedis:
+    """Just enough of the redis.asyncio client for RedisRoomStore."""
+
+    def __init__(self):
+        self.data = {}
+        self.pubsubs = []
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value.encode()
+        return True
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def publish(self, channel, data):
+        for pubsub in self.pubsubs:
+            if channel in pubsub.channels:
+                pubsub.messages.put_nowait({"type": "message", "channel": channel.encode(), "data": data})
+
+    def pubsub(self):
+        pubsub = FakePubSub()
+        self.pubsubs.append(pubsub)
+        return pubsub
+
+    async def aclose(self):
+        pass
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    def set(self, *args, **kwargs):
+        self.commands.append(self.redis.set(*args, **kwargs))
+
+    async def execute(self):
+        return [await command for command in self.commands]
+
+
+class FakePubSub:
+    def __init__(self):
+        self.channels = set()
+        self.messages = asyncio.Queue()
+
+    async def subscribe(self, channel):
+        self.channels.add(channel)
+
+    async def get_message(self, ignore_subscribe_messages=True, timeout=1.0):
+        try:
+            return await asyncio.wait_for(self.messages.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def aclose(self):
+        pass
+
+
+def make_worker(store, name):
+    """A manager whose dispatch mimics the join/chat handlers."""
+    manager = ConnectionManager(store, worker_id=name)
+
+    async def dispatch(username, message):
+        if message["type"] == "join_room":
+            room = manager.rooms[message["room_code"]]
+            room["players"].append(username)
+            await manager.bind(username, message["room_code"])
+            await manager.broadcast_to_room({"type": "player_joined", "players": room["players"]}, room["code"])
+        elif message["type"] == "chat":
+            room_code = manager.user_to_room[username]
+            await manager.broadcast_to_room({"type": "chat", "username": username}, room_code)
+
+    return manager, dispatch
+
+
+async def two_workers(store_a, store_b):
+    worker_a, dispatch_a = make_worker(store_a, "a")
+    worker_b, dispatch_b = make_worker(store_b, "b")
+    await worker_a.start(dispatch_a)
+    await worker_b.start(dispatch_b)
+    return worker_a, worker_b
+
+
+async def play_across_workers(fake_websocket, worker_a, worker_b):
+    host_ws, guest_ws = fake_websocket(), fake_websocket()
+    await worker_a.connect(host_ws, "host")
+    guest = await worker_b.connect(guest_ws, "guest")
+    assert await worker_a.create_room("ABC123", {"code": "ABC123", "players": ["host"]})
+    await worker_a.bind("host", "ABC123")
+
+    await worker_b.route(guest, {"type": "join_room", "room_code": "ABC123"})
+    for _ in range(20):
+        await asyncio.sleep(0.01)
+        if guest.room_owner:
+            break
+    assert worker_a.rooms["ABC123"]["players"] == ["host", "guest"]
+    assert guest.room_owner == "a"
+
+    await worker_b.route(guest, {"type": "chat", "message": "hi"})
+    for _ in range(20):
+        await asyncio.sleep(0.01)
+        if len(guest_ws.sent) == 2:
+            break
+    assert [json.loads(f)["type"] for f in host_ws.sent] == ["player_joined", "chat"]
+    assert [json.loads(f)["type"] for f in guest_ws.sent] == ["player_joined", "chat"]
+    assert worker_b.forwarded_frames == 2
+
+    await worker_b.disconnect("guest", guest)
+    await asyncio.sleep(0.02)
+    # The owner holds the seat and tells the other player
+    assert worker_a.rooms["ABC123"]["away"] == {"guest"}
+    assert json.loads(host_ws.sent[-1])["type"] == "player_away"
+
+
+def test_players_on_different_workers_share_a_room(fake_websocket):
+    async def scenario():
+        broker = MemoryBroker()
+        worker_a, worker_b = await two_workers(InMemoryRoomStore(broker), InMemoryRoomStore(broker))
+        await play_across_workers(fake_websocket, worker_a, worker_b)
+        await worker_a.stop()
+        await worker_b.stop()
+
+    asyncio.run(scenario())
+
+
+def test_redis_store_routes_between_workers(fake_websocket):
+    async def scenario():
+        redis = FakeRedis()
+        worker_a, worker_b = await two_workers(RedisRoomStore(redis), RedisRoomStore(redis))
+        await play_across_workers(fake_websocket, worker_a, worker_b)
+        await worker_a.stop()
+        await worker_b.stop()
+
+    asyncio.run(scenario())
+
+
+def test_room_codes_are_claimed_once():
+    async def scenario():
+        store = InMemoryRoomStore()
+        assert await store.claim_room("ROOM", "a")
+        assert not await store.claim_room("ROOM", "b")
+        assert await store.room_owner("ROOM") == "a"
+        await store.release_room("ROOM")
+        assert await store.room_owner("ROOM") is None
+
+        redis_store = RedisRoomStore(FakeRedis())
+        assert await redis_store.claim_room("ROOM", "a")
+        assert not await redis_store.claim_room("ROOM", "b")
+        assert await redis_store.room_owner("ROOM") == "a"
+
+    asyncio.run(scenario())
+
+
+def test_room_codes_are_claimed_in_bulk():
+    async def scenario():
+        for store in (InMemoryRoomStore(), RedisRoomStore(FakeRedis())):
+            assert await store.claim_room("B", "other")
+            assert await store.claim_rooms(["A", "B", "C"], "a") == ["A", "C"]
+            assert await store.room_owner("C") == "a"
+            await store.release_rooms(["A", "C"])
+            assert await store.room_owner("A") is None
+            assert await store.room_owner("B") == "other"
+
+    asyncio.run(scenario())
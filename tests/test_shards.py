@@ -0,0 +1,27 @@
+from collections import Counter
+
+from connections import ConnectionManager
+from shards import HashRing, shard_id
+
+
+def test_ring_spreads_rooms_and_moves_few_on_resize():
+    codes = [f"{i:06X}" for i in range(20000)]
+    ring = HashRing.for_shards(4)
+    owners = {code: ring.owner(code) for code in codes}
+    shares = Counter(owners.values())
+    assert set(shares) == {shard_id(i) for i in range(4)}
+    assert max(shares.values()) < 1.5 * min(shares.values())
+
+    grown = HashRing.for_shards(5)
+    moved = sum(owners[code] != grown.owner(code) for code in codes)
+    # Only the new shard's share changes owner, instead of almost every room
+    assert moved < len(codes) * 0.3
+    assert all(grown.owner(code) == shard_id(4) for code in codes if owners[code] != grown.owner(code))
+
+
+def test_manager_owns_only_codes_hashed_to_it():
+    ring = HashRing.for_shards(3)
+    manager = ConnectionManager(worker_id=shard_id(1), ring=ring)
+    codes = [f"{i:06X}" for i in range(300)]
+    assert [c for c in codes if manager.owns(c)] == [c for c in codes if ring.owner(c) == shard_id(1)]
+    assert ConnectionManager().owns("ANYCODE")
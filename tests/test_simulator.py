@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from game_engine import CELL_COUNT, FLEET, Board
+from simulator import STRATEGIES, BatchBoards, play_games, shots_to_win
+
+
+def to_board(ship_ids):
+    masks = [sum(1 << int(cell) for cell in np.flatnonzero(ship_ids == k)) for k in range(1, len(FLEET) + 1)]
+    return Board([name for name, _ in FLEET], masks)
+
+
+def test_random_layouts_place_whole_fleet():
+    boards = BatchBoards.random(200, np.random.default_rng(0))
+    for k, (_, length) in enumerate(FLEET, 1):
+        assert ((boards.ship_ids == k).sum(axis=1) == length).all()
+
+
+def test_batch_fire_matches_board_rules():
+    rng = np.random.default_rng(1)
+    boards = BatchBoards.random(50, rng)
+    reference = [to_board(ids) for ids in boards.ship_ids]
+    # Random shot order with some repeats mixed in
+    for index in rng.integers(0, CELL_COUNT, size=(150, 50)):
+        hit, sunk, won = boards.fire(index)
+        for b, board in enumerate(reference):
+            result = board.fire(int(index[b]))
+            assert hit[b] == result.hit
+            assert (FLEET[sunk[b]][0] if sunk[b] >= 0 else None) == result.sunk_ship
+            assert won[b] == result.won
+
+
+@pytest.mark.parametrize("name", sorted(STRATEGIES))
+def test_strategies_sink_every_fleet(name):
+    rng = np.random.default_rng(2)
+    shots = shots_to_win(STRATEGIES[name](rng), BatchBoards.random(100, rng))
+    assert (shots >= sum(length for _, length in FLEET)).all()
+    assert (shots <= CELL_COUNT).all()
+
+
+def test_play_games_columns():
+    columns = play_games("density", "random", 200, seed=3)
+    a_wins = columns["winner"] == 0
+    assert (columns["length"][a_wins] == 2 * columns["shots_a"][a_wins].astype(int) - 1).all()
+    assert (columns["length"][~a_wins] == 2 * columns["shots_b"][~a_wins].astype(int)).all()
+    assert a_wins.mean() > 0.9
+    assert columns["shots_a"].mean() < columns["shots_b"].mean()
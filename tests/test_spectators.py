@@ -0,0 +1,106 @@
+import asyncio
+import json
+
+from connections import ConnectionManager
+from room_store import InMemoryRoomStore, MemoryBroker
+
+
+def public_view(players):
+    return {
+        "room_code": "ROOM", "seq": 0, "players": players, "status": "playing", "current_turn": players[0],
+        "shots": {p: [] for p in players}, "sunk": {p: [] for p in players},
+    }
+
+
+async def add_spectators(fake_websocket, manager, count, stalled=()):
+    sockets = {}
+    for i in range(count):
+        name = f"watcher{i}"
+        sockets[name] = fake_websocket(stalled=name in stalled)
+        await manager.connect(sockets[name], name)
+        await manager.watch(name, "ROOM", public_view(["a", "b"]))
+    await manager.spectators.flush()
+    await asyncio.sleep(0)
+    return sockets
+
+
+def attack(n):
+    return {"type": "attack_result", "attacker": "a", "x": n, "y": 0, "hit": True,
+            "sunk_ship": None, "current_turn": "b"}
+
+
+def test_spectators_share_one_encoded_frame(setup_room, fake_websocket):
+    async def scenario():
+        manager = ConnectionManager()
+        players = await setup_room(manager, "a", "b")
+        watchers = await add_spectators(fake_websocket, manager, 3)
+        assert json.loads(watchers["watcher0"].sent[0])["type"] == "spectate_snapshot"
+
+        await manager.broadcast_to_room(attack(0), "ROOM")
+        await asyncio.sleep(0)
+        # Players are served before the hub has done anything
+        assert len(players["a"].sent) == 1
+        assert len(watchers["watcher0"].sent) == 1
+        await manager.spectators.flush()
+        await asyncio.sleep(0)
+        frames = [ws.sent[1] for ws in watchers.values()]
+        assert all(frame is frames[0] for frame in frames)
+        assert json.loads(frames[0])["seq"] == 1
+        assert manager.spectators.feeds["ROOM"].view["shots"]["a"] == [[0, 0, True]]
+
+    asyncio.run(scenario())
+
+
+def test_slow_spectator_gets_a_snapshot_instead_of_a_backlog(setup_room, fake_websocket):
+    async def scenario():
+        manager = ConnectionManager(send_queue_size=4)
+        await setup_room(manager, "a", "b")
+        watchers = await add_spectators(fake_websocket, manager, 2, stalled={"watcher1"})
+        for n in range(8):
+            await manager.broadcast_to_room(attack(n), "ROOM")
+            await manager.spectators.flush()
+            await asyncio.sleep(0)
+        slow = manager.active_connections["watcher1"]
+        assert not slow.closed
+        assert slow in manager.spectators.feeds["ROOM"].stale
+
+        watchers["watcher1"].gate.set()
+        await asyncio.sleep(0.01)
+        await manager.spectators.flush()
+        await asyncio.sleep(0.01)
+        received = [json.loads(f) for f in watchers["watcher1"].sent]
+        # One frame in the writer plus a full queue, then a single catch-up snapshot
+        assert [m["type"] for m in received] == ["spectate_snapshot"] + ["attack_result"] * 4 + ["spectate_snapshot"]
+        assert received[-1]["seq"] == 8
+        assert len(received[-1]["shots"]["a"]) == 8
+        assert len(watchers["watcher0"].sent) == 9
+
+    asyncio.run(scenario())
+
+
+def test_remote_spectators_follow_the_owner(fake_websocket, setup_room):
+    async def scenario():
+        broker = MemoryBroker()
+        owner = ConnectionManager(InMemoryRoomStore(broker), worker_id="a")
+        other = ConnectionManager(InMemoryRoomStore(broker), worker_id="b")
+        await owner.start(lambda username, message: asyncio.sleep(0))
+        await other.start(lambda username, message: asyncio.sleep(0))
+        await setup_room(owner, "a", "b")
+        watcher_ws = fake_websocket()
+        await other.connect(watcher_ws, "watcher")
+        owner.user_workers["watcher"] = "b"
+        await owner.watch("watcher", "ROOM", public_view(["a", "b"]))
+        await asyncio.sleep(0.02)
+        assert owner.rooms["ROOM"]["watchers"] == {"b"}
+
+        await owner.broadcast_to_room(attack(0), "ROOM")
+        await owner.close_room("ROOM")
+        await asyncio.sleep(0.02)
+        received = [json.loads(f)["type"] for f in watcher_ws.sent]
+        assert received == ["spectate_snapshot", "attack_result", "spectate_end"]
+        assert other.spectators.feeds == {}
+        assert other.active_connections["watcher"].watching is None
+        await owner.stop()
+        await other.stop()
+
+    asyncio.run(scenario())
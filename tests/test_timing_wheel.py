@@ -0,0 +1,52 @@
+from timing_wheel import TimingWheel
+
+
+def make_wheel(**kwargs):
+    now = [0.0]
+    return TimingWheel(clock=lambda: now[0], **kwargs), now
+
+
+def test_expires_at_deadline():
+    wheel, now = make_wheel()
+    wheel.schedule("a", 3)
+    wheel.schedule("b", 1.5)
+    now[0] = 1
+    assert wheel.advance() == []
+    now[0] = 2
+    assert wheel.advance() == ["b"]
+    now[0] = 3
+    assert wheel.advance() == ["a"]
+    assert len(wheel) == 0
+
+
+def test_reschedule_and_cancel():
+    wheel, now = make_wheel()
+    wheel.schedule("a", 2)
+    wheel.schedule("a", 5)
+    wheel.schedule("b", 2)
+    assert wheel.cancel("b")
+    assert not wheel.cancel("b")
+    now[0] = 4
+    assert wheel.advance() == []
+    now[0] = 5
+    assert wheel.advance() == ["a"]
+
+
+def test_timers_beyond_one_lap_wait_their_turn():
+    wheel, now = make_wheel(slots=8)
+    wheel.schedule("late", 20)
+    wheel.schedule("soon", 4)
+    now[0] = 12
+    assert wheel.advance() == ["soon"]
+    now[0] = 19
+    assert wheel.advance() == []
+    now[0] = 20
+    assert wheel.advance() == ["late"]
+
+
+def test_large_jump_visits_each_slot_once():
+    wheel, now = make_wheel(slots=8)
+    for i in range(20):
+        wheel.schedule(i, i + 1)
+    now[0] = 1000
+    assert sorted(wheel.advance()) == list(range(20))